@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2026 Pytroll developers
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+"""Benchmarks for reading the product lists and splitting them into jobs."""
+
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+import yaml
+from yaml import UnsafeLoader
+
+from trollflow2.launcher import ProductListCache, expand, file_list_to_jobs, read_config
+
+from .dict_tools_benchmarks import create_product_list
+
+NUM_AREAS = 10
+WORKERS = ["trollflow2.plugins.create_scene", "trollflow2.plugins.load_composites",
+           "trollflow2.plugins.resample", "trollflow2.plugins.save_datasets"]
+INPUT_MDA = {"platform_name": "NOAA-20", "sensor": "viirs", "start_time": datetime(2026, 1, 1, 12)}
+
+
+def create_large_product_list(num_products):
+    """Create a product list of *num_products* products over ten areas in three priority groups."""
+    config = create_product_list(NUM_AREAS, num_products // NUM_AREAS, num_formats=2)
+    for area_num, area_config in enumerate(config["product_list"]["areas"].values()):
+        area_config["priority"] = area_num % 3 + 1
+    return config
+
+
+def write_product_list(config, directory):
+    """Write the product list *config* in *directory* with the standard workers, and return the filename."""
+    filename = os.path.join(directory, "product_list.yaml")
+    text = yaml.safe_dump(config)
+    text += "workers:\n" + "".join(f"  - fun: !!python/name:{worker} ''\n" for worker in WORKERS)
+    with open(filename, "w") as fd:
+        fd.write(text)
+    return filename
+
+
+class ReadConfig:
+    """Benchmark reading and expanding the product list, as done for each message."""
+
+    params = [100, 1000, 10000]
+    param_names = ["num_products"]
+    timeout = 300
+
+    def setup(self, num_products):
+        """Write the product list."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filename = write_product_list(create_large_product_list(num_products), self.tmp_dir)
+        self.cache = ProductListCache()
+        self.cache.get(self.filename)
+
+    def teardown(self, num_products):
+        """Remove the product list."""
+        self.cache.clear()
+        shutil.rmtree(self.tmp_dir)
+
+    def time_read_and_expand(self, num_products):
+        """Time reading and expanding the product list."""
+        expand(read_config(self.filename, Loader=UnsafeLoader))
+
+    def time_cached(self, num_products):
+        """Time getting the product list from the cache of the warm workers."""
+        self.cache.get(self.filename)
+
+
+class FileListToJobs:
+    """Benchmark splitting the product list into the jobs of the priority groups."""
+
+    params = [100, 1000, 10000]
+    param_names = ["num_products"]
+    timeout = 300
+
+    def setup(self, num_products):
+        """Set up the expanded product list."""
+        self.config = create_large_product_list(num_products)
+        self.filenames = [f"/data/input/SVM{band:02d}_npp_d20260101_t1200000.h5" for band in range(16)]
+
+    def time_file_list_to_jobs(self, num_products):
+        """Time creating the jobs."""
+        file_list_to_jobs(self.filenames, self.config, INPUT_MDA)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2026 Pytroll developers
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+"""Benchmarks for the product list tools."""
+
+import copy
+
+from trollflow2.dict_tools import get_config_value, plist_iter
+from trollflow2.launcher import _create_job_product_list
+
+KEYS = ("min_coverage", "output_dir", "fname_pattern", "sunzen_check_lon", "resampler")
+
+
+def create_product_list(num_areas, num_products, num_formats=0):
+    """Create a product list with *num_areas* areas of *num_products* products."""
+    areas = {}
+    for area_num in range(num_areas):
+        products = {f"product{prod_num}": {"productname": f"product{prod_num}"}
+                    for prod_num in range(num_products)}
+        if num_formats:
+            for product in products.values():
+                product["formats"] = [{"format": f"format{fmt_num}", "writer": "geotiff"}
+                                      for fmt_num in range(num_formats)]
+        areas[f"area{area_num}"] = {"areaname": f"area{area_num}",
+                                    "min_coverage": 20.0,
+                                    "products": products}
+    return {"product_list": {"output_dir": "/tmp",
+                             "fname_pattern": "{start_time:%Y%m%d_%H%M}_{areaname}_{productname}.{format}",
+                             "areas": areas}}
+
+
+class GetConfigValue:
+    """Benchmark getting the config values for all the products."""
+
+    params = [10, 100]
+    param_names = ["num_areas"]
+
+    def setup(self, num_areas):
+        """Set up the product lists and the paths to look up."""
+        self.plain_config = create_product_list(num_areas, 30)
+        self.paths = [f"/product_list/areas/{area}/products/{product}"
+                      for area, area_config in self.plain_config["product_list"]["areas"].items()
+                      for product in area_config["products"]]
+
+    def time_plain_dicts(self, num_areas):
+        """Time the lookups from plain dicts."""
+        self._get_all_values(self.plain_config)
+
+    def _get_all_values(self, config):
+        for path in self.paths:
+            for key in KEYS:
+                get_config_value(config, path, key)
+
+
+class PlistIter:
+    """Benchmark iterating over all the formats of the product list, as the plugins do."""
+
+    params = [10, 100]
+    param_names = ["num_areas"]
+
+    def setup(self, num_areas):
+        """Set up the product lists."""
+        self.plain_config = create_product_list(num_areas, 10, num_formats=3)["product_list"]
+        self.mda = {"platform_name": "NOAA-15", "sensor": "avhrr-3"}
+
+    def time_plain_dicts(self, num_areas):
+        """Time iterating over plain dicts."""
+        self._iterate(plist_iter, self.plain_config)
+
+    def time_plain_dicts_previous(self, num_areas):
+        """Time iterating over plain dicts with the previous implementation, as a reference."""
+        self._iterate(_previous_plist_iter, self.plain_config)
+
+    def _iterate(self, iterator, product_list):
+        _iterate_as_a_job(iterator, product_list, self.mda)
+
+
+class JobProductList:
+    """Benchmark creating the product list of a job and iterating over it, as the launcher and the plugins do."""
+
+    params = [10, 100]
+    param_names = ["num_areas"]
+
+    def setup(self, num_areas):
+        """Set up the product lists."""
+        self.plain_config = create_product_list(num_areas, 10, num_formats=3)["product_list"]
+        self.areas = list(self.plain_config["areas"])
+        self.mda = {"platform_name": "NOAA-15", "sensor": "avhrr-3"}
+
+    def time_job(self, num_areas):
+        """Time copying the product list for the job and iterating over it."""
+        product_list = _create_job_product_list(self.plain_config, self.areas, None)
+        _iterate_as_a_job(plist_iter, product_list, self.mda)
+
+    def time_job_previous(self, num_areas):
+        """Time a deep copy and the previous iteration, as the launcher did before, as a reference."""
+        product_list = copy.deepcopy(self.plain_config)
+        _iterate_as_a_job(_previous_plist_iter, product_list, self.mda)
+
+
+def _iterate_as_a_job(iterator, product_list, mda):
+    """Iterate as the plugins of a job do, setting the filenames on the way."""
+    for _fmat, _prod_config in iterator(product_list, level="product"):
+        pass
+    for fmat, fmat_config in iterator(product_list, mda):
+        fmat_config["filename"] = fmat["format"]
+    for _ in range(3):
+        for _fmat, _fmat_config in iterator(product_list, mda):
+            pass
+
+
+def _previous_plist_iter(product_list, base_mda=None, level=None):
+    """Iterate over the product list as the original :func:`plist_iter` did, for comparison."""
+    if base_mda is None:
+        base_mda = {}
+    else:
+        base_mda = base_mda.copy()
+    for area, area_config in product_list['areas'].items():
+        aconfig = base_mda.copy()
+        aconfig.update(product_list)
+        aconfig.pop('areas', None)
+        aconfig.update(area_config)
+        aconfig.pop('products', None)
+        aconfig['area'] = area
+        if level == 'area':
+            yield aconfig, area_config
+            continue
+        for prod, prod_config in area_config['products'].items():
+            pconfig = aconfig.copy()
+            pconfig.update(prod_config)
+            pconfig['product'] = prod
+            if level == 'product':
+                yield pconfig, prod_config
+                continue
+            for file_config in pconfig.get('formats', [{'format': 'tif', 'writer': 'geotiff'}]):
+                fconfig = pconfig.copy()
+                fconfig.pop('formats', None)
+                fconfig.update(file_config)
+                yield fconfig, file_config
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2026 Pytroll developers
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+"""Benchmarks for the processing of the messages, from the launcher to the written files."""
+
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from queue import Queue
+
+import numpy as np
+import yaml
+from posttroll.message import Message
+from satpy.tests.utils import make_fake_scene
+
+from trollflow2.launcher import Runner, file_list_to_jobs, process_jobs
+from trollflow2.logging import logging_on
+from trollflow2.plugins import resample, save_datasets
+
+START_TIME = datetime(2026, 1, 1, 12)
+NUM_MESSAGES = 10
+QUIET_LOG_CONFIG = {"version": 1,
+                    "handlers": {"null": {"class": "logging.NullHandler"}},
+                    "root": {"level": "WARNING", "handlers": ["null"]}}
+
+
+def create_fake_scene(job):
+    """Create a synthetic scene with a dataset for each product of the job, instead of reading files."""
+    product_names = job["product_list"]["product_list"]["areas"]["None"]["products"].keys()
+    data = np.linspace(0, 1, 256 * 256, dtype=np.float32).reshape(256, 256)
+    job["scene"] = make_fake_scene({name: data for name in product_names}, daskify=True,
+                                   common_attrs={"start_time": START_TIME})
+
+
+def do_nothing(job):
+    """Do nothing, to measure only the plumbing around the workers."""
+
+
+class Pipeline:
+    """Benchmark processing a synthetic scene and writing the products as PNG images."""
+
+    params = [10, 50]
+    param_names = ["num_products"]
+    timeout = 300
+
+    def setup(self, num_products):
+        """Set up the product list and the output directory."""
+        self.output_dir = tempfile.mkdtemp()
+        products = {f"product{i:d}": {"productname": f"product{i:d}",
+                                      "formats": [{"format": "png", "writer": "simple_image"}]}
+                    for i in range(num_products)}
+        self.config = {"product_list": {"output_dir": self.output_dir,
+                                        "fname_pattern": "{start_time:%Y%m%d_%H%M}_{areaname}_{productname}.{format}",
+                                        "areas": {"None": {"areaname": "native", "products": products}}},
+                       "workers": [{"fun": create_fake_scene}, {"fun": resample}, {"fun": save_datasets}]}
+        self.input_mda = {"platform_name": "fake", "sensor": "fake", "start_time": START_TIME}
+
+    def teardown(self, num_products):
+        """Remove the written files."""
+        shutil.rmtree(self.output_dir)
+
+    def time_local_writers(self, num_products):
+        """Time the processing of one message, from the jobs to the written files."""
+        jobs = file_list_to_jobs([], self.config, self.input_mda)
+        process_jobs(self.config["workers"], jobs, Queue())
+
+
+class LauncherOverhead:
+    """Benchmark the launcher plumbing for messages whose processing does nothing.
+
+    The time is for :data:`NUM_MESSAGES` messages, including reading the
+    product list, the queued logging and checking the (missing) results,
+    and, for the warm workers, starting the worker process.
+    """
+
+    params = ["threaded", "warm_workers"]
+    param_names = ["mode"]
+    timeout = 300
+
+    def setup(self, mode):
+        """Write the product list and create the messages."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.product_list = os.path.join(self.tmp_dir, "product_list.yaml")
+        with open(self.product_list, "w") as fd:
+            fd.write(yaml.safe_dump({"product_list": {"output_dir": self.tmp_dir, "areas": {"None": {}}}}))
+            fd.write(f"workers:\n  - fun: !!python/name:{__name__}.do_nothing ''\n")
+        self.messages = [Message("/benchmark", "file", {"uri": f"/data/input/file{i:d}.nc", "uid": f"file{i:d}.nc",
+                                                        "platform_name": "fake", "start_time": START_TIME})
+                         for i in range(NUM_MESSAGES)]
+
+    def teardown(self, mode):
+        """Remove the product list."""
+        shutil.rmtree(self.tmp_dir)
+
+    def time_messages(self, mode):
+        """Time running the messages through the launcher."""
+        runner = Runner(self.product_list, {}, threaded=(mode == "threaded"), warm_workers=(mode == "warm_workers"))
+        with logging_on(QUIET_LOG_CONFIG):
+            if mode == "threaded":
+                runner._run_threaded(self.messages)
+            else:
+                runner._run_warm_workers(self.messages)
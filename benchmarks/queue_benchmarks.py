@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2026 Pytroll developers
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+"""Benchmarks for the queues between the subprocesses and the launcher."""
+
+import logging
+from logging.handlers import QueueHandler
+
+from trollflow2 import create_queue, get_manager
+from trollflow2.logging import BatchingQueueHandler
+
+NUM_ITEMS = 1000
+
+
+def _create_queue(transport):
+    if transport == "manager":
+        return get_manager().Queue()
+    return create_queue()
+
+
+class ProducedFiles:
+    """Benchmark sending the produced files through the queue."""
+
+    params = ["manager", "pipe"]
+    param_names = ["transport"]
+
+    def setup(self, transport):
+        """Set up the queue and the filenames."""
+        self.queue = _create_queue(transport)
+        self.filenames = [f"/data/output/20260101_1200_area{i:d}_product.tif" for i in range(NUM_ITEMS)]
+
+    def time_put_and_drain(self, transport):
+        """Time putting the filenames in the queue and getting them back."""
+        for filename in self.filenames:
+            self.queue.put(filename)
+        for _ in self.filenames:
+            self.queue.get()
+
+
+class QueuedLogging:
+    """Benchmark sending log records through the queue, one by one or in batches."""
+
+    params = ["manager", "pipe", "pipe_batched"]
+    param_names = ["transport"]
+
+    def setup(self, transport):
+        """Set up the queue and a logger using it."""
+        self.queue = _create_queue(transport)
+        self.logger = logging.getLogger("queue_benchmark")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        if transport == "pipe_batched":
+            self.handler = BatchingQueueHandler(self.queue, flush_interval=60)
+        else:
+            self.handler = QueueHandler(self.queue)
+        self.logger.addHandler(self.handler)
+
+    def teardown(self, transport):
+        """Remove the queue handler."""
+        self.logger.removeHandler(self.handler)
+        self.handler.close()
+
+    def time_log_and_drain(self, transport):
+        """Time logging the records and getting them back."""
+        for i in range(NUM_ITEMS):
+            self.logger.debug("Processing product %d", i)
+        self.handler.flush()
+        received = 0
+        while received < NUM_ITEMS:
+            item = self.queue.get()
+            received += len(item) if isinstance(item, list) else 1
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2026 Pytroll developers
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+"""Run the benchmarks without asv, and compare them with the recorded baselines.
+
+The benchmarks follow the asv conventions, so they can also be run with
+``asv run``, but asv results are kept per machine and commit.  This runner
+times the benchmarks of the current tree and compares them with the
+baselines committed in ``benchmarks/baselines.json``::
+
+    python -m benchmarks.run_benchmarks                   # compare with the baselines
+    python -m benchmarks.run_benchmarks -b ReadConfig     # only the matching benchmarks
+    python -m benchmarks.run_benchmarks --save            # record new baselines
+
+The exit code is 1 if a benchmark is slower than its baseline by more than
+the threshold factor.  The timings depend on the machine they were recorded
+on, so they are only compared for regressions on the same kind of machine,
+see :func:`get_machine_info`.  On other machines, record the baselines again
+first.
+
+The benchmarks with a ``_previous`` counterpart, eg. ``time_job`` and
+``time_job_previous``, are also compared as the ratio of the two timings,
+which hardly depends on the machine, so these ratios are always compared
+with the baseline ratios.
+"""
+
+import argparse
+import importlib
+import inspect
+import itertools
+import json
+import os
+import platform
+import re
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINES = os.path.join(BENCHMARK_DIR, "baselines.json")
+DEFAULT_THRESHOLD = 1.5
+MIN_SAMPLE_TIME = 0.1
+
+
+def discover_benchmarks(pattern=None):
+    """Yield the name and the function to time of each benchmark matching the *pattern* regex."""
+    for module_name in sorted(fname[:-3] for fname in os.listdir(BENCHMARK_DIR)
+                              if fname.endswith("_benchmarks.py")):
+        module = importlib.import_module(f"{__package__}.{module_name}")
+        for class_name, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ != module.__name__:
+                continue
+            for method_name in sorted(name for name in dir(cls) if name.startswith("time_")):
+                for params in _get_param_combinations(cls):
+                    name = f"{module_name}.{class_name}.{method_name}"
+                    if params:
+                        name += "(" + ", ".join(map(str, params)) + ")"
+                    if pattern is None or re.search(pattern, name):
+                        yield name, cls, method_name, params
+
+
+def _get_param_combinations(cls):
+    """Get the parameter combinations of a benchmark class, as asv does."""
+    params = getattr(cls, "params", [])
+    if not params:
+        return [()]
+    if not isinstance(params[0], (list, tuple)):
+        params = [params]
+    return list(itertools.product(*params))
+
+
+def measure_benchmark(cls, method_name, params, repeat=5, max_time=20.0):
+    """Time a benchmark method, and return the time of one call in seconds.
+
+    Fast benchmarks are called several times per sample, and samples are
+    taken until *repeat* samples are collected or *max_time* seconds have
+    passed.  The fastest sample is used, as it is the least disturbed by the
+    rest of the machine.
+    """
+    benchmark = cls()
+    if hasattr(benchmark, "setup"):
+        benchmark.setup(*params)
+    try:
+        func = getattr(benchmark, method_name)
+        number = 1
+        while (elapsed := _time_calls(func, params, number)) < MIN_SAMPLE_TIME:
+            number *= 10
+        samples = [elapsed / number]
+        start = time.perf_counter()
+        while len(samples) < repeat and time.perf_counter() - start < max_time:
+            samples.append(_time_calls(func, params, number) / number)
+    finally:
+        if hasattr(benchmark, "teardown"):
+            benchmark.teardown(*params)
+    return min(samples)
+
+
+def _time_calls(func, params, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        func(*params)
+    return time.perf_counter() - start
+
+
+def get_ratios(results):
+    """Get the ratios of the timings in *results* to the ones of their ``_previous`` counterpart."""
+    ratios = {}
+    for name, current in results.items():
+        method, paren, params = name.partition("(")
+        previous = results.get(f"{method}_previous{paren}{params}")
+        if previous is not None:
+            ratios[f"{method}/previous{paren}{params}"] = current / previous
+    return ratios
+
+
+def compare(results, baselines, threshold=DEFAULT_THRESHOLD, formatter=None):
+    """Compare the *results* with the *baselines*, print the comparison and return the regressions."""
+    formatter = formatter or _format_time
+    regressions = []
+    if not results:
+        return regressions
+    width = max(len(name) for name in results)
+    print(f"{'benchmark':{width}s} {'baseline':>10s} {'current':>10s} {'ratio':>7s}")
+    for name, current in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            print(f"{name:{width}s} {'-':>10s} {formatter(current):>10s} {'new':>7s}")
+            continue
+        ratio = current / baseline
+        flag = ""
+        if ratio > threshold:
+            flag = "  slower"
+            regressions.append(name)
+        elif ratio < 1 / threshold:
+            flag = "  faster"
+        print(f"{name:{width}s} {formatter(baseline):>10s} {formatter(current):>10s} {ratio:7.2f}{flag}")
+    return regressions
+
+
+def _format_time(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+def _format_ratio(ratio):
+    return f"{ratio:.3g}x"
+
+
+def get_machine_info():
+    """Get the description of the machine the timings depend on."""
+    return {"machine": platform.machine(), "processor": _get_processor(), "cpu_count": os.cpu_count(),
+            "python": ".".join(platform.python_version_tuple()[:2])}
+
+
+def _get_processor():
+    """Get the processor model, which platform.processor() doesn't give on Linux."""
+    try:
+        with open("/proc/cpuinfo") as fd:
+            for line in fd:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def read_baselines(filename):
+    """Read the baselines, or return empty baselines if the file doesn't exist."""
+    try:
+        with open(filename) as fd:
+            return json.load(fd)
+    except FileNotFoundError:
+        return {"machine": {}, "results": {}, "ratios": {}}
+
+
+def save_baselines(filename, results):
+    """Save the *results* as baselines, keeping the baselines of the benchmarks not run."""
+    baselines = read_baselines(filename)
+    baselines["machine"] = get_machine_info()
+    baselines["results"].update(results)
+    baselines["results"] = dict(sorted(baselines["results"].items()))
+    baselines.setdefault("ratios", {}).update(get_ratios(results))
+    baselines["ratios"] = dict(sorted(baselines["ratios"].items()))
+    with open(filename, "w") as fd:
+        json.dump(baselines, fd, indent=2)
+        fd.write("\n")
+
+
+def parse_args(args_in):
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(description="Run the trollflow2 benchmarks and compare them with baselines.")
+    parser.add_argument("-b", "--bench", default=None,
+                        help="Run only the benchmarks whose name matches this regular expression.")
+    parser.add_argument("--baselines", default=DEFAULT_BASELINES,
+                        help="The baselines file. Default: benchmarks/baselines.json")
+    parser.add_argument("--save", action="store_true",
+                        help="Save the results as the new baselines instead of comparing.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Factor of slowdown reported as a regression. Default: {DEFAULT_THRESHOLD}")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Number of samples per benchmark. Default: 5")
+    return parser.parse_args(args_in)
+
+
+def main(args_in=None):
+    """Run the benchmarks."""
+    args = parse_args(args_in)
+    results = {}
+    for name, cls, method_name, params in discover_benchmarks(args.bench):
+        results[name] = measure_benchmark(cls, method_name, params, repeat=args.repeat)
+        print(f"{name}: {_format_time(results[name])}", file=sys.stderr)
+    if args.save:
+        save_baselines(args.baselines, results)
+        return 0
+    baselines = read_baselines(args.baselines)
+    regressions = compare(results, baselines["results"], args.threshold)
+    if baselines["machine"] != get_machine_info():
+        print(f"The baselines were recorded on another machine ({baselines['machine']}), "
+              "only the ratios to the previous implementations are checked for regressions")
+        regressions = []
+    print()
+    regressions += compare(get_ratios(results), baselines.get("ratios", {}), args.threshold, _format_ratio)
+    if regressions:
+        print(f"{len(regressions):d} benchmarks are slower than their baseline")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
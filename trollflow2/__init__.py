@@ -27,7 +27,7 @@
 
 from functools import cache
 from importlib.metadata import version
-from multiprocessing import Manager
+from multiprocessing import Manager, get_context
 
 
 @cache
@@ -35,4 +35,14 @@ def get_manager():
     """Create a singleton Manager."""
     return Manager()
 
+
+def create_queue(maxsize=0):
+    """Create a queue to send items from the spawned subprocesses to the launcher.
+
+    Contrary to a Manager queue, the items are sent directly through a pipe
+    instead of a round trip to the Manager server process for each item.  The
+    queue can only be given to a subprocess when the subprocess is created.
+    """
+    return get_context('spawn').Queue(maxsize)
+
 __version__ = version(__name__)
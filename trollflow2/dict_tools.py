@@ -20,7 +20,7 @@
 # are not necessary
 """Tools for product list operations."""
 
-import dpath
+from collections.abc import Mapping
 
 
 def plist_iter(product_list, base_mda=None, level=None):
@@ -32,22 +32,24 @@ def plist_iter(product_list, base_mda=None, level=None):
 
     *base_mda* provides the base configuration to include, and *level* (one of
     'area', 'product', or None (default, all levels included)) is the max depth
-    to walk the product list at.
+    to walk the product list at.  The products without formats are written
+    in the formats of *base_mda*, or in GeoTIFF if there are none.
     """
     if base_mda is None:
         base_mda = {}
-    else:
-        base_mda = base_mda.copy()
+    pl_config = base_mda.copy()
+    pl_config.update(product_list)
+    pl_config.pop('areas', None)
+    pl_formats = product_list.get('formats')
     for area, area_config in product_list['areas'].items():
-        aconfig = base_mda.copy()
-        aconfig.update(product_list)
-        aconfig.pop('areas', None)
+        aconfig = pl_config.copy()
         aconfig.update(area_config)
         aconfig.pop('products', None)
         aconfig['area'] = area
         if level == 'area':
             yield aconfig, area_config
             continue
+        area_formats = area_config.get('formats', pl_formats)
         for prod, prod_config in area_config['products'].items():
             pconfig = aconfig.copy()
             pconfig.update(prod_config)
@@ -55,13 +57,19 @@ def plist_iter(product_list, base_mda=None, level=None):
             if level == 'product':
                 yield pconfig, prod_config
                 continue
-            for file_config in pconfig.get('formats', [{'format': 'tif', 'writer': 'geotiff'}]):
+            pconfig.pop('formats', None)
+            formats = prod_config.get('formats', area_formats)
+            if formats is None:
+                formats = [dict(file_config) for file_config in base_mda.get('formats') or _DEFAULT_FORMATS]
+            for file_config in formats:
                 fconfig = pconfig.copy()
-                fconfig.pop('formats', None)
                 fconfig.update(file_config)
                 yield fconfig, file_config
 
 
+_DEFAULT_FORMATS = ({'format': 'tif', 'writer': 'geotiff'}, )
+
+
 def gen_dict_extract(var, key):
     """Generate the values of *key* recusively from the dict *var*."""
     if hasattr(var, 'items'):
@@ -81,19 +89,67 @@ def get_config_value(config, path, key, default=None):
     """Get the most local config value for key *key* starting from the dictionary path *path*.
 
     If nothing is found, path "/common/" is also checked, and if still nothing is found, return *default*.
+    The levels holding the areas and the products themselves (eg. "/product_list/areas") are skipped.
     """
-    path_parts = path.split('/')
+    path_parts = path.strip('/').split('/')
     # Loop starting from the current path, and continue upwards
     # towards the root until something is found
-    num = len(path_parts)
-    for i in range(num, 1, -1):
-        pwd = "/".join(path_parts[:i] + [key])
-        vals = dpath.values(config, pwd)
-        if len(vals) > 0:
-            return vals[0]
-
-    vals = dpath.values(config, "/common/" + key)
-    if len(vals) > 0:
-        return vals[0]
-
-    return default
+    for i in range(len(path_parts), 0, -1):
+        if i > 1 and path_parts[i - 1] in _CONTAINER_KEYS:
+            continue
+        try:
+            return _get_node(config, path_parts[:i] + [key])
+        except KeyError:
+            continue
+
+    try:
+        return _get_node(config, ["common", key])
+    except KeyError:
+        return default
+
+
+def delete_config_path(config, path):
+    """Delete the item at the dictionary path *path* from *config*."""
+    path_parts = path.strip('/').split('/')
+    parent = _get_node(config, path_parts[:-1])
+    del parent[_find_key(parent, path_parts[-1])]
+
+
+def _get_node(config, path_parts):
+    """Get the item of *config* at *path_parts*, or raise a KeyError."""
+    node = config
+    for part in path_parts:
+        node = node[_find_key(node, part)]
+    return node
+
+
+def _find_key(node, part):
+    """Find the key in *node* matching the path part *part*.
+
+    The path parts are strings, so eg. a `null` area in the product list is
+    matched by "None".
+    """
+    if not isinstance(node, Mapping):
+        raise KeyError(part)
+    if part in node:
+        return part
+    for key in node:
+        if str(key) == part:
+            return key
+    raise KeyError(part)
+
+
+_CONTAINER_KEYS = ("areas", "products")
+
+
+def copy_containers(obj):
+    """Copy the dicts and lists in *obj*, but not the other items.
+
+    This is much faster than `copy.deepcopy`, and enough to modify the copy
+    of a product list without affecting the original.
+    """
+    if isinstance(obj, dict):
+        return {key: copy_containers(val) for key, val in obj.items()}
+    if isinstance(obj, list):
+        return [copy_containers(val) for val in obj]
+    return obj
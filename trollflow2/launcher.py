@@ -33,15 +33,22 @@ import gc
 import logging
 import os
 import re
+import resource
 import signal
+import sys
+import threading
+import time
 import traceback
-from collections import OrderedDict
-from contextlib import suppress
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, suppress
 from datetime import datetime
-from queue import Empty
+from functools import cache, partial
+from queue import Empty, Queue
 from urllib.parse import urlsplit
 
 import yaml
+from dask.callbacks import Callback
 from yaml import BaseLoader, SafeLoader, UnsafeLoader
 
 try:
@@ -49,15 +56,22 @@ try:
 except ImportError:
     ListenerContainer = None
 
-from trollflow2 import get_manager
-from trollflow2.dict_tools import gen_dict_extract, plist_iter
+from trollflow2 import create_queue
+from trollflow2.dict_tools import copy_containers, gen_dict_extract
 from trollflow2.logging import (create_logged_process, logging_on,
                                 queued_logging)
-from trollflow2.plugins import AbortProcessing
+from trollflow2.metrics import Metrics, MetricsServer
+from trollflow2.plugins import (AREA_REGISTRY, AbortProcessing, FilePublisher,
+                                SharedScene, preload_areas,
+                                use_launcher_publisher)
 
 logger = logging.getLogger(__name__)
 DEFAULT_PRIORITY = 999
 VALID_MESSAGE_TYPES = ("file", "dataset", "collection")
+DEFAULT_CHECK_WORKERS = 4
+PRODUCT_LIST_CACHE = None
+# The arguments of the jobs that are queues to send the results back to the launcher
+RESULT_QUEUES = ("produced_files", "worker_timings")
 
 
 def tuple_constructor(loader, node):
@@ -87,29 +101,32 @@ def get_test_message(test_message_file):
     return msg
 
 
-def check_results(produced_files, start_time: datetime, exitcode: int):
-    """Make sure the composites have been saved."""
-    end_time = datetime.now()
-    error_detected = False
-    try:
-        qsize = produced_files.qsize()
-    except NotImplementedError:  # MacOS
-        qsize = None
-    while True:
-        try:
-            saved_file = produced_files.get(block=False)
-            try:
-                error_detected = _check_file(saved_file)
-            except FileNotFoundError:
-                logger.error("Missing file: %s", saved_file)
-                error_detected = True
-            except NotImplementedError as err:
-                logger.error(err)
-                error_detected = True
-            if error_detected:
-                break
-        except Empty:
-            break
+def check_results(produced_files, start_time: datetime, exitcode: int, end_time=None,
+                  validate=False, max_workers=DEFAULT_CHECK_WORKERS, metrics=None, worker_timings=None):
+    """Make sure the composites have been saved.
+
+    All the produced files are checked concurrently in *max_workers* threads,
+    and with *validate*, the GeoTIFF and NetCDF files are also opened to check
+    that they are readable.  Return the report of the checks, with the
+    problem found for each file, or None if the file is fine.
+
+    The :class:`WorkerTimings` sent in the *worker_timings* queue are logged.
+    If *metrics* are given, the outcome of the job is recorded in them.
+    """
+    if end_time is None:
+        end_time = datetime.now()
+    saved_files = _get_queued_items(produced_files)
+    timings = _get_queued_items(worker_timings) if worker_timings is not None else []
+    for job_timings in timings:
+        _log_worker_timings(job_timings)
+    checks = _check_files(saved_files, validate, max_workers)
+    report = {fname: problem for fname, (problem, _size) in checks.items()}
+    problems = {fname: problem for fname, problem in report.items() if problem is not None}
+    for fname, problem in problems.items():
+        logger.error("%s: %s", problem, fname)
+    if problems:
+        logger.error("%d of the %d produced files have problems", len(problems), len(report))
+    error_detected = bool(problems)
     if exitcode != 0:
         error_detected = True
         if exitcode < 0:
@@ -118,29 +135,127 @@ def check_results(produced_files, start_time: datetime, exitcode: int):
             logger.critical('Process crashed with exit code %d', exitcode)
     if not error_detected:
         elapsed = end_time - start_time
-        if qsize is not None:
-            logger.info(f'All {qsize:d} files produced nominally in '
-                        f"{elapsed!s}", extra={"time": elapsed})
-        else:
-            logger.info(f'All files produced nominally in '
-                        f"{elapsed!s}", extra={"time": elapsed})
+        logger.info(f'All {len(saved_files):d} files produced nominally in '
+                    f"{elapsed!s}", extra={"time": elapsed})
+    if metrics is not None:
+        _record_job_metrics(metrics, exitcode, error_detected, checks, timings)
+    return report
+
+
+def _record_job_metrics(metrics, exitcode, error_detected, checks, timings):
+    metrics.inc("trollflow2_job_exit_codes", exitcode=exitcode)
+    metrics.inc("trollflow2_messages_failed" if error_detected else "trollflow2_messages_processed")
+    sizes = [size for _problem, size in checks.values() if size]
+    metrics.inc("trollflow2_produced_files", len(sizes))
+    metrics.inc("trollflow2_produced_bytes", sum(sizes))
+    for worker_timings in timings:
+        for worker, stats in worker_timings.items():
+            metrics.observe("trollflow2_worker_duration_seconds", stats['wall_time'], worker=worker)
+        if worker_timings.peak_rss is not None:
+            metrics.set("trollflow2_job_peak_rss_megabytes", worker_timings.peak_rss,
+                        scope=worker_timings.peak_rss_scope)
+
+
+def _get_queued_items(items_queue):
+    """Get the items in *items_queue*."""
+    items = []
+    while True:
+        try:
+            items.append(items_queue.get(block=False))
+        except Empty:
+            return items
+
+
+def _log_worker_timings(timings):
+    summary = ", ".join(f"{worker} {stats['wall_time']:.2f} s" for worker, stats in timings.items())
+    logger.info("Worker timings: %s", summary, extra={"worker_timings": dict(timings)})
+
+
+def _check_files(saved_files, validate=False, max_workers=DEFAULT_CHECK_WORKERS):
+    """Check the saved files concurrently.
+
+    The files saved in S3 are checked together, with one listing per prefix.
+    Return the problem found and the size of each file.
+    """
+    s3_files = {fname for fname in saved_files if urlsplit(fname).scheme == 's3'}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="check_results") as executor:
+        futures = {fname: executor.submit(_check_file, fname, validate)
+                   for fname in saved_files if fname not in s3_files}
+        if s3_files:
+            s3_future = executor.submit(_check_s3_files, s3_files)
+    report = {fname: future.result() for fname, future in futures.items()}
+    if s3_files:
+        report.update(s3_future.result())
+    return {fname: report[fname] for fname in saved_files}
+
+
+def _check_s3_files(s3_files):
+    from trollflow2.plugins.s3 import get_s3_file_sizes
+    return {fname: (_get_size_problem(size), size) for fname, size in get_s3_file_sizes(s3_files).items()}
 
 
-def _check_file(saved_file):
+def _check_file(saved_file, validate=False):
+    """Check *saved_file*, return the problem found or None, and the file size."""
+    try:
+        size = _get_file_size(saved_file)
+    except FileNotFoundError:
+        size = None
+    except NotImplementedError as err:
+        return str(err), None
+    problem = _get_size_problem(size)
+    if problem is None and validate:
+        problem = _validate_file(saved_file)
+    return problem, size
+
+
+def _get_size_problem(size):
+    if size is None:
+        return "Missing file"
+    if size == 0:
+        return "Empty file detected"
+    return None
+
+
+def _get_file_size(saved_file):
     file_scheme = urlsplit(saved_file).scheme
     if file_scheme in ('', 'file'):
-        return _check_local_file(saved_file)
-    if file_scheme == 's3':
-        from trollflow2.plugins.s3 import check_s3_file
-        return check_s3_file(saved_file)
-    raise NotImplementedError("File check not impleneted for remote filesystem %s" % file_scheme)
+        return os.path.getsize(saved_file)
+    from fsspec.core import url_to_fs
+    try:
+        filesystem, path = url_to_fs(saved_file)
+    except (ImportError, ValueError):
+        raise NotImplementedError("File check not implemented for remote filesystem %s" % file_scheme)
+    return filesystem.size(path)
 
 
-def _check_local_file(saved_file):
-    if os.path.getsize(saved_file) == 0:
-        logger.error("Empty file detected: %s", saved_file)
-        return True
-    return False
+def _validate_file(saved_file):
+    """Check that the local GeoTIFF or NetCDF *saved_file* can be opened.
+
+    If the library needed to open the file is not installed, the file is not
+    validated, and a warning is logged the first time.
+    """
+    if urlsplit(saved_file).scheme not in ('', 'file'):
+        return None
+    extension = os.path.splitext(saved_file)[1].lower()
+    try:
+        if extension in ('.tif', '.tiff'):
+            import rasterio
+            with rasterio.open(saved_file):
+                pass
+        elif extension in ('.nc', '.nc4'):
+            from netCDF4 import Dataset
+            with Dataset(saved_file):
+                pass
+    except ImportError as err:
+        _warn_not_validated(extension, err.name)
+    except Exception as err:
+        return f"Unreadable file ({err!s})"
+    return None
+
+
+@cache
+def _warn_not_validated(extension, module_name):
+    logger.warning("Cannot import %s, the %s files are not validated.", module_name, extension)
 
 
 def generate_messages(connection_parameters):
@@ -183,25 +298,499 @@ def _create_listener_from_connection_parameters(connection_parameters):
     return listener
 
 
+class JobSlots:
+    """Keep track of the jobs running concurrently.
+
+    At most *max_jobs* jobs are allowed to run at the same time.  Optionally,
+    the number of jobs running for the same message topic
+    (*max_jobs_per_topic*) or the same platform (*max_jobs_per_platform*) can
+    be limited further.
+
+    The messages are submitted with :meth:`submit`, and wait in order of
+    arrival until they can start.  A message waiting because its topic or
+    platform has too many jobs running doesn't hold back the messages of the
+    other topics or platforms.
+    """
+
+    def __init__(self, max_jobs=1, max_jobs_per_topic=None, max_jobs_per_platform=None):
+        """Set up the slots."""
+        for name, limit in (("max_jobs", max_jobs), ("max_jobs_per_topic", max_jobs_per_topic),
+                            ("max_jobs_per_platform", max_jobs_per_platform)):
+            if limit is not None and limit < 1:
+                raise ValueError(f"{name} must be at least 1, got {limit}")
+        self.max_jobs = max_jobs
+        self._limits = {"topic": max_jobs_per_topic,
+                        "platform_name": max_jobs_per_platform}
+        self._running = 0
+        self._running_per_key = Counter()
+        self._pending = []
+        self._condition = threading.Condition()
+
+    def _get_keys(self, msg):
+        keys = []
+        if self._limits["topic"] is not None:
+            keys.append(("topic", getattr(msg, "subject", None)))
+        if self._limits["platform_name"] is not None:
+            data = getattr(msg, "data", None)
+            platform_name = data.get("platform_name") if isinstance(data, dict) else None
+            keys.append(("platform_name", platform_name))
+        return keys
+
+    def _is_free(self, keys):
+        if self._running >= self.max_jobs:
+            return False
+        return all(self._running_per_key[key] < self._limits[key[0]] for key in keys)
+
+    def submit(self, msg):
+        """Submit *msg*, and get the messages that can start now, with the time they waited.
+
+        The slots of the returned messages are reserved, and must be released
+        with :meth:`release` when their jobs are finished.
+        """
+        with self._condition:
+            self._pending.append((msg, self._get_keys(msg), time.monotonic()))
+            return self._reserve_pending()
+
+    def _reserve_pending(self):
+        ready = []
+        for item in list(self._pending):
+            msg, keys, submit_time = item
+            if self._running >= self.max_jobs:
+                break
+            if not self._is_free(keys):
+                continue
+            self._pending.remove(item)
+            self._running += 1
+            self._running_per_key.update(keys)
+            ready.append((msg, time.monotonic() - submit_time))
+        if self._pending and not ready:
+            logger.debug("Waiting for a free job slot.")
+        return ready
+
+    def wait_for_free_slot(self):
+        """Wait until fewer than the maximum number of jobs are running."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._running < self.max_jobs)
+
+    def release(self, msg):
+        """Release the slot reserved for *msg*, and get the waiting messages that can start now.
+
+        See :meth:`submit` for the returned messages.
+        """
+        keys = self._get_keys(msg)
+        with self._condition:
+            self._running -= 1
+            self._running_per_key.subtract(keys)
+            ready = self._reserve_pending()
+            self._condition.notify_all()
+        return ready
+
+    def wait_until_idle(self):
+        """Wait until all the running jobs are finished."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._running == 0 and not self._pending)
+
+
+class WarmWorkerPool:
+    """A pool of long-lived worker processes.
+
+    The worker processes import all the heavy libraries (Satpy, Pyresample,
+    Dask, ...) as soon as they are started, and take one job at a time.  To
+    prevent any memory buildup, a worker is replaced after it has run
+    *max_jobs_per_worker* jobs, when its peak memory usage exceeds *max_rss*
+    megabytes, or when a job crashes.  The replacement is started right away,
+    so that it is warm when the next job comes.
+
+    The :meth:`create_process` method can be used as a drop-in replacement for
+    :func:`~trollflow2.logging.create_logged_process`.
+    """
+
+    def __init__(self, max_jobs_per_worker=None, max_rss=None, publisher_queue=None):
+        """Set up the pool.
+
+        The *publisher_queue* of the :class:`LauncherPublisher`, if any, is
+        given to the workers when they are started, as it can't be sent to
+        them with the jobs.
+        """
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_rss = max_rss
+        self.publisher_queue = publisher_queue
+        self._idle_workers = []
+        self._lock = threading.Lock()
+
+    def start(self, num_workers=1):
+        """Start *num_workers* workers, so that they are warm when the first jobs come."""
+        workers = [WarmWorker(self.max_jobs_per_worker, self.max_rss, self.publisher_queue) for _ in range(num_workers)]
+        with self._lock:
+            self._idle_workers.extend(workers)
+
+    def create_process(self, target, args, kwargs=None):
+        """Create a process-like job that will be run in one of the warm workers."""
+        return WarmJob(self, target, args, kwargs or {})
+
+    def get_worker(self):
+        """Get an idle worker, start a new one if none is available."""
+        with self._lock:
+            while self._idle_workers:
+                worker = self._idle_workers.pop()
+                if worker.is_alive():
+                    return worker
+        return WarmWorker(self.max_jobs_per_worker, self.max_rss, self.publisher_queue)
+
+    def release_worker(self, worker):
+        """Put the worker back in the pool, or replace it if it is retired."""
+        if worker.retired:
+            worker.join()
+            worker = WarmWorker(self.max_jobs_per_worker, self.max_rss, self.publisher_queue)
+        with self._lock:
+            self._idle_workers.append(worker)
+
+    def shutdown(self):
+        """Stop all the idle workers."""
+        with self._lock:
+            workers, self._idle_workers = self._idle_workers, []
+        for worker in workers:
+            worker.stop()
+
+
+class WarmWorker:
+    """A long-lived worker process."""
+
+    def __init__(self, max_jobs=None, max_rss=None, publisher_queue=None):
+        """Start the worker process."""
+        from multiprocessing import get_context
+        ctx = get_context('spawn')
+        self.jobs = ctx.SimpleQueue()
+        self.results = ctx.Queue()
+        self.retired = False
+        self.proc = create_logged_process(target=warm_worker_loop, args=(self.jobs, self.results),
+                                          kwargs=dict(max_jobs=max_jobs, max_rss=max_rss,
+                                                      publisher_queue=publisher_queue))
+        self.proc.start()
+        logger.debug("Started warm worker with pid %s", str(self.proc.pid))
+
+    def is_alive(self):
+        """Check if the worker process is alive."""
+        return self.proc.is_alive()
+
+    def submit(self, target, args, kwargs, result_queues=()):
+        """Submit a job to the worker.
+
+        The job is given senders for the *result_queues*, see :data:`RESULT_QUEUES`.
+        """
+        self.jobs.put((target, args, kwargs, tuple(result_queues)))
+
+    def get_result(self, result_queues):
+        """Wait for the current job to finish and return its exit code.
+
+        The items sent by the job are put in the *result_queues*, a dict of
+        queues keyed by name.
+        """
+        while True:
+            try:
+                result = self.results.get(timeout=1)
+            except Empty:
+                if not self.proc.is_alive():
+                    break
+                continue
+            if result[0] == 'result':
+                result_queues[result[1]].put(result[2])
+                continue
+            _, exitcode, self.retired = result
+            return exitcode
+        self.retired = True
+        with suppress(Empty):
+            while (result := self.results.get_nowait())[0] == 'result':
+                result_queues[result[1]].put(result[2])
+            return result[1]
+        return self.proc.exitcode
+
+    def join(self):
+        """Wait for the worker process to terminate."""
+        self.proc.join()
+
+    def stop(self):
+        """Ask the worker process to stop, and wait for it."""
+        self.jobs.put(None)
+        self.join()
+
+
+class WarmJob:
+    """A job run in a warm worker, with the same interface as a Process."""
+
+    def __init__(self, pool, target, args, kwargs):
+        """Set up the job."""
+        self.pool = pool
+        self.target = target
+        self.args = args
+        self.kwargs = kwargs.copy()
+        # The produced files and the timings are sent back with the results of the worker
+        self.result_queues = {name: self.kwargs.pop(name) for name in RESULT_QUEUES if name in self.kwargs}
+        # The worker got the publisher queue when it was started
+        self.kwargs.pop('publisher_queue', None)
+        self.worker = None
+        self.exitcode = None
+
+    def start(self):
+        """Start the job."""
+        self.worker = self.pool.get_worker()
+        self.worker.submit(self.target, self.args, self.kwargs, self.result_queues.keys())
+
+    def join(self):
+        """Wait for the job to finish."""
+        self.exitcode = self.worker.get_result(self.result_queues)
+        self.pool.release_worker(self.worker)
+
+
+class SubprocessJob:
+    """A job run in a new subprocess, with the same interface as a Process.
+
+    The produced files and the worker timings (see :data:`RESULT_QUEUES`) are
+    sent from the subprocess through pipe-based queues (see
+    :func:`~trollflow2.create_queue`), and forwarded to the queues of the job
+    while it runs, so that the subprocess never waits for a full pipe to be
+    read.
+    """
+
+    def __init__(self, target, args, kwargs):
+        """Set up the job."""
+        self._queues = {name: create_queue() for name in RESULT_QUEUES if name in kwargs}
+        self.proc = create_logged_process(target=target, args=args, kwargs=dict(kwargs, **self._queues))
+        self._forwarders = [threading.Thread(target=_forward_items, args=(pipe_queue, kwargs[name]), daemon=True)
+                            for name, pipe_queue in self._queues.items()]
+
+    def start(self):
+        """Start the job."""
+        self.proc.start()
+        for forwarder in self._forwarders:
+            forwarder.start()
+
+    def join(self):
+        """Wait for the job to finish, and for all the results to be forwarded."""
+        try:
+            self.proc.join()
+        finally:
+            for pipe_queue, forwarder in zip(self._queues.values(), self._forwarders):
+                pipe_queue.put(None)
+                forwarder.join()
+                pipe_queue.close()
+
+    @property
+    def exitcode(self):
+        """Get the exit code of the subprocess."""
+        return self.proc.exitcode
+
+
+def _forward_items(source, destination):
+    """Forward the items of the *source* queue to *destination* until None is received."""
+    while (item := source.get()) is not None:
+        destination.put(item)
+
+
+class _ResultSender:
+    """Send the items of the result queue *name* of a job with the results of the warm worker."""
+
+    def __init__(self, results, name):
+        self._results = results
+        self._name = name
+
+    def put(self, item):
+        """Send *item*."""
+        self._results.put(('result', self._name, item))
+
+
+@queued_logging
+def warm_worker_loop(jobs, results, max_jobs=None, max_rss=None, publisher_queue=None):
+    """Run the jobs from the *jobs* queue until stopped or retired.
+
+    If *publisher_queue* is given, the messages of the file publishers are
+    sent to the :class:`LauncherPublisher` through it.
+
+    The items a job puts in its result queues (see :data:`RESULT_QUEUES`),
+    eg. the produced files, are put in the *results* queue as ``('result',
+    name, item)`` tuples, followed by a ``('done', exitcode, retired)`` tuple
+    at the end of the job.
+    """
+    global PRODUCT_LIST_CACHE
+    with suppress(ValueError):
+        signal.signal(signal.SIGUSR1, print_traces)
+        logger.debug("Use SIGUSR1 on pid {} to check the current tracebacks of this subprocess.".format(os.getpid()))
+    _import_libraries()
+    if publisher_queue is not None:
+        use_launcher_publisher(publisher_queue)
+    PRODUCT_LIST_CACHE = ProductListCache()
+    num_jobs = 0
+    try:
+        while (job := jobs.get()) is not None:
+            target, args, kwargs, result_queues = job
+            num_jobs += 1
+            senders = {name: _ResultSender(results, name) for name in result_queues}
+            try:
+                target(*args, **senders, **kwargs)
+                exitcode = 0
+            except Exception:
+                logger.exception("Job crashed, retiring the worker.")
+                exitcode = 1
+            retired = exitcode != 0 or _worker_is_worn_out(num_jobs, max_jobs, max_rss)
+            results.put(('done', exitcode, retired))
+            if retired:
+                break
+    finally:
+        PRODUCT_LIST_CACHE.clear()
+        logging.shutdown()
+
+
+def _import_libraries():
+    """Import the heavy libraries, so that they are ready for the first job."""
+    import dask.array  # noqa
+    import pyresample  # noqa
+    import satpy  # noqa
+
+    import trollflow2.plugins  # noqa
+
+
+def _worker_is_worn_out(num_jobs, max_jobs, max_rss):
+    """Check if the worker has run too many jobs or uses too much memory."""
+    if max_jobs is not None and num_jobs >= max_jobs:
+        logger.debug("Retiring the worker after %d jobs", num_jobs)
+        return True
+    rss = _get_peak_rss()
+    if max_rss is not None and rss > max_rss:
+        logger.debug("Retiring the worker using %.1f MB of memory", rss)
+        return True
+    return False
+
+
+class LauncherPublisher:
+    """A long-lived publisher for the messages of all the jobs.
+
+    The :class:`~trollflow2.plugins.FilePublisher` workers of the jobs put
+    their messages in :attr:`queue`, and a thread of the launcher sends them.
+    That way, the publisher is started and registered to the nameservers only
+    once, and the subscribers don't miss the first messages of a job while
+    they connect to a new publisher.
+    """
+
+    def __init__(self, port=0, nameservers=None):
+        """Set up the publisher."""
+        self.port = port
+        self.nameservers = nameservers
+        self.pub = None
+        self.queue = None
+        self._thread = None
+
+    def start(self):
+        """Start the publisher and the thread sending the queued messages."""
+        from posttroll.publisher import create_publisher_from_dict_config
+        self.pub = create_publisher_from_dict_config(
+            {
+                'port': self.port,
+                'nameservers': self.nameservers,
+                'name': 'l2processor',
+            }
+        )
+        self.pub.start()
+        # The queue is given to the subprocesses when they are created, see
+        # WarmWorkerPool for the long-lived ones
+        self.queue = create_queue()
+        self._thread = threading.Thread(target=self._run, name="Launcher publisher", daemon=True)
+        self._thread.start()
+        logger.debug("Started the launcher publisher")
+
+    def _run(self):
+        while (msg := self.queue.get()) is not None:
+            try:
+                self.pub.send(msg)
+            except Exception:
+                logger.exception("Sending the message failed")
+
+    def stop(self):
+        """Send the queued messages and stop the publisher."""
+        if self._thread is not None:
+            self.queue.put(None)
+            self._thread.join()
+            self._thread = None
+            self.queue.close()
+        if self.pub is not None:
+            self.pub.stop()
+            self.pub = None
+
+
 class Runner:
     """Class that handles all the administration around running on a product list."""
 
     def __init__(self, product_list, connection_parameters=None,
-                 test_message=None, threaded=False):
-        """Set up the runner."""
+                 test_message=None, threaded=False, max_concurrent_jobs=1,
+                 max_jobs_per_topic=None, max_jobs_per_platform=None, warm_workers=False,
+                 max_jobs_per_worker=None, max_worker_rss=None, publisher_settings=None,
+                 validate_products=False, check_workers=DEFAULT_CHECK_WORKERS, metrics_port=None):
+        """Set up the runner.
+
+        By default, one message is processed at a time.  To allow messages to
+        be processed concurrently (each still in its own subprocess), set
+        *max_concurrent_jobs* to a value larger than 1.  The number of
+        concurrent jobs for a given topic or platform can be further limited
+        with *max_jobs_per_topic* and *max_jobs_per_platform*.
+
+        If *warm_workers* is True, the messages are processed in a pool of
+        long-lived subprocesses instead of a new subprocess for each message.
+        See :class:`WarmWorkerPool` for *max_jobs_per_worker* and
+        *max_worker_rss*.
+
+        If *publisher_settings* is given, the files are published by a single
+        long-lived :class:`LauncherPublisher` created with these settings,
+        instead of a publisher per job.
+
+        The produced files of each message are checked in the background, in
+        *check_workers* threads, so that the checks don't delay the next
+        message.  See :func:`check_results` for *validate_products*.
+
+        If *metrics_port* is given, the metrics of the processing are served
+        on that port by a :class:`~trollflow2.metrics.MetricsServer`.
+        """
         self.product_list = product_list
         self.connection_parameters = connection_parameters
         self.test_message = get_test_message(test_message)
         self.threaded = threaded
+        self.job_slots = JobSlots(max_concurrent_jobs, max_jobs_per_topic, max_jobs_per_platform)
+        self.warm_workers = warm_workers
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_worker_rss = max_worker_rss
+        self.check_options = dict(validate=validate_products, max_workers=check_workers)
+        self.publisher = None
+        if publisher_settings is not None:
+            self.publisher = LauncherPublisher(**publisher_settings)
+        self._product_list_cache = ProductListCache() if threaded else None
+        self._job_starter = None
+        self._followers = []
+        self._followers_lock = threading.Lock()
+        self.metrics = Metrics()
+        self.metrics_server = None
+        if metrics_port is not None:
+            self.metrics_server = MetricsServer(self.metrics, metrics_port)
 
     def run(self):
         """Spawn one or multiple subprocesses or threads to run the jobs from the product list."""
-        messages = self._get_message_iterator()
-
-        if self.threaded:
-            self._run_threaded(messages)
-        else:
-            self._run_subprocess(messages)
+        if self.publisher is not None:
+            self.publisher.start()
+            if self.threaded:
+                # The file publishers of the product list are created when the
+                # product list is first read and cached, in this process
+                use_launcher_publisher(self.publisher.queue)
+        if self.metrics_server is not None:
+            self.metrics_server.start()
+        try:
+            messages = self._get_message_iterator()
+            if self.threaded:
+                self._run_threaded(messages)
+            else:
+                self._run_subprocess(messages)
+        finally:
+            if self.metrics_server is not None:
+                self.metrics_server.stop()
+            if self.publisher is not None:
+                self.publisher.stop()
+                use_launcher_publisher(None)
 
     def _get_message_iterator(self):
         """Get the messages to work on."""
@@ -215,39 +804,136 @@ class Runner:
         return messages
 
     def _fill_in_connection_parameters(self):
-        """Fill in the connection parameters for the message listener."""
-        with open(self.product_list) as fid:
-            config = yaml.load(fid.read(), Loader=BaseLoader)
+        """Fill in the connection parameters for the message listener.
+
+        When the product list is cached in this process, the cached version is
+        used instead of reading the file again.
+        """
+        if self._product_list_cache is not None:
+            product_list = self._product_list_cache.get(self.product_list)['product_list']
+            topics = product_list.get('subscribe_topics')
+        else:
+            with open(self.product_list) as fid:
+                config = yaml.load(fid.read(), Loader=BaseLoader)
+            topics = config['product_list'].pop('subscribe_topics', None)
         if self.connection_parameters is None:
             self.connection_parameters = dict()
         if not self.connection_parameters.get('topic'):
-            self.connection_parameters['topic'] = config['product_list'].pop('subscribe_topics', None)
+            self.connection_parameters['topic'] = topics
 
     def _run_threaded(self, messages):
         """Run in a thread."""
+        global PRODUCT_LIST_CACHE
         logger.debug("Launching trollflow2 with threads")
         from threading import Thread
-        self._run_product_list_on_messages(messages, process, Thread)
+        PRODUCT_LIST_CACHE = self._product_list_cache or ProductListCache()
+        try:
+            self._run_product_list_on_messages(messages, process, Thread)
+        finally:
+            PRODUCT_LIST_CACHE.clear()
+            PRODUCT_LIST_CACHE = None
 
     def _run_subprocess(self, messages):
         """Run in a subprocess, with queued logging."""
+        if self.warm_workers:
+            self._run_warm_workers(messages)
+            return
         logger.debug("Launching trollflow2 with subprocesses")
-        self._run_product_list_on_messages(messages, queue_logged_process, create_logged_process)
+        self._run_product_list_on_messages(messages, queue_logged_process, SubprocessJob)
+
+    def _run_warm_workers(self, messages):
+        """Run in long-lived subprocesses, with queued logging."""
+        logger.debug("Launching trollflow2 with warm worker subprocesses")
+        publisher_queue = self.publisher.queue if self.publisher is not None else None
+        pool = WarmWorkerPool(self.max_jobs_per_worker, self.max_worker_rss, publisher_queue)
+        try:
+            pool.start(self.job_slots.max_jobs)
+            self._run_product_list_on_messages(messages, process, pool.create_process)
+        finally:
+            pool.shutdown()
 
     def _run_product_list_on_messages(self, messages, target_fun, process_creator):
-        """Run the product list on the messages."""
-        for msg in messages:
-            produced_files_queue = get_manager().Queue()
-            kwargs = dict(produced_files=produced_files_queue, prod_list=self.product_list)
-            proc = process_creator(target=target_fun, args=(msg,), kwargs=kwargs)
-            start_time = datetime.now()
-            proc.start()
+        """Run the product list on the messages.
+
+        If more than one job is allowed to run at the same time, the jobs are
+        followed in separate threads, and the next message is picked up as soon
+        as there is a free slot.
+        """
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="result_checker") as checker:
+            self._job_starter = partial(self._start_job, target_fun=target_fun, process_creator=process_creator,
+                                        checker=checker)
+            for msg in messages:
+                self.metrics.inc("trollflow2_messages_received")
+                self._start_jobs(self.job_slots.submit(msg))
+                self.job_slots.wait_for_free_slot()
+            self.job_slots.wait_until_idle()
+            # The last checks are submitted after the slots are released
+            for follower in self._followers:
+                follower.join()
+
+    def _start_jobs(self, ready_messages):
+        """Start the jobs of the *ready_messages*, whose job slots are reserved."""
+        for msg, wait_time in ready_messages:
+            self.metrics.observe("trollflow2_message_queue_wait_seconds", wait_time)
+            try:
+                self._job_starter(msg)
+            except BaseException:
+                self._start_jobs(self.job_slots.release(msg))
+                raise
+
+    def _start_job(self, msg, target_fun, process_creator, checker):
+        """Start the job of *msg*, and follow it until it is finished."""
+        produced_files_queue = Queue()
+        worker_timings_queue = Queue()
+        kwargs = dict(produced_files=produced_files_queue, worker_timings=worker_timings_queue,
+                      prod_list=self.product_list)
+        if self.publisher is not None:
+            kwargs['publisher_queue'] = self.publisher.queue
+        proc = process_creator(target=target_fun, args=(msg,), kwargs=kwargs)
+        start_time = datetime.now()
+        proc.start()
+        job = (msg, proc, produced_files_queue, worker_timings_queue, start_time, checker)
+        if self.job_slots.max_jobs == 1:
+            self._finish_job(*job)
+        else:
+            follower = threading.Thread(target=self._follow_job, args=job, daemon=True)
+            with self._followers_lock:
+                self._followers = [thread for thread in self._followers if thread.is_alive()] + [follower]
+                follower.start()
+
+    def _follow_job(self, msg, *args):
+        """Finish the job of *msg* in a separate thread, logging any error."""
+        try:
+            self._finish_job(msg, *args)
+        except Exception:
+            logger.exception("Following the job of %s failed", str(msg))
+
+    def _finish_job(self, msg, proc, produced_files_queue, worker_timings_queue, start_time, checker):
+        """Wait for the job to finish, and have the results checked by the *checker* executor.
+
+        The jobs of the messages that were waiting for the released slot are
+        then started.
+        """
+        try:
             proc.join()
             try:
                 exitcode = proc.exitcode
             except AttributeError:
                 exitcode = 0
-            check_results(produced_files_queue, start_time, exitcode)
+        except BaseException:
+            self._start_jobs(self.job_slots.release(msg))
+            raise
+        ready_messages = self.job_slots.release(msg)
+        future = checker.submit(check_results, produced_files_queue, start_time, exitcode,
+                                end_time=datetime.now(), metrics=self.metrics,
+                                worker_timings=worker_timings_queue, **self.check_options)
+        future.add_done_callback(_log_check_failure)
+        self._start_jobs(ready_messages)
+
+
+def _log_check_failure(future):
+    if future.exception() is not None:
+        logger.error("Checking the results failed", exc_info=future.exception())
 
 
 def get_area_priorities(product_list):
@@ -274,11 +960,19 @@ def message_to_jobs(msg, product_list):
 
 
 def file_list_to_jobs(input_filenames, product_list, input_mda):
-    """Convert a file list to jobs."""
+    """Convert a file list to jobs.
+
+    The product list of each job is a copy of the dicts and lists of
+    *product_list* (see :func:`~trollflow2.dict_tools.copy_containers`), so
+    the plugins can modify it without affecting *product_list* or the other
+    jobs.
+
+    With the `share_scene` option, all the jobs get the same
+    :class:`~trollflow2.plugins.SharedScene`, so the scene is created and
+    loaded only once.
+    """
     formats = product_list['product_list'].get('formats', None)
-    for _product, pconfig in plist_iter(product_list['product_list'], level='product'):
-        if 'formats' not in pconfig and formats is not None:
-            pconfig['formats'] = copy.deepcopy(formats)
+    shared_scene = SharedScene() if product_list['product_list'].get('share_scene', False) else None
     jobs = OrderedDict()
     priorities = get_area_priorities(product_list)
     # TODO: check the uri is accessible from the current host.
@@ -289,17 +983,27 @@ def file_list_to_jobs(input_filenames, product_list, input_mda):
         jobs[prio]['product_list'] = {}
         for section in product_list:
             if section == 'product_list':
-                if section not in jobs[prio]['product_list']:
-                    jobs[prio]['product_list'][section] = OrderedDict(product_list[section].copy())
-                    del jobs[prio]['product_list'][section]['areas']
-                    jobs[prio]['product_list'][section]['areas'] = OrderedDict()
-                for area in areas:
-                    jobs[prio]['product_list'][section]['areas'][area] = product_list[section]['areas'][area]
+                jobs[prio]['product_list'][section] = _create_job_product_list(product_list[section], areas, formats)
             else:
                 jobs[prio]['product_list'][section] = product_list[section]
+        if shared_scene is not None:
+            jobs[prio]['shared_scene'] = shared_scene
     return jobs
 
 
+def _create_job_product_list(product_list, areas, formats):
+    """Copy *product_list* with only *areas*, and the default *formats* set in every product."""
+    job_product_list = {key: copy_containers(val) for key, val in product_list.items() if key != 'areas'}
+    job_product_list['areas'] = {area: copy_containers(product_list['areas'][area]) for area in areas}
+    if formats is None:
+        return job_product_list
+    for area_config in job_product_list['areas'].values():
+        for pconfig in area_config['products'].values():
+            if 'formats' not in pconfig:
+                pconfig['formats'] = copy_containers(formats)
+    return job_product_list
+
+
 def _extract_filenames(msg):
     """Extract the filenames from *msg*.
 
@@ -333,11 +1037,18 @@ def expand(yml):
 
     PFE http://disq.us/p/1tdbxgx
     """
+    return _expand(yml, set())
+
+
+def _expand(yml, seen):
+    """Expand *yml*, copying the dicts that were *seen* already."""
     if isinstance(yml, dict):
         for key, value in yml.items():
             if isinstance(value, dict):
-                expand(value)
-                yml[key] = copy.deepcopy(yml[key])
+                if id(value) in seen:
+                    value = yml[key] = copy.deepcopy(value)
+                seen.add(id(value))
+                _expand(value, seen)
     return yml
 
 
@@ -368,13 +1079,13 @@ def get_dask_distributed_client(config):
 
 
 @queued_logging
-def queue_logged_process(msg, prod_list, produced_files):
+def queue_logged_process(msg, prod_list, produced_files, publisher_queue=None, worker_timings=None):
     """Run `process` with a queued log."""
     with suppress(ValueError):
         signal.signal(signal.SIGUSR1, print_traces)
         logger.debug("Use SIGUSR1 on pid {} to check the current tracebacks of this subprocess.".format(os.getpid()))
     try:
-        process(msg, prod_list, produced_files)
+        process(msg, prod_list, produced_files, publisher_queue=publisher_queue, worker_timings=worker_timings)
     finally:
         logging.shutdown()
 
@@ -391,70 +1102,379 @@ def print_traces(signum, frame):
         print(file=sys.stderr)
 
 
-def process(msg, prod_list, produced_files):
-    """Process a message."""
-    """Convert a posttroll message *msg* to a list of jobs given a *product_list*."""
+def process(msg, prod_list, produced_files, publisher_queue=None, worker_timings=None):
+    """Process a message.
+
+    If *publisher_queue* is given, the file publishers send their messages to
+    it, for the :class:`LauncherPublisher` to publish them.  See
+    :func:`process_jobs` for *worker_timings*.
+    """
+    if publisher_queue is not None:
+        use_launcher_publisher(publisher_queue)
     input_filenames = _extract_filenames(msg)
     input_mda = msg.data
-    process_files(input_filenames, input_mda, prod_list, produced_files)
+    process_files(input_filenames, input_mda, prod_list, produced_files, worker_timings)
+
 
+def process_files(input_filenames, input_mda, prod_list, produced_files, worker_timings=None):
+    """Process files.
 
-def process_files(input_filenames, input_mda, prod_list, produced_files):
-    """Process files."""
+    If the product list cache is in use (see :class:`ProductListCache`), the
+    product list is read from the cache, and the workers are kept alive for
+    the next message.
+    """
+    if PRODUCT_LIST_CACHE is not None:
+        with PRODUCT_LIST_CACHE.use(prod_list) as config:
+            process_files_from_config(input_filenames, input_mda, config, produced_files, worker_timings)
+        return
     config = read_config(prod_list, Loader=UnsafeLoader)
     client = get_dask_distributed_client(config)
     try:
         config = expand(config)
+        preload_areas(config)
         jobs = file_list_to_jobs(input_filenames, config, input_mda)
-        process_jobs(config["workers"], jobs, produced_files)
+        process_jobs(config["workers"], jobs, produced_files, worker_timings)
     except Exception:
         logger.exception("Process crashed")
-        if "crash_handlers" in config:
-            trace = traceback.format_exc()
-            for hand in config['crash_handlers']['handlers']:
-                hand['fun'](config['crash_handlers']['config'], trace)
+        _run_crash_handlers(config)
         raise
     finally:
         # Remove config and run garbage collection so all remaining
         # references e.g. to FilePublisher should be removed
         logger.debug('Cleaning up')
-        for wrk in config.get("workers", []):
-            try:
-                wrk['fun'].stop()
-            except AttributeError:
-                continue
+        _stop_workers(config)
+        del config
+        with suppress(AttributeError):
+            client.close()
+        gc.collect()
+
+
+def process_files_from_config(input_filenames, input_mda, config, produced_files, worker_timings=None):
+    """Process files using an already read and expanded *config*.
+
+    Contrary to :func:`process_files`, the workers are not stopped at the end.
+    """
+    client = get_dask_distributed_client(config)
+    try:
+        preload_areas(config)
+        jobs = file_list_to_jobs(input_filenames, config, input_mda)
+        process_jobs(config["workers"], jobs, produced_files, worker_timings)
+    except Exception:
+        logger.exception("Process crashed")
+        _run_crash_handlers(config)
+        raise
+    finally:
+        logger.debug('Cleaning up')
         del config
         with suppress(AttributeError):
             client.close()
         gc.collect()
 
 
-def process_jobs(workers, jobs, produced_files):
-    """Process the jobs."""
-    for prio in sorted(jobs.keys()):
-        job = jobs[prio]
-        job['processing_priority'] = prio
-        job['produced_files'] = produced_files
+def _run_crash_handlers(config):
+    if "crash_handlers" in config:
+        trace = traceback.format_exc()
+        for hand in config['crash_handlers']['handlers']:
+            hand['fun'](config['crash_handlers']['config'], trace)
+
+
+class ProductListCache:
+    """Cache for the read and expanded product lists.
+
+    The product lists are kept in memory, keyed by filename, and read again
+    only when the file modification time or size changes.  This makes it
+    possible to update the product list without restarting a long-running
+    launcher.
+
+    The configuration is shared between the jobs: the jobs get copies of the
+    product list (see :func:`file_list_to_jobs`), and the workers are stopped
+    only when the product list is reloaded or the cache is cleared.  The
+    workers of a reloaded product list are stopped once the jobs using it,
+    see :meth:`use`, are finished.  The preloaded areas are dropped when a
+    product list is reloaded, so that they are read again from the area
+    files.
+    """
+
+    def __init__(self):
+        """Set up the cache."""
+        self._configs = {}
+        self._users = {}
+        self._replaced = {}
+        self._lock = threading.Lock()
+
+    def get(self, fname):
+        """Get the configuration for *fname*."""
+        with self._lock:
+            return self._get(fname)
+
+    def _get(self, fname):
+        stat = os.stat(fname)
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached_key, config = self._configs.get(fname, (None, None))
+        if cached_key != key:
+            if config is not None:
+                logger.info(f"Product list {fname} has changed, reloading it.")
+                self._replace(config)
+                AREA_REGISTRY.clear()
+            config = expand(read_config(fname, Loader=UnsafeLoader))
+            self._configs[fname] = (key, config)
+        return config
+
+    def _replace(self, config):
+        """Stop the workers of the replaced *config*, or once the jobs using it are finished."""
+        if self._users.get(id(config)):
+            self._replaced[id(config)] = config
+        else:
+            _stop_workers(config)
+
+    @contextmanager
+    def use(self, fname):
+        """Get the configuration for *fname*, and keep its workers running until the job is finished."""
+        with self._lock:
+            config = self._get(fname)
+            self._users[id(config)] = self._users.get(id(config), 0) + 1
+        try:
+            yield config
+        finally:
+            with self._lock:
+                self._users[id(config)] -= 1
+                replaced = None
+                if not self._users[id(config)]:
+                    del self._users[id(config)]
+                    replaced = self._replaced.pop(id(config), None)
+            if replaced is not None:
+                _stop_workers(replaced)
+
+    def clear(self):
+        """Clear the cache and stop the workers."""
+        with self._lock:
+            configs, self._configs = self._configs, {}
+            replaced, self._replaced = self._replaced, {}
+        for _key, config in configs.values():
+            _stop_workers(config)
+        for config in replaced.values():
+            _stop_workers(config)
+
+
+def _stop_workers(config):
+    for wrk in config.get("workers", []):
+        try:
+            wrk['fun'].stop()
+        except AttributeError:
+            continue
+
+
+def process_jobs(workers, jobs, produced_files, worker_timings=None):
+    """Process the jobs.
+
+    The jobs are processed in priority order.  If the product list has
+    ``priority_concurrency`` set to more than one, that many jobs are
+    processed concurrently in threads, see :func:`_process_jobs_concurrently`.
+
+    Each worker run is timed (see :func:`_time_worker`), and the summary of
+    the timings is put in the *worker_timings* queue as a
+    :class:`WorkerTimings` at the end of the processing, even if it failed.
+    Without *worker_timings*, the summary is logged.
+
+    If a :class:`~trollflow2.plugins.FilePublisher` worker has
+    ``publish_on_done``, it is given to the jobs as ``on_done_publisher`` for
+    :func:`~trollflow2.plugins.callback_publish`, unless the priorities are
+    processed concurrently, as the files are then published in priority order
+    by the worker.
+    """
+    priorities = sorted(jobs.keys())
+    max_concurrent = _get_priority_concurrency(jobs)
+    concurrent = max_concurrent > 1 and len(priorities) > 1
+    on_done_publisher = _get_on_done_publisher(workers)
+    if on_done_publisher is not None and concurrent:
+        logger.info("Processing the priorities concurrently, the files are published in priority order "
+                    "instead of as soon as they are written.")
+    for prio in priorities:
+        jobs[prio]['processing_priority'] = prio
+        jobs[prio]['produced_files'] = produced_files
+        if on_done_publisher is not None:
+            jobs[prio]['on_done_publisher'] = None if concurrent else on_done_publisher
+    timings = []
+    try:
+        if concurrent:
+            _process_jobs_concurrently(workers, jobs, max_concurrent, timings)
+            return
+        for prio in priorities:
+            _run_workers(workers, jobs[prio], timings=timings)
+    finally:
+        if timings:
+            _send_worker_timings(WorkerTimings.from_timings(timings), worker_timings)
+
+
+def _send_worker_timings(timings, worker_timings):
+    if worker_timings is None:
+        _log_worker_timings(timings)
+    else:
+        worker_timings.put(timings)
+
+
+class WorkerTimings(dict):
+    """The summary of the worker timings for one message, keyed by worker name.
+
+    For each worker, the number of runs, the wall time, the CPU time, the
+    number of dask tasks executed, and the maximum increase of the peak RSS
+    (in MB) over all the priorities are given.  The peak RSS of the process
+    that ran the workers is in the :attr:`peak_rss` attribute.  When the
+    process is reused for several messages (warm workers or threads), this is
+    the maximum over the lifetime of the process, and :attr:`peak_rss_scope`
+    is ``"process"`` instead of ``"message"``.
+    """
+
+    peak_rss = None
+    peak_rss_scope = "message"
+
+    @classmethod
+    def from_timings(cls, timings):
+        """Summarize the *timings* of the single worker runs."""
+        summary = cls()
+        summary.peak_rss = _get_peak_rss()
+        if PRODUCT_LIST_CACHE is not None:
+            summary.peak_rss_scope = "process"
+        for timing in timings:
+            stats = summary.setdefault(timing['worker'], dict(runs=0, wall_time=0.0, cpu_time=0.0,
+                                                              dask_tasks=0, peak_rss_delta=0.0))
+            stats['runs'] += 1
+            for key in ('wall_time', 'cpu_time', 'dask_tasks'):
+                stats[key] += timing[key]
+            stats['peak_rss_delta'] = max(stats['peak_rss_delta'], timing['peak_rss_delta'])
+        return summary
+
+
+class _DaskTaskCounter(Callback):
+    """Count the dask tasks executed by the local schedulers."""
+
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def _posttask(self, key, result, dsk, state, worker_id):
+        self.count += 1
+
+
+def _get_peak_rss():
+    """Get the peak RSS of the process in MB."""
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, and in kilobytes elsewhere
+    if sys.platform == "darwin":
+        return peak_rss / 1024 ** 2
+    return peak_rss / 1024
+
+
+@contextmanager
+def _time_worker(fun, job, timings):
+    """Time the run of the worker *fun* on *job*, and append the timing to *timings*.
+
+    The wall time, the CPU time of the process, the increase of the peak RSS
+    of the process, and the number of dask tasks executed are recorded, and
+    logged as ``extra`` fields of a debug message.  When the priorities are
+    processed concurrently, the CPU time and the dask tasks of the workers
+    running at the same time are counted for each of them.
+    """
+    name = getattr(fun, '__name__', type(fun).__name__)
+    start_wall, start_cpu, start_rss = time.perf_counter(), time.process_time(), _get_peak_rss()
+    counter = _DaskTaskCounter()
+    try:
+        with counter:
+            yield
+    finally:
+        timing = dict(worker=name, priority=job.get('processing_priority'),
+                      wall_time=time.perf_counter() - start_wall,
+                      cpu_time=time.process_time() - start_cpu,
+                      peak_rss_delta=_get_peak_rss() - start_rss,
+                      dask_tasks=counter.count)
+        timings.append(timing)
+        logger.debug("Worker %s took %.3f s (%.3f s CPU, %d dask tasks) for priority %s",
+                     name, timing['wall_time'], timing['cpu_time'], timing['dask_tasks'],
+                     timing['priority'], extra=timing)
+
+
+def _get_on_done_publisher(workers):
+    """Get the publisher of the *workers* publishing the files as soon as they are written."""
+    for wrk in workers:
+        if isinstance(wrk['fun'], FilePublisher) and getattr(wrk['fun'], 'publish_on_done', False):
+            return wrk['fun']
+    return None
+
+
+def _get_priority_concurrency(jobs):
+    for job in jobs.values():
+        with suppress(KeyError):
+            return job['product_list']['product_list'].get('priority_concurrency', 1)
+    return 1
+
+
+def _process_jobs_concurrently(workers, jobs, max_concurrent, timings):
+    """Process the jobs concurrently in *max_concurrent* threads.
+
+    The workers up to the first :class:`~trollflow2.plugins.FilePublisher` are
+    run concurrently for the jobs, and the rest of the workers are run in the
+    main thread in priority order, so that the files are published in the
+    same order as when the jobs are processed one by one.
+
+    Timeouts rely on SIGALRM, which can only be used in the main thread, so
+    they are not applied to the workers run concurrently.
+    """
+    first_workers, last_workers = _split_workers_at_publisher(workers)
+    if any("timeout" in wrk for wrk in first_workers):
+        logger.warning("Worker timeouts are not supported when processing priorities concurrently, "
+                       "the timeouts are applied only from the publisher on.")
+    with ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="priority") as executor:
+        futures = {prio: executor.submit(_run_workers, first_workers, job, timeouts=False, timings=timings)
+                   for prio, job in jobs.items()}
         try:
-            for wrk in workers:
-                cwrk = wrk.copy()
-                if "timeout" in cwrk:
-                    def _timeout_handler(signum, frame, wrk=wrk):
-                        raise TimeoutError(
-                            f"Timeout for {wrk['fun']!s} expired "
-                            f"after {wrk['timeout']:.1f} seconds, "
-                            "giving up")
-
-                    signal.signal(signal.SIGALRM, _timeout_handler)
-                    # using setitimer because it accepts floats,
-                    # unlike signal.alarm
-                    signal.setitimer(signal.ITIMER_REAL,
-                                     cwrk.pop("timeout"))
-                cwrk.pop('fun')(job, **cwrk)
-                if "timeout" in cwrk:
-                    signal.alarm(0)  # cancel the alarm
-        except AbortProcessing as err:
-            logger.warning(str(err))
+            for prio in sorted(jobs.keys()):
+                if futures[prio].result():
+                    _run_workers(last_workers, jobs[prio], timings=timings)
+        except BaseException:
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+
+def _split_workers_at_publisher(workers):
+    """Split the workers at the first publisher."""
+    for i, wrk in enumerate(workers):
+        if isinstance(wrk['fun'], FilePublisher):
+            return workers[:i], workers[i:]
+    return workers, []
+
+
+def _run_workers(workers, job, timeouts=True, timings=None):
+    """Run the *workers* on *job*.
+
+    If a *timings* list is given, the timing of each worker is appended to it.
+    Return False if the processing was aborted, True otherwise.
+    """
+    if timings is None:
+        timings = []
+    try:
+        for wrk in workers:
+            cwrk = wrk.copy()
+            timeout = cwrk.pop("timeout", None)
+            if timeout is not None and timeouts:
+                def _timeout_handler(signum, frame, wrk=wrk):
+                    raise TimeoutError(
+                        f"Timeout for {wrk['fun']!s} expired "
+                        f"after {wrk['timeout']:.1f} seconds, "
+                        "giving up")
+
+                signal.signal(signal.SIGALRM, _timeout_handler)
+                # using setitimer because it accepts floats,
+                # unlike signal.alarm
+                signal.setitimer(signal.ITIMER_REAL, timeout)
+            fun = cwrk.pop('fun')
+            with _time_worker(fun, job, timings):
+                fun(job, **cwrk)
+            if timeout is not None and timeouts:
+                signal.alarm(0)  # cancel the alarm
+    except AbortProcessing as err:
+        logger.warning(str(err))
+        return False
+    return True
 
 
 def read_config(fname=None, raw_string=None, Loader=SafeLoader):
@@ -508,12 +1528,32 @@ def launch(args_in):
         product_list = args.pop("product_list")
         test_message = args.pop("test_message")
         threaded = args.pop("threaded")
+        concurrency = dict(max_concurrent_jobs=args.pop("max_concurrent_jobs"),
+                           max_jobs_per_topic=args.pop("max_jobs_per_topic"),
+                           max_jobs_per_platform=args.pop("max_jobs_per_platform"))
+        warm_workers = dict(warm_workers=args.pop("warm_workers"),
+                            max_jobs_per_worker=args.pop("max_jobs_per_worker"),
+                            max_worker_rss=args.pop("max_worker_rss"))
+        publisher_settings = _get_publisher_settings(args)
+        checks = dict(validate_products=args.pop("validate_products"),
+                      check_workers=args.pop("check_workers"))
+        metrics_port = args.pop("metrics_port")
         connection_parameters = args
 
-        runner = Runner(product_list, connection_parameters, test_message, threaded)
+        runner = Runner(product_list, connection_parameters, test_message, threaded,
+                        **concurrency, **warm_workers, **checks, publisher_settings=publisher_settings,
+                        metrics_port=metrics_port)
         runner.run()
 
 
+def _get_publisher_settings(args):
+    launcher_publisher = args.pop("launcher_publisher")
+    settings = dict(port=args.pop("publisher_port"), nameservers=args.pop("publisher_nameserver"))
+    if not launcher_publisher:
+        return None
+    return settings
+
+
 def _read_log_config(args):
     log_config = args.pop("log_config", None)
     if log_config is not None:
@@ -548,9 +1588,36 @@ def parse_args(args_in):
                         help=("Add direct TCP port connection.  Can be used several times: "
                               "'-a tcp://127.0.0.1:12345 -a tcp://123.456.789.0:9013'"),
                         action="append")
+    parser.add_argument("-j", "--max-concurrent-jobs", required=False, type=int, default=1,
+                        help="Maximum number of messages processed at the same time. Default: 1")
+    parser.add_argument("--max-jobs-per-topic", required=False, type=int, default=None,
+                        help="Maximum number of messages from the same topic processed at the same time.")
+    parser.add_argument("--max-jobs-per-platform", required=False, type=int, default=None,
+                        help="Maximum number of messages for the same platform processed at the same time.")
+    parser.add_argument("-w", "--warm-workers", action="store_true",
+                        help="Process the messages in long-lived subprocesses with the libraries already imported.")
+    parser.add_argument("--max-jobs-per-worker", required=False, type=int, default=None,
+                        help="Replace a warm worker after it has processed this many messages.")
+    parser.add_argument("--max-worker-rss", required=False, type=float, default=None,
+                        help="Replace a warm worker when its peak memory usage exceeds this many megabytes.")
+    parser.add_argument("-p", "--launcher-publisher", action="store_true",
+                        help="Publish the files of all the messages from a single long-lived publisher.")
+    parser.add_argument("--publisher-port", required=False, type=int, default=0,
+                        help="Port of the launcher publisher. Default: a random port")
+    parser.add_argument("--publisher-nameserver", required=False, type=str, default=None, action="append",
+                        help=("Nameserver the launcher publisher registers to. Can be used several times. "
+                              "Disable by setting to False"))
+    parser.add_argument("--validate-products", action="store_true",
+                        help="Check that the produced GeoTIFF and NetCDF files can be opened.")
+    parser.add_argument("--check-workers", required=False, type=int, default=DEFAULT_CHECK_WORKERS,
+                        help=f"Number of threads checking the produced files. Default: {DEFAULT_CHECK_WORKERS}")
+    parser.add_argument("--metrics-port", required=False, type=int, default=None,
+                        help="Serve the processing metrics for Prometheus on this port.")
 
     args = vars(parser.parse_args(args_in))
     if args['nameserver'].lower() in ('false', 'off', '0'):
         args['nameserver'] = False
+    if args['publisher_nameserver'] and args['publisher_nameserver'][0].lower() in ('false', 'off', '0'):
+        args['publisher_nameserver'] = False
 
     return args
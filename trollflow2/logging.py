@@ -24,11 +24,13 @@
 import functools
 import logging
 import logging.config
+import queue
+import threading
 from contextlib import contextmanager
 from logging import getLogger
 from logging.handlers import QueueHandler, QueueListener
 
-from trollflow2 import get_manager
+from trollflow2 import create_queue
 
 DEFAULT_LOG_CONFIG = {'version': 1,
                       'disable_existing_loggers': False,
@@ -37,11 +39,14 @@ DEFAULT_LOG_CONFIG = {'version': 1,
                       'handlers': {'console': {'class': 'logging.StreamHandler',
                                                'formatter': 'pytroll'}},
                       'root': {'level': 'DEBUG', 'handlers': ['console']}}
+# The maximum number of batches of log records waiting in the logging queue
+LOG_QUEUE_SIZE = 1000
+LOG_QUEUE_POLICIES = ("block", "drop_debug", "sample")
 
 @functools.cache
 def get_log_queue():
     """Lazily create the shared logging queue."""
-    return get_manager().Queue()
+    return create_queue(LOG_QUEUE_SIZE)
 
 LOG_CONFIG = None
 
@@ -62,7 +67,7 @@ def logging_on(config=None):
     with configure_logging(config):
         root.handlers.extend(handlers)
         # set up and run listener
-        listener = QueueListener(get_log_queue(), *(root.handlers))
+        listener = BatchQueueListener(get_log_queue(), *(root.handlers))
         listener.start()
         try:
             yield
@@ -87,6 +92,7 @@ def configure_logging(config):
 def _set_config(config):
     if config is None:
         config = DEFAULT_LOG_CONFIG
+    config = {key: val for key, val in config.items() if key != "queued_logging"}
     logging.config.dictConfig(config)
 
 
@@ -117,13 +123,127 @@ def reset_logging():
                 logger.removeHandler(handler)
 
 
+class BatchingQueueHandler(QueueHandler):
+    """A queue handler putting the log records in the queue in batches.
+
+    The records are buffered, and put in the queue as a list when
+    *batch_size* records are buffered, or every *flush_interval* seconds.
+
+    The *policy* decides what happens when the queue is full, ie. when the
+    listener can't keep up:
+
+      - ``block`` waits until there is room in the queue,
+      - ``drop_debug`` drops the DEBUG records of the batch,
+      - ``sample`` drops all but one of every *sample_rate* DEBUG records.
+
+    The :attr:`queued` and :attr:`dropped` attributes count the records put
+    in the queue and dropped.
+    """
+
+    def __init__(self, queue, batch_size=100, flush_interval=0.5, policy="block", sample_rate=10):
+        """Set up the handler and start the flushing thread."""
+        super().__init__(queue)
+        if policy not in LOG_QUEUE_POLICIES:
+            raise ValueError(f"Unknown policy {policy}, should be one of {LOG_QUEUE_POLICIES}")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.sample_rate = sample_rate
+        self.queued = 0
+        self.dropped = 0
+        self._buffer = []
+        self._num_debug_records = 0
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, name="log flusher", daemon=True)
+        self._flusher.start()
+
+    def emit(self, record):
+        """Buffer the record, and put the buffered records in the queue if the batch is full."""
+        try:
+            self._buffer.append(self.prepare(record))
+            if len(self._buffer) >= self.batch_size:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        """Put the buffered records in the queue."""
+        with self.lock:
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, []
+            self._enqueue_batch(batch)
+
+    def _enqueue_batch(self, batch):
+        if self.policy != "block":
+            try:
+                self.queue.put_nowait(batch)
+                self.queued += len(batch)
+                return
+            except queue.Full:
+                batch = self._thin_out(batch)
+                if not batch:
+                    return
+        self.queue.put(batch)
+        self.queued += len(batch)
+
+    def _thin_out(self, batch):
+        """Drop the DEBUG records of *batch* according to the policy."""
+        kept = []
+        for record in batch:
+            if record.levelno > logging.DEBUG or self._is_sampled():
+                kept.append(record)
+        self.dropped += len(batch) - len(kept)
+        return kept
+
+    def _is_sampled(self):
+        if self.policy != "sample":
+            return False
+        self._num_debug_records += 1
+        return self._num_debug_records % self.sample_rate == 0
+
+    def _flush_periodically(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """Stop the flushing thread and put the remaining records in the queue."""
+        self._stop.set()
+        with self.lock:
+            if self.dropped:
+                self._buffer.append(logging.makeLogRecord(
+                    dict(name=__name__, levelno=logging.WARNING, levelname="WARNING",
+                         msg=f"{self.dropped:d} log records were dropped as the logging queue was full")))
+                self.dropped = 0
+        self.flush()
+        super().close()
+
+
+class BatchQueueListener(QueueListener):
+    """A queue listener handling the batches of :class:`BatchingQueueHandler`."""
+
+    def handle(self, record):
+        """Handle a record, or each record of a batch."""
+        if isinstance(record, list):
+            for rec in record:
+                super().handle(rec)
+        else:
+            super().handle(record)
+
+
 def setup_queued_logging(log_queue, config=None):
-    """Set up queued logging in a spawned subprocess."""
+    """Set up queued logging in a spawned subprocess.
+
+    The records are sent by a :class:`BatchingQueueHandler`, whose arguments
+    can be given in the ``queued_logging`` section of the log *config*.
+    """
     root_logger = getLogger()
+    settings = {}
     if config:
+        settings = config.get("queued_logging", {})
         remove_handlers_from_config(config)
     _set_config(config)
-    queue_handler = QueueHandler(log_queue)
+    queue_handler = BatchingQueueHandler(log_queue, **settings)
     root_logger.addHandler(queue_handler)
 
 
@@ -144,8 +264,12 @@ def queued_logging(func):
         log_queue = kwargs.pop("log_queue")
         log_config = kwargs.pop("log_config")
         setup_queued_logging(log_queue, config=log_config)
-        value = func(*args, **kwargs)
-        # Do something after
+        try:
+            value = func(*args, **kwargs)
+        finally:
+            # Send the buffered records before the queue is closed
+            for handler in getLogger().handlers:
+                handler.flush()
         return value
     return wrapper_decorator
 
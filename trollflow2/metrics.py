@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026 Pytroll developers
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+"""Metrics of the launcher, exported in the OpenMetrics text format.
+
+The metrics are collected in a :class:`Metrics` instance, and served over
+HTTP by a :class:`MetricsServer` for Prometheus to scrape.
+"""
+
+import logging
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+DEFAULT_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800, math.inf)
+
+# The metric families, with their type and help text
+METRICS = {
+    "trollflow2_messages_received": ("counter", "Messages received by the launcher."),
+    "trollflow2_messages_processed": ("counter", "Messages processed without problems."),
+    "trollflow2_messages_failed": ("counter", "Messages whose processing crashed or produced bad files."),
+    "trollflow2_message_queue_wait_seconds": ("histogram", "Time the messages waited for a free job slot."),
+    "trollflow2_worker_duration_seconds": ("histogram", "Wall time of the workers for one message."),
+    "trollflow2_produced_files": ("counter", "Files produced."),
+    "trollflow2_produced_bytes": ("counter", "Bytes in the files produced."),
+    "trollflow2_job_exit_codes": ("counter", "Exit codes of the jobs."),
+    "trollflow2_job_peak_rss_megabytes": ("gauge", "Peak memory usage of the process running the last job, "
+                                          "over the message or the whole process lifetime."),
+}
+
+
+class Metrics:
+    """Thread-safe collection of the launcher metrics.
+
+    The metrics are identified by their family name from :data:`METRICS`,
+    and optional labels given as keyword arguments.  The histograms are
+    cumulative, as in Prometheus.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """Set up the metrics, with the upper bounds of the histogram *buckets*."""
+        if buckets[-1] != math.inf:
+            buckets = (*buckets, math.inf)
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._values = {}
+        self._histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        """Increment the counter *name* by *value*."""
+        self._check_type(name, "counter")
+        with self._lock:
+            key = (name, _labels_key(labels))
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """Set the gauge *name* to *value*."""
+        self._check_type(name, "gauge")
+        with self._lock:
+            self._values[(name, _labels_key(labels))] = value
+
+    def observe(self, name, value, **labels):
+        """Add the observation *value* to the histogram *name*."""
+        self._check_type(name, "histogram")
+        with self._lock:
+            key = (name, _labels_key(labels))
+            bucket_counts, total = self._histograms.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    bucket_counts[i] += 1
+            self._histograms[key] = (bucket_counts, total + value)
+
+    def get(self, name, **labels):
+        """Get the value of the counter or gauge *name*, or None if it has not been set."""
+        with self._lock:
+            return self._values.get((name, _labels_key(labels)))
+
+    @staticmethod
+    def _check_type(name, metric_type):
+        if METRICS[name][0] != metric_type:
+            raise TypeError(f"{name} is a {METRICS[name][0]}, not a {metric_type}")
+
+    def render(self):
+        """Render the metrics in the OpenMetrics text format."""
+        lines = []
+        with self._lock:
+            for name, (metric_type, help_text) in METRICS.items():
+                lines.append(f"# TYPE {name} {metric_type}")
+                lines.append(f"# HELP {name} {help_text}")
+                if metric_type == "histogram":
+                    lines.extend(self._render_histogram(name))
+                    continue
+                suffix = "_total" if metric_type == "counter" else ""
+                for (family, labels), value in sorted(self._values.items()):
+                    if family == name:
+                        lines.append(f"{name}{suffix}{_format_labels(labels)} {value}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def _render_histogram(self, name):
+        for (family, labels), (bucket_counts, total) in sorted(self._histograms.items()):
+            if family != name:
+                continue
+            for bound, count in zip(self.buckets, bucket_counts):
+                bucket_labels = labels + (("le", _format_bound(bound)),)
+                yield f"{name}_bucket{_format_labels(bucket_labels)} {count}"
+            yield f"{name}_count{_format_labels(labels)} {bucket_counts[-1]}"
+            yield f"{name}_sum{_format_labels(labels)} {total}"
+
+
+def _labels_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_bound(bound):
+    if bound == math.inf:
+        return "+Inf"
+    return str(float(bound))
+
+
+class MetricsServer:
+    """HTTP server exporting the *metrics* for scraping.
+
+    The metrics are served on ``/metrics`` at the given *port* (a random free
+    port if 0), in a background thread.
+    """
+
+    def __init__(self, metrics, port=0, host=""):
+        """Set up the server."""
+        self.metrics = metrics
+        self.host = host
+        self.requested_port = port
+        self._server = None
+        self._thread = None
+
+    @property
+    def port(self):
+        """Get the port the server listens to."""
+        return self._server.server_address[1]
+
+    def start(self):
+        """Start serving the metrics."""
+        self._server = ThreadingHTTPServer((self.host, self.requested_port), _create_handler(self.metrics))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics_server", daemon=True)
+        self._thread.start()
+        logger.info("Serving the metrics on port %d", self.port)
+
+    def stop(self):
+        """Stop serving the metrics."""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+        self._thread = None
+
+
+def _create_handler(metrics):
+    class _MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format, *args)
+
+    return _MetricsHandler
@@ -19,11 +19,17 @@
 """Trollflow2 plugins."""
 
 import collections.abc
-import copy
 import datetime as dt
+import functools
 import os
 import pathlib
-from contextlib import contextmanager, nullcontext, suppress
+import posixpath
+import queue
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, suppress
 from logging import getLogger
 from tempfile import NamedTemporaryFile
 from urllib.parse import urlsplit, urlunsplit
@@ -33,7 +39,7 @@ with suppress(ImportError):
 
 import dask
 import dask.array as da
-import dpath
+import numpy as np
 import rasterio
 from dask.delayed import Delayed
 from posttroll.message import Message
@@ -41,7 +47,7 @@ from posttroll.publisher import create_publisher_from_dict_config
 from pyorbital.astronomy import sun_zenith_angle
 from pyresample.area_config import AreaNotFound
 from pyresample.boundary import Boundary
-from pyresample.geometry import get_geostationary_bounding_box
+from pyresample.geometry import AreaDefinition, get_geostationary_bounding_box
 from rasterio.enums import Resampling
 from satpy import Scene
 from satpy.version import version as satpy_version
@@ -58,7 +64,8 @@ else:
     from satpy.writers import group_results_by_output_file
     from satpy.writers import split_results
 
-from trollflow2.dict_tools import get_config_value, plist_iter
+from trollflow2.dict_tools import (copy_containers, delete_config_path,
+                                   get_config_value, plist_iter)
 
 try:
     from satpy.dataset import DataQuery
@@ -83,8 +90,46 @@ class AbortProcessing(Exception):
     """Exception when processing has to be aborted."""
 
 
+class SharedScene:
+    """A scene shared by the jobs created from the same message.
+
+    With the `share_scene` option, all the priority groups of a message get
+    the same :class:`SharedScene` instance, so the input files are read and
+    the channels are loaded only once.  Each job then gets its own copy of
+    the shared scene to resample and save from.
+    """
+
+    def __init__(self):
+        """Initialize the holder, the scene is created by the first job."""
+        self.lock = threading.Lock()
+        self.scene = None
+        self.error = None
+        self.persisted = set()
+
+
 def create_scene(job):
-    """Create a satpy scene."""
+    """Create a satpy scene.
+
+    If the job has a shared scene, the scene is created only by the first job
+    and reused by the others.
+    """
+    shared = job.get('shared_scene')
+    if shared is None:
+        job['scene'] = _create_scene(job)
+        return
+    with shared.lock:
+        if shared.scene is None and shared.error is None:
+            try:
+                shared.scene = _create_scene(job)
+            except AbortProcessing as err:
+                shared.error = err
+        if shared.error is not None:
+            raise shared.error
+        logger.debug('Using the shared scene')
+        job['scene'] = shared.scene
+
+
+def _create_scene(job):
     defaults = {'reader': None,
                 'reader_kwargs': None}
     if satpy_version <= "0.25.1":
@@ -94,13 +139,19 @@ def create_scene(job):
 
     logger.info('Creating scene')
     try:
-        job['scene'] = Scene(filenames=job['input_filenames'], **conf)
+        return Scene(filenames=job['input_filenames'], **conf)
     except ValueError as err:
         raise AbortProcessing("Failed creating scene: %s" % str(err))
 
 
 def load_composites(job):
-    """Load composites given in the job's product_list."""
+    """Load composites given in the job's product_list.
+
+    If the job has a shared scene, the composites are loaded in the shared
+    scene, where the datasets already loaded by the other jobs are reused, and
+    the job gets a copy of it.  With `persist_shared_scene`, the loaded
+    datasets are also persisted in memory.
+    """
     composites_by_res = {}
     for flat_prod_cfg, _prod_cfg in plist_iter(job['product_list']['product_list'], level='product'):
         res = flat_prod_cfg.get('resolution', DEFAULT)
@@ -112,13 +163,61 @@ def load_composites(job):
     num_composites = sum([len(composites_by_res[d]) for d in composites_by_res])
     logger.info(f"Loading {num_composites} composites.")
 
-    scn = job['scene']
+    shared = job.get('shared_scene')
+    if shared is None:
+        _load_composites_by_res(job, job['scene'], composites_by_res)
+        return
+    with shared.lock:
+        scn = shared.scene
+        # Keep the channels in the shared scene for the other jobs
+        _load_composites_by_res(job, scn, composites_by_res, unload=False)
+        if job['product_list']['product_list'].get('persist_shared_scene', False):
+            _persist_shared_scene(shared)
+        job['scene'] = _copy_shared_scene(scn, set().union(*composites_by_res.values()))
+
+
+def _load_composites_by_res(job, scn, composites_by_res, **kwargs):
     generate = job['product_list']['product_list'].get('delay_composites', True) is False
     extra_args = job["product_list"]["product_list"].get("scene_load_kwargs", {})
     for resolution, composites in composites_by_res.items():
         logger.debug('Loading %s at resolution %s', str(composites), str(resolution))
-        scn.load(composites, resolution=resolution, generate=generate, **extra_args)
-    job['scene'] = scn
+        scn.load(composites, resolution=resolution, generate=generate, **{**kwargs, **extra_args})
+
+
+def _persist_shared_scene(shared):
+    """Persist the datasets of the shared scene that are not persisted yet."""
+    scn = shared.scene
+    to_persist = [ds_id for ds_id in scn.keys()
+                  if ds_id not in shared.persisted and isinstance(scn[ds_id].data, da.Array)]
+    if not to_persist:
+        return
+    logger.debug("Persisting %d datasets of the shared scene", len(to_persist))
+    persisted = dask.persist(*[scn[ds_id].data for ds_id in to_persist])
+    for ds_id, data in zip(to_persist, persisted):
+        # Replace the data in-place, so the scene copies see it too
+        scn[ds_id].data = data
+    shared.persisted.update(to_persist)
+
+
+def _copy_shared_scene(scn, composites):
+    """Copy *scn*, with the wishlist limited to *composites*.
+
+    The other jobs' composites are dropped from the wishlist, so they are not
+    generated when resampling the copy.
+    """
+    new_scn = scn.copy()
+    # Satpy has no public API for this, so without it the other jobs'
+    # composites are just generated too
+    if isinstance(getattr(new_scn, '_wishlist', None), set):
+        new_scn._wishlist = {query for query in new_scn._wishlist
+                             if _get_query_name(query) in composites}
+    return new_scn
+
+
+def _get_query_name(query):
+    if isinstance(query, str):
+        return query
+    return query['name']
 
 
 def aggregate(job):
@@ -157,13 +256,21 @@ GLOBAL_RESAMPLER_DEFAULTS = {
 
 
 def resample(job):
-    """Resample the scene to some areas."""
+    """Resample the scene to some areas.
+
+    With ``resampler_cache_size`` set in the product list, that many of the
+    latest resamplers are kept in memory between the jobs.  With
+    ``cache_dir_max_size`` set, the least recently used resampling lookup
+    tables in ``cache_dir`` are removed when the directory grows larger than
+    that many megabytes.
+    """
     product_list = job['product_list']
     resampler = _get_plugin_conf(product_list, "/product_list", {"resampler": "nearest"})["resampler"]
     defaults = RESAMPLER_DEFAULT_OPTIONS.get(resampler, GLOBAL_RESAMPLER_DEFAULTS)
     conf = _get_plugin_conf(product_list, '/product_list', defaults)
     job['resampled_scenes'] = {}
     scn = job['scene']
+    cache_dirs = set()
     for area in product_list['product_list']['areas']:
         area_conf = _get_plugin_conf(product_list, '/product_list/areas/' + str(area),
                                      conf)
@@ -198,7 +305,87 @@ def resample(job):
                 job['resampled_scenes'][area] = scn
         else:
             logger.debug("area: %s, area_conf: %s", area, str(area_conf))
-            job['resampled_scenes'][area] = scn.resample(area, **area_conf)
+            job['resampled_scenes'][area] = scn.resample(AREA_REGISTRY.get(area, area), **area_conf)
+        if area_conf.get('cache_dir'):
+            cache_dirs.add(area_conf['cache_dir'])
+    cache_size = product_list['product_list'].get('resampler_cache_size', 0)
+    if cache_size:
+        # The resamplers used by the scene are only available privately
+        _RESAMPLER_CACHE.update(getattr(scn, '_resamplers', {}), cache_size)
+    max_size = product_list['product_list'].get('cache_dir_max_size')
+    if max_size is not None:
+        for cache_dir in cache_dirs:
+            _prune_cache_dir(cache_dir, max_size * 1024 ** 2)
+
+
+class _ResamplerCache:
+    """Keep the most recently used resamplers alive.
+
+    Satpy reuses a resampler, and the neighbour info cached in it, as long as
+    the resampler is referenced somewhere.  This keeps references to the
+    *size* most recently used resamplers, so that they survive between the
+    messages when the launcher reuses the worker.
+    """
+
+    def __init__(self):
+        self._resamplers = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def update(self, resamplers, size):
+        """Add the *resamplers* by their satpy cache key, and drop the oldest over *size*."""
+        with self._lock:
+            for key, resampler in resamplers.items():
+                self._resamplers[key] = resampler
+                self._resamplers.move_to_end(key)
+            while len(self._resamplers) > size:
+                self._resamplers.popitem(last=False)
+
+    def clear(self):
+        """Drop all the resamplers."""
+        with self._lock:
+            self._resamplers.clear()
+
+    def __len__(self):
+        """Get the number of resamplers kept."""
+        return len(self._resamplers)
+
+
+_RESAMPLER_CACHE = _ResamplerCache()
+
+
+def _prune_cache_dir(cache_dir, max_size):
+    """Remove the least recently used entries of *cache_dir* until it is at most *max_size* bytes."""
+    entries = []
+    for entry in os.scandir(cache_dir):
+        size, last_used = _get_cache_entry_usage(entry)
+        entries.append((last_used, size, entry.path))
+    total_size = sum(size for _last_used, size, _path in entries)
+    for _last_used, size, path in sorted(entries):
+        if total_size <= max_size:
+            break
+        logger.debug("Removing %s from the resampling cache", path)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            with suppress(FileNotFoundError):
+                os.remove(path)
+        total_size -= size
+
+
+def _get_cache_entry_usage(entry):
+    """Get the size and the last access time of a cache file or directory."""
+    if not entry.is_dir(follow_symlinks=False):
+        stat = entry.stat(follow_symlinks=False)
+        return stat.st_size, stat.st_atime
+    size = 0
+    last_used = entry.stat(follow_symlinks=False).st_atime
+    for root, _dirs, files in os.walk(entry.path):
+        for fname in files:
+            with suppress(FileNotFoundError):
+                stat = os.stat(os.path.join(root, fname))
+                size += stat.st_size
+                last_used = max(last_used, stat.st_atime)
+    return size, last_used
 
 
 # Datasets saving
@@ -241,7 +428,16 @@ def prepared_filename(fmat, renames):
     use_tmp_file = fmat.get('use_tmp_file', False)
     staging_zone = fmat.get("staging_zone", False)
 
-    if staging_zone or use_tmp_file:
+    if _can_write_directly(fmat, orig_filename):
+        file_object = _open_remote_file(orig_filename, use_tmp_file, fmat.get('direct_write_block_size'))
+        try:
+            yield file_object
+        except BaseException:
+            # eg. a skipped product, the file must not be completed
+            _discard_remote_file(file_object)
+            raise
+        renames[file_object] = orig_filename
+    elif staging_zone or use_tmp_file:
         if staging_zone:
             directory = staging_zone
             of = orig_filename
@@ -255,6 +451,60 @@ def prepared_filename(fmat, renames):
         yield orig_filename
 
 
+def _can_write_directly(fmat, filename):
+    """Check if the file of *fmat* can be written directly to the remote *filename*.
+
+    Only the writers in :data:`DIRECT_WRITE_WRITERS` are known to write to
+    file objects, the files of the other writers are saved to *filename* as
+    without ``direct_write``.
+    """
+    if not fmat.get('direct_write', False) or urlsplit(filename).scheme in ('', 'file'):
+        return False
+    writer = _get_writer(fmat, filename)
+    if writer not in DIRECT_WRITE_WRITERS:
+        logger.warning("The %s writer can't write to file objects, saving %s without direct_write.",
+                       writer, filename)
+        return False
+    return True
+
+
+def _open_remote_file(filename, use_tmp_file=False, block_size=None):
+    """Open the remote *filename* for writing directly with fsspec.
+
+    With *use_tmp_file*, a temporary file next to *filename* is opened
+    instead.  The *block_size*, in MB, is the size of the blocks sent to the
+    remote filesystem while writing, eg. the parts of the S3 multipart upload.
+    """
+    import fsspec
+
+    if use_tmp_file:
+        directory, basename = posixpath.split(filename)
+        filename = posixpath.join(directory, f"tmp{os.getpid()}_{uuid.uuid4().hex}_{basename}")
+    kwargs = {}
+    if block_size is not None:
+        kwargs['block_size'] = int(block_size * 1024 * 1024)
+    # Without autocommit, the file is only completed by commit(), eg. the S3
+    # multipart upload is completed or aborted after all the parts are sent
+    return fsspec.open(filename, mode='wb', autocommit=False, **kwargs).open()
+
+
+def _commit_remote_file(file_object, filename):
+    """Complete the remote *file_object*, and move it to *filename* if needed."""
+    from fsspec.core import strip_protocol
+
+    file_object.close()
+    file_object.commit()
+    if file_object.path != strip_protocol(filename):
+        file_object.fs.mv(file_object.path, filename)
+
+
+def _discard_remote_file(file_object):
+    """Discard the remote *file_object* without completing it."""
+    logger.debug("Discarding %s", str(file_object.path))
+    with suppress(Exception):
+        file_object.discard()
+
+
 def _format_decoration_text(deco, fmat):
     """Format decoration text if it contains a key that is included in fmat."""
     if "text" in deco and "txt" in deco["text"]:
@@ -266,8 +516,13 @@ def _format_decoration_text(deco, fmat):
 
 
 def format_decoration(fmat, fmat_config):
-    """Format decoration text using template given in fmt_config with key-value pairs in fmat."""
-    fmat_config_local = copy.deepcopy(fmat_config)
+    """Format decoration text using template given in fmt_config with key-value pairs in fmat.
+
+    The returned config has the same items as *fmat_config*, where only the
+    nested dicts and lists are copied, so that the writers can't modify the
+    product list.
+    """
+    fmat_config_local = copy_containers(fmat_config)
     if "decorate" in fmat_config:
         for deco in fmat_config_local["decorate"]["decorate"]:
             deco = _format_decoration_text(deco, fmat)
@@ -283,26 +538,32 @@ def save_dataset(scns, fmat, fmat_config, renames, compute=False):
     try:
         with prepared_filename(fmat, renames) as filename:
             res = fmat.get('resolution', DEFAULT)
-            kwargs = fmat_config.copy()
             kwargs = format_decoration(fmat, fmat_config)
             # these keyword arguments are used by the trollflow2 plugin but not
             # by satpy writers
             for name in {"fname_pattern", "dispatch", "output_dir",
-                         "use_tmp_file", "staging_zone"}:
+                         "use_tmp_file", "staging_zone", "direct_write",
+                         "direct_write_block_size"}:
                 kwargs.pop(name, None)
             if isinstance(fmat['product'], (tuple, list, set)):
                 kwargs.pop('format')
                 dsids = []
                 for prod in fmat['product']:
                     dsids.append(_create_data_query(prod, res))
-                obj = scns[fmat['area']].save_datasets(datasets=dsids,
-                                                       filename=filename,
-                                                       compute=compute, **kwargs)
+                if not isinstance(filename, str):
+                    obj = _save_to_file_object(scns[fmat['area']], dsids, filename, compute, kwargs)
+                else:
+                    obj = scns[fmat['area']].save_datasets(datasets=dsids,
+                                                           filename=filename,
+                                                           compute=compute, **kwargs)
             else:
                 dsid = _create_data_query(fmat['product'], res)
-                obj = scns[fmat['area']].save_dataset(dsid,
-                                                      filename=filename,
-                                                      compute=compute, **kwargs)
+                if not isinstance(filename, str):
+                    obj = _save_to_file_object(scns[fmat['area']], dsid, filename, compute, kwargs)
+                else:
+                    obj = scns[fmat['area']].save_dataset(dsid,
+                                                          filename=filename,
+                                                          compute=compute, **kwargs)
     except KeyError as err:
         logger.warning('Skipping %s: %s', fmat['product'], str(err))
     else:
@@ -310,18 +571,72 @@ def save_dataset(scns, fmat, fmat_config, renames, compute=False):
     return obj
 
 
+# The writers satpy picks for the file extensions, "simple_image" otherwise
+WRITERS_BY_EXTENSION = {'.tif': 'geotiff', '.tiff': 'geotiff', '.nc': 'cf', '.mitiff': 'mitiff'}
+# The writers known to write to the file objects opened for direct_write
+DIRECT_WRITE_WRITERS = ('simple_image', )
+
+
+def _get_writer(config, filename):
+    """Get the writer of *config*, or the one satpy picks for the extension of *filename*."""
+    writer = config.get('writer')
+    if writer is None:
+        extension = posixpath.splitext(filename)[1].lower()
+        writer = WRITERS_BY_EXTENSION.get(extension, 'simple_image')
+    return writer
+
+
+def _save_to_file_object(scn, dsids, file_object, compute, kwargs):
+    """Save the dataset(s) *dsids* of *scn* to the opened *file_object*.
+
+    The scene only accepts filenames, so the writer is used directly.
+    """
+    try:
+        from satpy.writers.core.config import load_writer
+    except ImportError:
+        from satpy.writers import load_writer
+
+    writer = _get_writer(kwargs, file_object.path)
+    kwargs.pop('writer', None)
+    if writer not in DIRECT_WRITE_WRITERS:
+        raise ValueError(f"The {writer} writer can't write to file objects.")
+    # The image format can't be guessed from a file object
+    kwargs.setdefault('format', posixpath.splitext(file_object.path)[1][1:])
+    writer, save_kwargs = load_writer(writer, **kwargs)
+    if isinstance(dsids, list):
+        return writer.save_datasets([scn[dsid] for dsid in dsids], filename=file_object,
+                                    compute=compute, **save_kwargs)
+    return writer.save_dataset(scn[dsids], filename=file_object, compute=compute, **save_kwargs)
+
+
 def _create_data_query(product, res):
     return DataQuery(name=product, resolution=res, modifiers=DEFAULT)
 
 
 @contextmanager
-def renamed_files():
-    """Context renaming files."""
+def renamed_files(rename_local_files=True):
+    """Context renaming files.
+
+    The remote file objects opened for ``direct_write`` are always completed
+    at the end, or discarded on error.  The local files are only renamed if
+    *rename_local_files* is True.
+    """
     renames = {}
 
-    yield renames
+    try:
+        yield renames
+    except BaseException:
+        for tmp_name in renames:
+            if not isinstance(tmp_name, str):
+                _discard_remote_file(tmp_name)
+        raise
 
     for tmp_name, actual_name in renames.items():
+        if not isinstance(tmp_name, str):
+            _commit_remote_file(tmp_name, actual_name)
+            continue
+        if not rename_local_files:
+            continue
         target_scheme = urlsplit(actual_name).scheme
         if target_scheme in ('', 'file'):
             os.rename(tmp_name, actual_name)
@@ -347,6 +662,20 @@ def save_datasets(job):
     ``staging_zone`` directory, such that the filename written to the
     headers remains meaningful.
 
+    If the ``direct_write`` option is set to True and ``output_dir`` is a
+    remote filesystem, eg. ``s3://bucket/``, the writer gets a file object
+    opened with fsspec instead of a filename, so the file is streamed to the
+    remote filesystem while it is written, without a local copy.  This only
+    works with the writers known to write to file objects, see
+    :data:`DIRECT_WRITE_WRITERS`, the files of the other writers are saved as
+    without ``direct_write``, with a warning.  The blocks are sent while
+    writing, in blocks of ``direct_write_block_size`` megabytes if
+    given, eg. as the parts of an S3 multipart upload, and the file is
+    completed once all the datasets are saved, also with ``early_moving``,
+    or discarded if the saving fails.  With ``use_tmp_file``, the
+    file is first written to a temporary file in the same remote directory,
+    and then moved to the final name.
+
     The product list may contain a ``call_on_done`` parameter.
     This parameter has effect if and only if ``eager_writing`` is False
     (which is the default).  It should contain a list of references
@@ -366,8 +695,13 @@ def save_datasets(job):
 
     Other arguments defined in the job list (either directly under
     ``product_list``, or under ``formats``) are passed on to the satpy writer.  The
-    arguments ``use_tmp_file``, ``staging_zone``, ``output_dir``,
-    ``fname_pattern``, and ``dispatch`` are never passed to the writer.
+    arguments ``use_tmp_file``, ``staging_zone``, ``direct_write``,
+    ``direct_write_block_size``, ``output_dir``, ``fname_pattern``, and
+    ``dispatch`` are never passed to the writer.
+
+    All the datasets of the job are computed together, so the tasks they
+    share are computed only once.  Setting ``report_graph_sharing`` to True
+    logs how many tasks are shared.
     """
     scns = job['resampled_scenes']
     objs = []
@@ -380,11 +714,8 @@ def save_datasets(job):
         callbacks = [dask.delayed(c) for c in call_on_done]
     else:
         callbacks = None
-    if early_moving:
-        cm = nullcontext({})
-    else:
-        cm = renamed_files()
-    with cm as renames:
+    # With early moving, the callbacks move the local files
+    with renamed_files(rename_local_files=not early_moving) as renames:
         for fmat, fmat_config in plist_iter(job['product_list']['product_list'], base_config):
             writer_results = save_dataset(scns, fmat, fmat_config, renames, compute=eager_writing)
             results_with_callbacks = _apply_callbacks(writer_results, callbacks, job, fmat_config)
@@ -392,9 +723,37 @@ def save_datasets(job):
                 objs.append(results_with_callbacks)
                 job['produced_files'].put(fmat_config['filename'])
         if not eager_writing:
+            if job['product_list']['product_list'].get("report_graph_sharing", False):
+                _report_graph_sharing(objs)
             compute_writer_results(objs)
 
 
+def _report_graph_sharing(objs):
+    """Log how many of the tasks of the writer results are shared.
+
+    All the writer results are computed together, so the tasks shared between
+    them, eg. the resampling of a channel used in several products, are
+    computed only once.
+    """
+    graphs = [collection.__dask_graph__() for collection in _iter_dask_collections(objs)]
+    num_tasks = sum(len(graph) for graph in graphs)
+    unique_keys = set()
+    for graph in graphs:
+        unique_keys.update(graph.keys())
+    num_shared = num_tasks - len(unique_keys)
+    logger.info("Computing %d tasks for %d writer results, of which %d tasks (%.1f%%) are shared "
+                "and computed only once.",
+                len(unique_keys), len(graphs), num_shared, 100 * num_shared / max(num_tasks, 1))
+
+
+def _iter_dask_collections(obj):
+    if dask.is_dask_collection(obj):
+        yield obj
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            yield from _iter_dask_collections(item)
+
+
 def _apply_callbacks(writer_results, callbacks, *args):
     """Apply callbacks if there are any.
 
@@ -474,28 +833,49 @@ def product_missing_from_scene(product, scene):
 
 
 class FilePublisher:
-    """Publisher for generated files."""
+    """Publisher for generated files.
+
+    By default, the files are published when the publisher is called as a
+    worker, after all the files of the job are written.  With
+    ``publish_on_done``, the files are published as soon as they are written,
+    by the :func:`callback_publish` callback of :func:`save_datasets`.  The
+    messages are then sent by a background thread, from a queue of at most
+    ``queue_size`` messages, and the publisher only publishes the files that
+    were not already published when it is called as a worker.
+    """
 
-    def __init__(self, port=0, nameservers=""):
+    def __init__(self, port=0, nameservers="", publish_on_done=False, queue_size=1000):
         """Create new instance."""
         self.pub = None
         self.port = port
         self.nameservers = nameservers
-        self.__setstate__({'port': port, 'nameservers': nameservers})
+        self.__setstate__({'port': port, 'nameservers': nameservers,
+                           'publish_on_done': publish_on_done, 'queue_size': queue_size})
 
     def __setstate__(self, kwargs):
         """Set things running even when loading from YAML."""
         logger.debug('Starting publisher')
         self.port = kwargs.get('port', 0)
         self.nameservers = kwargs.get('nameservers', "")
-        self.pub = create_publisher_from_dict_config(
-            {
-                'port': self.port,
-                'nameservers': self.nameservers,
-                'name': 'l2processor',
-            }
-        )
+        self.publish_on_done = kwargs.get('publish_on_done', False)
+        if _LAUNCHER_PUBLISHER_QUEUE is not None:
+            logger.debug('Sending the messages to the launcher publisher')
+            self.pub = QueuedPublisher(_LAUNCHER_PUBLISHER_QUEUE)
+        else:
+            self.pub = create_publisher_from_dict_config(
+                {
+                    'port': self.port,
+                    'nameservers': self.nameservers,
+                    'name': 'l2processor',
+                }
+            )
         self.pub.start()
+        self._sender = None
+        self._published = set()
+        self._job_formats = (None, {})
+        self._lock = threading.Lock()
+        if self.publish_on_done:
+            self._sender = _MessageSender(self.pub, kwargs.get('queue_size', 1000))
 
     @staticmethod
     def create_message(fmat, mda):
@@ -546,30 +926,72 @@ class FilePublisher:
                 }
             msg = Message(topic, 'dispatch', mda)
             logger.debug('Sending dispatch order: %s', str(msg))
-            self.pub.send(str(msg))
+            self._send(str(msg))
 
     def __call__(self, job):
         """Call the publisher."""
-        mda = job['input_mda'].copy()
-        mda.pop('dataset', None)
-        mda.pop('collection', None)
+        mda = _get_publish_mda(job)
         for fmat, fmat_config in plist_iter(job['product_list']['product_list'], mda):
+            if self._sender is not None and self._was_published(fmat_config.get('filename')):
+                continue
             resampled_scene = job['resampled_scenes'].get(fmat['area'], [])
             if product_missing_from_scene(fmat['product'], resampled_scene):
                 logger.debug('Not publishing missing product %s.', str(fmat))
                 continue
-            try:
-                topic, file_mda = self.create_message(fmat, mda)
-            except KeyError:
-                logger.debug('Could not create a message for %s.', str(fmat))
-                continue
-            msg = Message(topic, 'file', file_mda)
-            logger.info('Publishing %s', str(msg))
-            self.pub.send(str(msg))
-            self.send_dispatch_messages(fmat, fmat_config, topic, file_mda)
+            self.publish_file(fmat, fmat_config, mda)
+        if self._sender is not None:
+            with self._lock:
+                self._job_formats = (None, {})
+            self._sender.flush()
+
+    def publish_file(self, fmat, fmat_config, mda):
+        """Publish the file of *fmat*, and the dispatch orders of *fmat_config*."""
+        try:
+            topic, file_mda = self.create_message(fmat, mda)
+        except KeyError:
+            logger.debug('Could not create a message for %s.', str(fmat))
+            return
+        msg = Message(topic, 'file', file_mda)
+        logger.info('Publishing %s', str(msg))
+        self._send(str(msg))
+        self.send_dispatch_messages(fmat, fmat_config, topic, file_mda)
+
+    def publish_written_file(self, job, fmat_config):
+        """Publish the file of *fmat_config* of *job*, as soon as it has been written."""
+        filename = fmat_config['filename']
+        mda = _get_publish_mda(job)
+        with self._lock:
+            # The callbacks of the files of a job use the same formats
+            job_id, formats = self._job_formats
+            if job_id != id(job) or filename not in formats:
+                formats = {fmat.get('filename'): fmat
+                           for fmat, _fmat_config in plist_iter(job['product_list']['product_list'], mda)}
+                self._job_formats = (id(job), formats)
+            fmat = formats.get(filename)
+            if fmat is None:
+                logger.warning('Could not find the format config of %s, not publishing it yet.', filename)
+                return
+            self._published.add(filename)
+        self.publish_file(fmat, fmat_config, mda)
+
+    def _was_published(self, filename):
+        with self._lock:
+            if filename in self._published:
+                self._published.discard(filename)
+                return True
+        return False
+
+    def _send(self, msg):
+        if self._sender is None:
+            self.pub.send(msg)
+        else:
+            self._sender.send(msg)
 
     def stop(self):
         """Stop the publisher."""
+        if getattr(self, '_sender', None) is not None:
+            self._sender.stop()
+            self._sender = None
         if self.pub:
             self.pub.stop()
             self.pub = None
@@ -579,6 +1001,92 @@ class FilePublisher:
         self.stop()
 
 
+_LAUNCHER_PUBLISHER_QUEUE = None
+
+
+def use_launcher_publisher(message_queue):
+    """Send the messages of the file publishers created from now on to *message_queue*.
+
+    The messages are then published by the long-lived publisher of the
+    launcher instead of a publisher of their own.  Setting *message_queue* to
+    None switches back to a publisher per :class:`FilePublisher`.
+    """
+    global _LAUNCHER_PUBLISHER_QUEUE
+    _LAUNCHER_PUBLISHER_QUEUE = message_queue
+
+
+class QueuedPublisher:
+    """A publisher putting the messages in a queue, for the launcher publisher to send them."""
+
+    def __init__(self, message_queue):
+        """Set up the publisher."""
+        self._queue = message_queue
+
+    def start(self):
+        """Start the publisher, nothing to do here."""
+
+    def send(self, msg):
+        """Queue *msg* for the launcher publisher."""
+        self._queue.put(msg)
+
+    def stop(self):
+        """Stop the publisher, nothing to do here."""
+
+
+def _get_publish_mda(job):
+    mda = job['input_mda'].copy()
+    mda.pop('dataset', None)
+    mda.pop('collection', None)
+    return mda
+
+
+class _MessageSender:
+    """Send the messages of a publisher in a background thread.
+
+    The messages are queued in a queue of at most *queue_size* messages, so
+    that adding a message blocks when the sending can't keep up.  All the
+    queued messages are sent in a batch each time the thread wakes up.
+    """
+
+    _stop_sending = object()
+
+    def __init__(self, pub, queue_size):
+        self._pub = pub
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="FilePublisher sender", daemon=True)
+        self._thread.start()
+
+    def send(self, msg):
+        """Queue *msg* for sending."""
+        self._queue.put(msg)
+
+    def flush(self):
+        """Wait until all the queued messages have been sent."""
+        self._queue.join()
+
+    def stop(self):
+        """Send the queued messages and stop the thread."""
+        self._queue.put(self._stop_sending)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            with suppress(queue.Empty):
+                while True:
+                    batch.append(self._queue.get_nowait())
+            try:
+                for msg in batch:
+                    if msg is self._stop_sending:
+                        return
+                    self._pub.send(msg)
+            except Exception:
+                logger.exception("Sending the messages failed")
+            finally:
+                for _msg in batch:
+                    self._queue.task_done()
+
+
 def covers(job):
     """Check overall area coverage.
 
@@ -615,10 +1123,12 @@ def covers(job):
         sensor = list(sensor)[0]
 
     areas = list(product_list['product_list']['areas'].keys())
+    min_coverages = {area: _get_min_coverage(product_list, area) for area in areas}
+    coverages = _get_coverage_cache(job).get_coverages(
+        platform_name, start_time, end_time, sensor,
+        [area for area in areas if min_coverages[area]])
     for area in areas:
-        _check_coverage_for_area(
-            area, product_list, platform_name, start_time, end_time,
-            sensor, job["scene"])
+        _check_coverage_for_area(area, product_list, min_coverages[area], coverages.get(area))
 
     job['product_list'] = product_list
 
@@ -630,43 +1140,36 @@ def _get_scene_metadata(job):
     return scn_mda
 
 
-def _check_coverage_for_area(
-        area, product_list, platform_name, start_time, end_time, sensor, scene):
+def _get_min_coverage(product_list, area):
+    return get_config_value(product_list, "/product_list/areas/%s" % area, "min_coverage")
+
+
+def _check_coverage_for_area(area, product_list, min_coverage, cov):
     """Check area coverage for single area.
 
     Helper for covers().  Changes product_list in-place.
     """
-    area_path = "/product_list/areas/%s" % area
-    min_coverage = get_config_value(product_list,
-                                    area_path,
-                                    "min_coverage")
     if not min_coverage:
         logger.debug("Minimum area coverage not given or set to zero "
                      "for area %s", area)
         return
 
-    _check_overall_coverage_for_area(
-        area, product_list, platform_name, start_time, end_time,
-        sensor, min_coverage)
+    _check_overall_coverage_for_area(area, product_list, min_coverage, cov)
 
 
-def _check_overall_coverage_for_area(
-        area, product_list, platform_name, start_time, end_time, sensor,
-        min_coverage):
+def _check_overall_coverage_for_area(area, product_list, min_coverage, cov):
     """Check overall coverage single area.
 
     Helper for covers().
     """
     area_path = "/product_list/areas/%s" % area
-    cov = _get_scene_coverage(platform_name, start_time, end_time,
-                              sensor, area)
     product_list['product_list']['areas'][area]['area_coverage_percent'] = cov
     if cov < min_coverage:
         logger.info(
             "Area coverage %.2f %% below threshold %.2f %%",
             cov, min_coverage)
         logger.info("Removing area %s from the worklist", area)
-        dpath.delete(product_list, area_path)
+        delete_config_path(product_list, area_path)
 
     else:
         logger.debug(f"Area coverage {cov:.2f}% above threshold "
@@ -675,13 +1178,96 @@ def _check_overall_coverage_for_area(
 
 def _get_scene_coverage(platform_name, start_time, end_time, sensor, area_id):
     """Get scene area coverage in percentages."""
+    return _get_scene_coverages(platform_name, start_time, end_time, sensor, [area_id])[area_id]
+
+
+def _get_scene_coverages(platform_name, start_time, end_time, sensor, area_ids):
+    """Get the scene coverages of all the *area_ids* in percentages.
+
+    The swath boundary is calculated only once for all the areas.
+    """
     overpass = Pass(platform_name, start_time, end_time, instrument=sensor)
-    area_def = get_area_def(area_id)
+    coverages = {}
+    for area_id in area_ids:
+        area_def = _get_area_def(area_id)
+        try:
+            coverages[area_id] = 100 * overpass.area_coverage(area_def)
+        except AttributeError:
+            coverages[area_id] = 100
+    return coverages
 
-    try:
-        return 100 * overpass.area_coverage(area_def)
-    except AttributeError:
-        return 100
+
+class _CoverageCache:
+    """Cache the scene coverages by the pass and the area.
+
+    Without a *size*, all the coverages are kept, which is fine for a cache
+    living only as long as its job.  With a *size*, only that many of the most
+    recently used coverages are kept.
+    """
+
+    def __init__(self, size=None):
+        self._coverages = collections.OrderedDict()
+        self._size = size
+        self._lock = threading.Lock()
+
+    def get_coverage(self, platform_name, start_time, end_time, sensor, area_id):
+        """Get the scene coverage of *area_id* in percentages."""
+        key = (platform_name, start_time, end_time, sensor, area_id)
+        with self._lock:
+            if key in self._coverages:
+                self._coverages.move_to_end(key)
+                return self._coverages[key]
+        coverage = _get_scene_coverage(platform_name, start_time, end_time, sensor, area_id)
+        self._add({key: coverage})
+        return coverage
+
+    def get_coverages(self, platform_name, start_time, end_time, sensor, area_ids):
+        """Get the scene coverages of all the *area_ids* in percentages."""
+        pass_key = (platform_name, start_time, end_time, sensor)
+        coverages = {}
+        with self._lock:
+            for area_id in area_ids:
+                key = pass_key + (area_id, )
+                if key in self._coverages:
+                    self._coverages.move_to_end(key)
+                    coverages[area_id] = self._coverages[key]
+        missing = [area_id for area_id in area_ids if area_id not in coverages]
+        if missing:
+            new_coverages = _get_scene_coverages(platform_name, start_time, end_time, sensor, missing)
+            self._add({pass_key + (area_id, ): cov for area_id, cov in new_coverages.items()})
+            coverages.update(new_coverages)
+        return coverages
+
+    def _add(self, coverages):
+        with self._lock:
+            self._coverages.update(coverages)
+            while self._size is not None and len(self._coverages) > self._size:
+                self._coverages.popitem(last=False)
+
+    def clear(self):
+        """Drop all the coverages."""
+        with self._lock:
+            self._coverages.clear()
+
+
+_COVERAGE_CACHE = None
+
+
+def _get_coverage_cache(job):
+    """Get the coverage cache of the job.
+
+    With ``coverage_cache_size`` in the product list, the cache is kept
+    between the jobs.
+    """
+    global _COVERAGE_CACHE
+    size = job['product_list']['product_list'].get('coverage_cache_size')
+    if size:
+        if _COVERAGE_CACHE is None or _COVERAGE_CACHE._size != size:
+            _COVERAGE_CACHE = _CoverageCache(size)
+        return _COVERAGE_CACHE
+    if 'coverage_cache' not in job:
+        job['coverage_cache'] = _CoverageCache()
+    return job['coverage_cache']
 
 
 def check_metadata(job):
@@ -737,50 +1323,69 @@ def metadata_alias(job):
 
 
 def sza_check(job):
-    """Remove products which are not valid for the current Sun zenith angle."""
+    """Remove products which are not valid for the current Sun zenith angle.
+
+    The Sun zenith angles of all the distinct check points are calculated at
+    once.
+    """
     logger.info("Check Sun zenith angle.")
     scn_mda = _get_scene_metadata(job)
     scn_mda.update(job['input_mda'])
     start_time = scn_mda['start_time']
     product_list = job['product_list']
-    areas = list(product_list['product_list']['areas'].keys())
-    for area in areas:
-        products = list(product_list['product_list']['areas'][area]['products'].keys())
-        for product in products:
-            prod_path = "/product_list/areas/%s/products/%s" % (area, product)
-            lon = get_config_value(product_list, prod_path, "sunzen_check_lon")
-            lat = get_config_value(product_list, prod_path, "sunzen_check_lat")
-            if lon is None or lat is None:
-                logger.debug("No 'sunzen_check_lon' or 'sunzen_check_lat' configured, "
-                             "can\'t check Sun elevation for %s / %s",
-                             area, product)
-                continue
-
-            sunzen = sun_zenith_angle(start_time, lon, lat)
-            logger.debug("Sun zenith angle is %.2f degrees", sunzen)
-            # Check nighttime limit
-            limit = get_config_value(product_list, prod_path,
-                                     "sunzen_minimum_angle")
-            if limit is not None:
-                if sunzen < limit:
-                    logger.info("Sun zenith angle too small for nighttime "
-                                "product '%s', product removed.", product)
-                    dpath.delete(product_list, prod_path)
-                continue
-
-            # Check daytime limit
-            limit = get_config_value(product_list, prod_path,
-                                     "sunzen_maximum_angle")
-            if limit is not None:
-                if sunzen > limit:
-                    logger.info("Sun zenith angle too large for daytime "
-                                "product '%s', product removed.", product)
-                    dpath.delete(product_list, prod_path)
-                continue
-
+    # The values in "common" are used when not set in the product list, as with get_config_value
+    common = product_list.get('common', {})
+    checks = []
+    for flat_prod_cfg, _prod_cfg in plist_iter(product_list['product_list'], common, level='product'):
+        area = flat_prod_cfg['area']
+        product = flat_prod_cfg['product']
+        lon = flat_prod_cfg.get("sunzen_check_lon")
+        lat = flat_prod_cfg.get("sunzen_check_lat")
+        if lon is None or lat is None:
+            logger.debug("No 'sunzen_check_lon' or 'sunzen_check_lat' configured, "
+                         "can\'t check Sun elevation for %s / %s",
+                         area, product)
+            continue
+        checks.append((area, product, (lon, lat),
+                       flat_prod_cfg.get("sunzen_minimum_angle"),
+                       flat_prod_cfg.get("sunzen_maximum_angle")))
+
+    sunzens = _get_sun_zenith_angles(start_time, {check[2] for check in checks})
+    for area, product, point, min_angle, max_angle in checks:
+        sunzen = sunzens[point]
+        logger.debug("Sun zenith angle is %.2f degrees", sunzen)
+        if not _sun_zenith_angle_is_valid(product, sunzen, min_angle, max_angle):
+            delete_config_path(product_list, "/product_list/areas/%s/products/%s" % (area, product))
+
+    for area in list(product_list['product_list']['areas'].keys()):
         if len(product_list['product_list']['areas'][area]['products']) == 0:
             logger.info("Removing empty area: %s", area)
-            dpath.delete(product_list, '/product_list/areas/%s' % area)
+            delete_config_path(product_list, '/product_list/areas/%s' % area)
+
+
+def _get_sun_zenith_angles(start_time, points):
+    """Get the Sun zenith angles of the (lon, lat) *points* in one call."""
+    if not points:
+        return {}
+    points = list(points)
+    lons, lats = np.array(points, dtype=float).T
+    sunzens = sun_zenith_angle(start_time, lons, lats)
+    return dict(zip(points, sunzens))
+
+
+def _sun_zenith_angle_is_valid(product, sunzen, min_angle, max_angle):
+    """Check the Sun zenith angle against the nighttime or, if not given, the daytime limit."""
+    if min_angle is not None:
+        if sunzen < min_angle:
+            logger.info("Sun zenith angle too small for nighttime "
+                        "product '%s', product removed.", product)
+            return False
+        return True
+    if max_angle is not None and sunzen > max_angle:
+        logger.info("Sun zenith angle too large for daytime "
+                    "product '%s', product removed.", product)
+        return False
+    return True
 
 
 def check_sunlight_coverage(job):
@@ -819,11 +1424,13 @@ def check_sunlight_coverage(job):
 
     product_list = job['product_list']
     areas = list(product_list['product_list']['areas'].keys())
+    twilight_resolution = product_list['product_list'].get('twilight_poly_resolution')
+    twilight_poly = None
 
     for area in areas:
         products = list(product_list['product_list']['areas'][area]['products'].keys())
         try:
-            area_def = get_area_def(area)
+            area_def = _get_area_def(area)
         except AreaNotFound:
             area_def = None
         coverage = {True: None, False: None}
@@ -851,32 +1458,34 @@ def check_sunlight_coverage(job):
                 overpass = Pass(platform_name, start_time, end_time, instrument=sensor)
 
             if coverage[check_pass] is None:
+                if twilight_poly is None:
+                    twilight_poly = _get_twilight_poly(start_time, twilight_resolution)
                 coverage[check_pass] = _get_sunlight_coverage(area_def,
                                                               start_time,
-                                                              overpass)
+                                                              overpass,
+                                                              twilight_poly)
             area_conf = product_list['product_list']['areas'][area]
             area_conf['area_sunlight_coverage_percent'] = coverage[check_pass] * 100
             if min_day is not None and coverage[check_pass] < (min_day / 100.0):
                 logger.info("Not enough sunlight coverage for "
                             f"product '{product!s}', removed. Needs at least "
                             f"{min_day:.1f}%, got {coverage[check_pass]:.1%}.")
-                dpath.delete(product_list, prod_path)
+                delete_config_path(product_list, prod_path)
             if max_day is not None and coverage[check_pass] > (max_day / 100.0):
                 logger.info("Too much sunlight coverage for "
                             f"product '{product!s}', removed. Needs at most "
                             f"{max_day:.1f}%, got {coverage[check_pass]:.1%}.")
-                dpath.delete(product_list, prod_path)
+                delete_config_path(product_list, prod_path)
 
 
-def _get_sunlight_coverage(area_def, start_time, overpass=None):
-    """Get the sunlight coverage of *area_def* at *start_time* as a value between 0 and 1."""
-    if area_def.is_geostationary:
-        adp = Boundary(
-            *get_geostationary_bounding_box(area_def,
-                                            nb_points=100)).contour_poly
-    else:
-        adp = area_def.boundary(vertices_per_side=100).contour_poly
-    poly = get_twilight_poly(start_time)
+def _get_sunlight_coverage(area_def, start_time, overpass=None, twilight_poly=None):
+    """Get the sunlight coverage of *area_def* at *start_time* as a value between 0 and 1.
+
+    The *twilight_poly* at *start_time* is calculated if not given.
+    """
+    adp = _get_area_boundary_poly(area_def)
+    if twilight_poly is None:
+        twilight_poly = get_twilight_poly(start_time)
     if overpass is not None:
         ovp = overpass.boundary.contour_poly
         cut_area_poly = adp.intersection(ovp)
@@ -890,7 +1499,7 @@ def _get_sunlight_coverage(area_def, start_time, overpass=None):
             # Should already have been taken care of in pyresample.spherical.intersection
             cut_area_poly = adp
 
-    daylight = cut_area_poly.intersection(poly)
+    daylight = cut_area_poly.intersection(twilight_poly)
     if daylight is None:
         if sun_zenith_angle(start_time, *area_def.get_lonlat(0, 0)) < 90:
             return 1.0
@@ -902,6 +1511,104 @@ def _get_sunlight_coverage(area_def, start_time, overpass=None):
         return daylight_area / total_area
 
 
+@functools.lru_cache(maxsize=256)
+def _get_area_boundary_poly(area_def):
+    """Get the boundary polygon of *area_def*.
+
+    The areas don't change, so the polygons are cached by the area
+    definition.
+    """
+    if area_def.is_geostationary:
+        return Boundary(*get_geostationary_bounding_box(area_def, nb_points=100)).contour_poly
+    return area_def.boundary(vertices_per_side=100).contour_poly
+
+
+def _get_twilight_poly(start_time, resolution=None):
+    """Get the twilight polygon at *start_time*.
+
+    With a *resolution* in seconds, the time is rounded to it, and the
+    polygons are cached by the rounded time.
+    """
+    if not resolution:
+        return get_twilight_poly(start_time)
+    epoch = dt.datetime(1970, 1, 1, tzinfo=start_time.tzinfo)
+    seconds = round((start_time - epoch).total_seconds() / resolution) * resolution
+    return _get_cached_twilight_poly(epoch + dt.timedelta(seconds=seconds))
+
+
+@functools.lru_cache(maxsize=16)
+def _get_cached_twilight_poly(rounded_time):
+    return get_twilight_poly(rounded_time)
+
+
+class AreaRegistry:
+    """Process-wide registry of the area definitions of the product lists.
+
+    The registered areas are shared by all the plugins and jobs, so the area
+    files are parsed only once, and the hashes and boundaries of the areas are
+    calculated only once too.  See :func:`preload_areas`.
+    """
+
+    def __init__(self):
+        """Set up an empty registry."""
+        self._areas = {}
+        self._lock = threading.Lock()
+
+    def load(self, area_ids):
+        """Load and register the areas of *area_ids* that are not registered yet.
+
+        Raises:
+            AreaNotFound: if an area is not found in the area files.
+        """
+        for area_id in area_ids:
+            if area_id in self._areas:
+                continue
+            area_def = get_area_def(area_id)
+            if isinstance(area_def, AreaDefinition):
+                hash(area_def)
+                _get_area_boundary_poly(area_def)
+            with self._lock:
+                self._areas[area_id] = area_def
+            logger.debug("Registered area %s", area_id)
+
+    def get(self, area_id, default=None):
+        """Get the registered area of *area_id*, or *default*."""
+        return self._areas.get(area_id, default)
+
+    def clear(self):
+        """Remove all the areas."""
+        with self._lock:
+            self._areas.clear()
+
+    def __contains__(self, area_id):
+        """Check if *area_id* is registered."""
+        return area_id in self._areas
+
+
+AREA_REGISTRY = AreaRegistry()
+
+
+def preload_areas(config):
+    """Register the areas of *config* in :data:`AREA_REGISTRY`.
+
+    This is done only if ``preload_areas`` is set in the product list.  The
+    null area is skipped.  Missing areas raise `AreaNotFound` before any
+    data is read.
+    """
+    product_list = config.get('product_list', {})
+    if not product_list.get('preload_areas', False):
+        return
+    AREA_REGISTRY.load([area for area in product_list['areas'] if area not in (None, 'None')])
+
+
+def _get_area_def(area_id):
+    """Get the area definition of *area_id*, from the registry if it is there."""
+    area_def = AREA_REGISTRY.get(area_id)
+    if area_def is None:
+        area_def = get_area_def(area_id)
+    return area_def
+
+
 def _get_product_area_def(job, area, product):
     """Get area definition for a product."""
     try:
@@ -926,22 +1633,45 @@ def _get_product_area_def(job, area, product):
 
 
 def add_overviews(job):
-    """Add overviews to images already written to disk."""
+    """Add overviews to images already written to disk.
+
+    The files are handled in parallel threads.  Files that already have the
+    same overviews built with average resampling, eg. by
+    :func:`callback_add_overviews`, are skipped.
+    """
     logger.info("Adding image overviews.")
 
     # Get the formats, including filenames and overview settings
+    fnames = []
+    overviews = []
     for _flat_fmat, fmt in plist_iter(job['product_list']['product_list']):
         if "overviews" in fmt and 'filename' in fmt:
-            fname = fmt['filename']
-            overviews = fmt['overviews']
-            try:
-                with rasterio.open(fname, 'r+') as dst:
-                    dst.build_overviews(overviews, Resampling.average)
-                    dst.update_tags(ns='rio_overview',
-                                    resampling='average')
-                logger.debug("Added overviews to %s", fname)
-            except rasterio.RasterioIOError:
-                pass
+            fnames.append(fmt['filename'])
+            overviews.append(fmt['overviews'])
+    if not fnames:
+        return
+    with ThreadPoolExecutor(thread_name_prefix="overviews") as executor:
+        list(executor.map(_add_overviews_to_file, fnames, overviews))
+
+
+def _add_overviews_to_file(fname, overviews):
+    try:
+        with rasterio.open(fname, 'r+') as dst:
+            if _has_overviews(dst, overviews):
+                logger.debug("%s already has overviews", fname)
+                return
+            dst.build_overviews(overviews, Resampling.average)
+            dst.update_tags(ns='rio_overview',
+                            resampling='average')
+        logger.debug("Added overviews to %s", fname)
+    except rasterio.RasterioIOError:
+        pass
+
+
+def _has_overviews(dst, overviews):
+    """Check if *dst* has the *overviews* built with average resampling."""
+    return (list(dst.overviews(1)) == [int(level) for level in overviews] and
+            dst.tags(ns='rio_overview').get('resampling') == 'average')
 
 
 def _get_plugin_conf(product_list, path, defaults):
@@ -996,14 +1726,14 @@ def check_valid_data_fraction(job):
     # As stated, this will trigger a computation.  To prevent computing
     # multiple times, we should persist everything that needs to be persisted,
     # all together.
-    _persist_what_we_must(job)
+    valid_counts = _persist_what_we_must(job)
     for (area_name, area_props) in job["product_list"]["product_list"]["areas"].items():
         to_remove = set()
         for (prod_name, prod_props) in area_props["products"].items():
             if "min_valid_data_fraction" in prod_props:
                 if not _product_meets_min_valid_data_fraction(
                         prod_name, prod_props, area_name, area_props, job,
-                        exp_cov):
+                        exp_cov, valid_counts):
                     to_remove.add(prod_name)
         for rem in to_remove:
             logger.debug(f"Removing {rem} due to low coverage.")
@@ -1019,21 +1749,27 @@ def _persist_what_we_must(job):
     a `"min_valid_data_fraction"` in the product properties, persists (calculates) them all
     at once and replaces the corresponding datasets with their persisted
     versions.
+
+    The numbers of valid pixels of the products are calculated in the same
+    go, and returned in a dict by area and product name.
     """
     to_persist = []
     for (area_name, area_props) in job["product_list"]["product_list"]["areas"].items():
         scn = job["resampled_scenes"][area_name]
         for (prod_name, prod_props) in area_props["products"].items():
             if "min_valid_data_fraction" in prod_props and prod_name in scn:
-                to_persist.append((scn, prod_name, scn[prod_name]))
+                to_persist.append((scn, area_name, prod_name, scn[prod_name]))
     logger.debug("Persisting early due to content checks")
-    persisted = dask.persist(*[p[2] for p in to_persist])
-    for ((sc, prod_name, _old), new) in zip(to_persist, persisted):
+    counts = [p[3].notnull().sum() for p in to_persist]
+    persisted = dask.persist(*[p[3] for p in to_persist], *counts)
+    for ((sc, _area_name, prod_name, _old), new) in zip(to_persist, persisted):
         sc[prod_name] = new
+    return {(area_name, prod_name): count
+            for ((_sc, area_name, prod_name, _old), count) in zip(to_persist, persisted[len(to_persist):])}
 
 
 def _product_meets_min_valid_data_fraction(
-        prod_name, prod_props, area_name, area_props, job, exp_cov):
+        prod_name, prod_props, area_name, area_props, job, exp_cov, valid_counts=None):
     """Check if product meets min_valid_data_fraction.
 
     Helper for `check_valid_data_fraction`, check if ``product`` meets the
@@ -1053,14 +1789,16 @@ def _product_meets_min_valid_data_fraction(
     sensor = prod.attrs["sensor"]
     if area_name not in exp_cov:
         # _get_scene_coverage uses %, convert to fraction
-        exp_cov[area_name] = _get_scene_coverage(
+        exp_cov[area_name] = _get_coverage_cache(job).get_coverage(
             platform_name, start_time, end_time, sensor, area_name)/100
     exp_valid = exp_cov[area_name]
     if exp_valid == 0:
         logger.debug(f"product {prod_name!s} no expected coverage at all, removing")
         return False
-    valid = job["resampled_scenes"][area_name][prod_name].notnull()
-    actual_valid = float(valid.sum()/valid.size)
+    valid_count = (valid_counts or {}).get((area_name, prod_name))
+    if valid_count is None:
+        valid_count = prod.notnull().sum()
+    actual_valid = float(valid_count/prod.size)
     rel_valid = float(actual_valid / exp_valid)
     logger.debug(f"Expected maximum validity: {exp_valid:%}")
     logger.debug(f"Actual validity (coverage): {actual_valid:%}")
@@ -1138,6 +1876,48 @@ def callback_close(obj, targs, job, fmat_config):
     return obj
 
 
+def callback_add_overviews(obj, targs, job, fmat_config):
+    """Add overviews as a callback by save_datasets call_on_done.
+
+    Callback function that can be used with the :func:`save_datasets`
+    ``call_on_done`` functionality.  Adds the overviews given with
+    ``overviews`` in the format config to the file as soon as it is written,
+    so that the overviews of the different files are built in parallel by the
+    dask workers, and not after all the files are written.
+
+    The file must be complete, so this callback must be called after
+    :func:`callback_close`, and after :func:`callback_move` if that is used.
+    """
+    if "overviews" in fmat_config:
+        _add_overviews_to_file(fmat_config["filename"], fmat_config["overviews"])
+    return obj
+
+
+def callback_publish(obj, targs, job, fmat_config):
+    """Publish the written file as a callback by save_datasets call_on_done.
+
+    Callback function that can be used with the :func:`save_datasets`
+    ``call_on_done`` functionality, together with a :class:`FilePublisher`
+    worker with ``publish_on_done: True``.  The file is published as soon
+    as it is written, instead of after all the files of the job are written.
+
+    The file must be in its final place, so this callback must be called
+    after :func:`callback_close`, and after :func:`callback_move` if that is
+    used.
+
+    The publisher is the ``on_done_publisher`` of the job, set by the
+    launcher.  When the priorities are processed concurrently, it is None,
+    and the files are published in priority order by the publisher worker.
+    """
+    if 'on_done_publisher' not in job:
+        logger.warning("No FilePublisher with publish_on_done, not publishing %s yet.", fmat_config["filename"])
+    elif job['on_done_publisher'] is None:
+        logger.debug("Leaving the publishing of %s to the FilePublisher worker.", fmat_config["filename"])
+    else:
+        job['on_done_publisher'].publish_written_file(job, fmat_config)
+    return obj
+
+
 def use_fsspec_cache(job):
     """Use the caching from fsspec for (remote) files."""
     import fsspec
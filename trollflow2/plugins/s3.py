@@ -19,34 +19,107 @@
 """S3 object store plugins and utilities for Trollflow2."""
 
 import logging
+import os
+import posixpath
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
 
 from trollflow2.dict_tools import plist_iter
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_UPLOAD_WORKERS = 4
+DEFAULT_MULTIPART_CHUNKSIZE = 50
+DEFAULT_UPLOAD_RETRIES = 3
+DEFAULT_UPLOAD_BACKOFF = 1.0
+
 
 def uploader(job):
     """Upload data to S3 and update the filenames.
 
-    Optionally also delete the files after the upload.
+    The files are uploaded concurrently using a single S3 filesystem, and
+    deleted from the staging zone once uploaded.  Failed uploads are retried
+    with an exponential backoff.
     """
-    from trollmoves.movers import S3Mover
+    product_list = job['product_list']['product_list']
+    staging_zone = product_list['staging_zone']
+    workers = product_list.get('s3_upload_workers', DEFAULT_UPLOAD_WORKERS)
+    chunksize = int(product_list.get('s3_multipart_chunksize', DEFAULT_MULTIPART_CHUNKSIZE) * 1024 * 1024)
+    retries = product_list.get('s3_upload_retries', DEFAULT_UPLOAD_RETRIES)
+    backoff = product_list.get('s3_upload_backoff', DEFAULT_UPLOAD_BACKOFF)
 
-    staging_zone = job['product_list']['product_list']['staging_zone']
+    s3 = _get_s3_filesystem()
     logger.info("Uploading data to S3.")
-    for fmt, fmt_config in plist_iter(job['product_list']['product_list']):
-        local_fname = fmt_config['filename'].replace(fmt['output_dir'], staging_zone)
-        logger.debug(f"Uploading {local_fname} to {fmt['output_dir']}")
-        mover = S3Mover(local_fname, fmt['output_dir'])
-        mover.move()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="s3_uploader") as executor:
+        futures = []
+        for fmt, fmt_config in plist_iter(product_list):
+            remote_fname = fmt_config['filename']
+            local_fname = remote_fname.replace(fmt['output_dir'], staging_zone)
+            futures.append(executor.submit(_upload_file, s3, local_fname, remote_fname,
+                                           chunksize, retries, backoff))
+    errors = [future.exception() for future in futures if future.exception() is not None]
+    if errors:
+        logger.error("%d of %d files could not be uploaded to S3", len(errors), len(futures))
+        raise errors[0]
+
 
+def _get_s3_filesystem():
+    """Get the S3 filesystem.
 
-def check_s3_file(remote_file):
-    """Check that file saved in S3 is not empty."""
+    The connection options are taken from the fsspec configuration.
+    """
     from s3fs import S3FileSystem
 
-    s3 = S3FileSystem()
-    if s3.stat(remote_file)['size'] == 0:
-        logger.error("Empty file detected: %s", remote_file)
-        return True
-    return False
+    return S3FileSystem()
+
+
+def _upload_file(s3, local_fname, remote_fname, chunksize, retries, backoff):
+    """Upload *local_fname* to *remote_fname*, and delete it once uploaded.
+
+    Failed uploads are retried *retries* times, with a delay of *backoff*
+    seconds doubled after each attempt.
+    """
+    logger.debug("Uploading %s to %s", local_fname, remote_fname)
+    for attempt in range(retries + 1):
+        try:
+            s3.put_file(local_fname, remote_fname, chunksize=chunksize)
+            break
+        except FileNotFoundError:
+            raise
+        except OSError as err:
+            if attempt == retries:
+                logger.error("Uploading %s failed: %s", local_fname, str(err))
+                raise
+            delay = backoff * 2 ** attempt
+            logger.warning("Uploading %s failed, retrying in %.1f s: %s", local_fname, delay, str(err))
+            time.sleep(delay)
+    os.remove(local_fname)
+
+
+def get_s3_file_sizes(remote_files):
+    """Get the sizes of the files saved in S3, None for the missing files.
+
+    The files are listed once per prefix instead of one request per file.
+    """
+    s3 = _get_s3_filesystem()
+    paths = {remote_file: _get_s3_path(remote_file) for remote_file in remote_files}
+    sizes = {}
+    for prefix in sorted({posixpath.dirname(path) for path in paths.values()}):
+        sizes.update(_list_sizes(s3, prefix))
+    return {remote_file: sizes.get(path) for remote_file, path in paths.items()}
+
+
+def _get_s3_path(remote_file):
+    """Get the ``bucket/key`` path of *remote_file*, as listed by s3fs."""
+    parts = urlsplit(remote_file)
+    return parts.netloc + parts.path
+
+
+def _list_sizes(s3, prefix):
+    """Get the sizes of the files under *prefix*."""
+    try:
+        listing = s3.ls(prefix, detail=True, refresh=True)
+    except FileNotFoundError:
+        return {}
+    return {item['name'].rstrip('/'): item['size'] for item in listing}
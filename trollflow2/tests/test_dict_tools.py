@@ -29,6 +29,7 @@ try:
 except ImportError:
     import mock  # noqa
 
+import copy
 import datetime as dt
 
 try:
@@ -191,6 +192,28 @@ class TestProdList:
         for res, exp in zip(plist_iter(prodlist), expected):
             assert res[0] == exp
 
+    def test_plist_iter_default_formats_are_not_shared(self):
+        """Test that the default format configs are new at each iteration."""
+        from trollflow2.dict_tools import plist_iter
+        prodlist = {"areas": {"euron1": {"products": {"ct": {"productname": "ct"}}}}}
+        for _flat, fmat_config in plist_iter(prodlist):
+            fmat_config["filename"] = "ct.tif"
+        flat, fmat_config = next(plist_iter(prodlist))
+        assert flat["format"] == "tif"
+        assert "filename" not in flat
+        assert "filename" not in fmat_config
+
+    def test_plist_iter_default_formats_from_base_mda(self):
+        """Test that the products without formats are written in the formats of the base metadata."""
+        from trollflow2.dict_tools import plist_iter
+        prodlist = {"areas": {"euron1": {"products": {"ct": {"productname": "ct"}}}}}
+        base_mda = {"formats": [{"format": "nc", "writer": "cf"}]}
+        res = list(plist_iter(prodlist, base_mda))
+        assert [(flat["format"], flat["writer"]) for flat, _ in res] == [("nc", "cf")]
+        assert "formats" not in res[0][0]
+        assert res[0][1] == {"format": "nc", "writer": "cf"}
+        assert res[0][1] is not base_mda["formats"][0]
+
 
 class TestConfigValue:
     """Test case for get_config_value."""
@@ -241,3 +264,41 @@ class TestConfigValue:
         expected = "/tmp/satdmz/pps/www/latest_2018/"
         res = get_config_value(self.prodlist, path, "output_dir")
         assert res == expected
+
+    def test_get_config_value_skips_containers(self):
+        """Test that the area and product names are not taken as config values."""
+        from trollflow2.dict_tools import get_config_value
+        assert get_config_value(self.prodlist, self.path, "euron1") is None
+
+    def test_delete_config_path(self):
+        """Test deleting a path from the config."""
+        from trollflow2.dict_tools import delete_config_path
+        delete_config_path(self.prodlist, self.path)
+        assert "cloudtype" not in self.prodlist["product_list"]["areas"]["germ"]["products"]
+
+
+class TestCopyContainers:
+    """Test copying the product list for the jobs."""
+
+    def setup_method(self):
+        """Set up the test case."""
+        self.prodlist = read_config(raw_string=yaml_test1)
+
+    def test_modifications_do_not_reach_the_original(self):
+        """Test that modifying the copy doesn't modify the original."""
+        from trollflow2.dict_tools import copy_containers
+        original = copy.deepcopy(self.prodlist)
+        prodlist = copy_containers(self.prodlist)
+        areas = prodlist["product_list"]["areas"]
+        areas["euron1"]["products"]["cloud_top_height"]["formats"][0]["filename"] = "foo.png"
+        areas["germ"]["area_coverage_percent"] = 50
+        del areas["omerc_bb"]
+        assert prodlist != original
+        assert self.prodlist == original
+
+    def test_other_items_are_shared(self):
+        """Test that only the dicts and lists are copied."""
+        from trollflow2.dict_tools import copy_containers
+        item = object()
+        prodlist = copy_containers({"areas": {"euron1": {"item": item}}})
+        assert prodlist["areas"]["euron1"]["item"] is item
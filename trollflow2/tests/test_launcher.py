@@ -26,6 +26,7 @@ import datetime
 import logging
 import os
 import queue
+import threading
 import time
 from contextlib import contextmanager
 
@@ -34,6 +35,7 @@ import yaml
 from yaml import YAMLError
 
 from trollflow2.launcher import launch
+from trollflow2.logging import queued_logging
 from trollflow2.tests.test_logging import duplicate_lines
 
 try:
@@ -43,7 +45,8 @@ except ImportError:
 
 from unittest import mock
 
-from trollflow2.launcher import VALID_MESSAGE_TYPES, generate_messages, process
+from trollflow2.launcher import (VALID_MESSAGE_TYPES, generate_messages, process,
+                                 read_config)
 from trollflow2.tests.utils import TestCase
 
 yaml_test1 = """
@@ -171,6 +174,18 @@ class TestMessageToJobs:
         jobs = message_to_jobs(msg, prodlist)
         assert"germ" in jobs[999]["product_list"]["product_list"]["areas"]
 
+    def test_message_to_jobs_with_shared_scene(self):
+        """Test that the jobs get the same shared scene with `share_scene`."""
+        from trollflow2.launcher import SharedScene, message_to_jobs
+        prodlist = yaml.safe_load(yaml_test1)
+        prodlist["product_list"]["share_scene"] = True
+        msg = mock.MagicMock()
+        msg.data = {"uri": "foo"}
+
+        jobs = message_to_jobs(msg, prodlist)
+        assert isinstance(jobs[1]["shared_scene"], SharedScene)
+        assert jobs[1]["shared_scene"] is jobs[999]["shared_scene"]
+
     def test_message_to_jobs_minimal(self):
         """Test converting a message to minimal jobs."""
         from trollflow2.launcher import message_to_jobs
@@ -896,7 +911,8 @@ def test_check_results_s3_nominally(tmp_path, caplog):
     s3fs_mock = mock.MagicMock()
     with mock.patch.dict("sys.modules", {"s3fs": s3fs_mock}):
         produced_files = FakeQueue(0, 3, "s3://bucket-name", write=False)
-        s3fs_mock.S3FileSystem.return_value.stat.return_value = {"size": 0}
+        s3fs_mock.S3FileSystem.return_value.ls.return_value = [{"name": f"bucket-name/file{i:d}", "size": 0}
+                                                               for i in range(3)]
         caplog_text = _run_check_results(
             start_time, exitcode, produced_files, caplog)
         assert "Empty file detected" in caplog_text
@@ -918,17 +934,141 @@ def test_check_results_s3_missing_file(tmp_path, caplog):
 
 
 def test_check_results_s3_file_exists(tmp_path, caplog):
-    """Test functionality for check_results."""
+    """Test that the files saved in S3 are checked with a single listing."""
     start_time = datetime.datetime(1900, 1, 1)
     exitcode = 0
     s3fs_mock = mock.MagicMock()
+    s3fs_mock.S3FileSystem.return_value.ls.return_value = [{"name": f"bucket-name/file{i:d}", "size": 10}
+                                                           for i in range(10, 13)]
     with mock.patch.dict("sys.modules", {"s3fs": s3fs_mock}):
-        from trollflow2.launcher import check_results
         produced_files = FakeQueue(10, 13, "s3://bucket-name/", write=False)
-        check_results(produced_files, start_time, exitcode)
-        assert mock.call("s3://bucket-name/file10") in s3fs_mock.S3FileSystem.return_value.stat.mock_calls
-        assert mock.call("s3://bucket-name/file11") in s3fs_mock.S3FileSystem.return_value.stat.mock_calls
-        assert mock.call("s3://bucket-name/file12") in s3fs_mock.S3FileSystem.return_value.stat.mock_calls
+        caplog_text = _run_check_results(start_time, exitcode, produced_files, caplog)
+    s3fs_mock.S3FileSystem.return_value.ls.assert_called_once_with("bucket-name", detail=True, refresh=True)
+    s3fs_mock.S3FileSystem.return_value.stat.assert_not_called()
+    assert "All 3 files produced nominally" in caplog_text
+
+
+def test_check_results_s3_file_not_listed(tmp_path, caplog):
+    """Test that a file missing from the S3 listing is reported."""
+    start_time = datetime.datetime(1900, 1, 1)
+    exitcode = 0
+    s3fs_mock = mock.MagicMock()
+    s3fs_mock.S3FileSystem.return_value.ls.return_value = [{"name": "bucket-name/file10", "size": 10}]
+    with mock.patch.dict("sys.modules", {"s3fs": s3fs_mock}):
+        produced_files = FakeQueue(10, 12, "s3://bucket-name/", write=False)
+        caplog_text = _run_check_results(start_time, exitcode, produced_files, caplog)
+    assert "Missing file: s3://bucket-name/file11" in caplog_text
+    assert "files produced nominally" not in caplog_text
+
+
+def test_check_results_reports_all_the_files(tmp_path, caplog):
+    """Test that all the files are checked and reported, not only up to the first problem."""
+    from trollflow2.launcher import check_results
+
+    start_time = datetime.datetime(1900, 1, 1)
+    produced_files = FakeQueue(0, 3, tmp_path, skip=[1])
+    with caplog.at_level(logging.DEBUG):
+        report = check_results(produced_files, start_time, 0, max_workers=2)
+    assert report == {os.path.join(tmp_path, "file0"): "Empty file detected",
+                      os.path.join(tmp_path, "file1"): "Missing file",
+                      os.path.join(tmp_path, "file2"): None}
+    assert "Empty file detected" in caplog.text
+    assert "Missing file" in caplog.text
+    assert "2 of the 3 produced files have problems" in caplog.text
+
+
+@pytest.mark.filterwarnings("ignore:Dataset has no geotransform")
+def test_check_results_validates_the_files(tmp_path, caplog):
+    """Test that the GeoTIFF and NetCDF files are opened when validating."""
+    import numpy as np
+    import rasterio
+
+    from trollflow2.launcher import check_results
+
+    netCDF4 = pytest.importorskip("netCDF4")
+    good_tif = os.fspath(tmp_path / "good.tif")
+    with rasterio.open(good_tif, "w", driver="GTiff", width=2, height=2, count=1, dtype="uint8") as dst:
+        dst.write(np.zeros((1, 2, 2), dtype=np.uint8))
+    good_nc = os.fspath(tmp_path / "good.nc")
+    with netCDF4.Dataset(good_nc, "w") as dst:
+        dst.createDimension("x", 2)
+    bad_tif = tmp_path / "bad.tif"
+    bad_tif.write_text("zucchini")
+    bad_nc = tmp_path / "bad.nc"
+    bad_nc.write_text("zucchini")
+    saved_files = [good_tif, good_nc, os.fspath(bad_tif), os.fspath(bad_nc)]
+
+    start_time = datetime.datetime(1900, 1, 1)
+    report = check_results(_queue_with(saved_files), start_time, 0)
+    assert set(report.values()) == {None}
+
+    with caplog.at_level(logging.DEBUG):
+        report = check_results(_queue_with(saved_files), start_time, 0, validate=True)
+    assert report[good_tif] is None
+    assert report[good_nc] is None
+    assert report[os.fspath(bad_tif)].startswith("Unreadable file")
+    assert report[os.fspath(bad_nc)].startswith("Unreadable file")
+    assert "files produced nominally" not in caplog.text
+
+
+def test_check_results_skips_the_validation_without_the_library(tmp_path, caplog):
+    """Test that the files are not validated when the library to open them is missing, with a single warning."""
+    from trollflow2.launcher import _warn_not_validated, check_results
+
+    saved_files = []
+    for name in ("bad1.nc", "bad2.nc"):
+        saved_file = tmp_path / name
+        saved_file.write_text("zucchini")
+        saved_files.append(os.fspath(saved_file))
+
+    _warn_not_validated.cache_clear()
+    with mock.patch.dict("sys.modules", {"netCDF4": None}), caplog.at_level(logging.WARNING):
+        report = check_results(_queue_with(saved_files), datetime.datetime(1900, 1, 1), 0, validate=True)
+    assert set(report.values()) == {None}
+    assert caplog.text.count("Cannot import netCDF4, the .nc files are not validated.") == 1
+
+
+def test_check_results_remote_files(caplog):
+    """Test that the files on other remote filesystems are checked with fsspec."""
+    import fsspec
+
+    from trollflow2.launcher import check_results
+
+    fs = fsspec.filesystem("memory")
+    fs.pipe("/results/file.png", b"zucchini")
+    saved_files = ["memory://results/file.png", "memory://results/missing.png"]
+    try:
+        report = check_results(_queue_with(saved_files), datetime.datetime(1900, 1, 1), 0)
+    finally:
+        fs.rm("/results", recursive=True)
+    assert report == {"memory://results/file.png": None, "memory://results/missing.png": "Missing file"}
+
+
+def _queue_with(items):
+    produced_files = queue.Queue()
+    for item in items:
+        produced_files.put(item)
+    return produced_files
+
+
+def test_runner_checks_the_results_after_releasing_the_job_slot():
+    """Test that the results are checked in the background with the check options."""
+    import threading
+
+    from trollflow2.launcher import Runner
+
+    runner = Runner("prod_list", {}, validate_products=True, check_workers=2)
+    slots_in_use = []
+
+    def _check_results(*args, **kwargs):
+        slots_in_use.append(runner.job_slots._running)
+
+    with mock.patch("trollflow2.launcher.check_results", side_effect=_check_results) as check_results:
+        runner._run_product_list_on_messages([mock.MagicMock(data={})], mock.MagicMock(), threading.Thread)
+    check_results.assert_called_once()
+    assert check_results.call_args.kwargs["validate"] is True
+    assert check_results.call_args.kwargs["max_workers"] == 2
+    assert slots_in_use == [0]
 
 
 def test_argparse_nameserver_is_none():
@@ -1036,3 +1176,788 @@ def touch_worker(job, **kwargs):
     """A worker that proves it ran by creating a file."""
     with open(job["product_list"]["proof_file"], "w") as fd:
         fd.write("I ran successfully inside a process!")
+
+
+def _record_concurrency(msg, prod_list, produced_files, running, maximum, lock, **kwargs):
+    with lock:
+        running.append(msg)
+        maximum.append(len(running))
+    time.sleep(0.2)
+    with lock:
+        running.remove(msg)
+
+
+def _run_concurrently(messages, **kwargs):
+    import threading
+    from functools import partial
+
+    from trollflow2.launcher import Runner
+
+    running = []
+    maximum = []
+    target = partial(_record_concurrency, running=running, maximum=maximum, lock=threading.Lock())
+    runner = Runner("prod_list", {}, **kwargs)
+    with mock.patch("trollflow2.launcher.check_results") as check_results:
+        runner._run_product_list_on_messages(messages, target, threading.Thread)
+    assert check_results.call_count == len(messages)
+    return max(maximum)
+
+
+def test_runner_processes_messages_concurrently():
+    """Test that the runner processes messages concurrently when allowed to."""
+    messages = [mock.MagicMock(subject="/topic", data={"platform_name": "NOAA-15"}) for _ in range(4)]
+    assert _run_concurrently(messages, max_concurrent_jobs=3) == 3
+
+
+def test_runner_processes_messages_one_at_a_time_by_default():
+    """Test that the runner processes one message at a time by default."""
+    messages = [mock.MagicMock(subject="/topic", data={"platform_name": "NOAA-15"}) for _ in range(2)]
+    assert _run_concurrently(messages) == 1
+
+
+def test_runner_limits_concurrent_jobs_per_platform():
+    """Test that the number of concurrent jobs per platform can be limited."""
+    messages = [mock.MagicMock(subject="/topic", data={"platform_name": "NOAA-15"}) for _ in range(3)]
+    assert _run_concurrently(messages, max_concurrent_jobs=3, max_jobs_per_platform=1) == 1
+    messages.append(mock.MagicMock(subject="/topic", data={"platform_name": "Metop-B"}))
+    assert _run_concurrently(messages, max_concurrent_jobs=3, max_jobs_per_platform=1) == 2
+
+
+def test_runner_limits_concurrent_jobs_per_topic():
+    """Test that the number of concurrent jobs per topic can be limited."""
+    messages = [mock.MagicMock(subject=topic, data={}) for topic in ["/topic1", "/topic1", "/topic2"]]
+    assert _run_concurrently(messages, max_concurrent_jobs=3, max_jobs_per_topic=1) == 2
+
+
+def test_runner_does_not_hold_back_the_messages_of_other_platforms():
+    """Test that a message waiting for its platform doesn't hold back the messages of other platforms."""
+    from functools import partial
+
+    from trollflow2.launcher import Runner
+
+    messages = [mock.MagicMock(subject="/topic", data={"platform_name": platform_name})
+                for platform_name in ["NOAA-15", "NOAA-15", "Metop-B"]]
+    started = []
+    target = partial(_record_start, started=started)
+    runner = Runner("prod_list", {}, max_concurrent_jobs=3, max_jobs_per_platform=1)
+    with mock.patch("trollflow2.launcher.check_results"):
+        runner._run_product_list_on_messages(messages, target, threading.Thread)
+    assert started == [messages[0], messages[2], messages[1]]
+
+
+def _record_start(msg, prod_list, produced_files, started, **kwargs):
+    started.append(msg)
+    time.sleep(0.2)
+
+
+class TestJobSlots:
+    """Test the job slots."""
+
+    def test_waiting_messages_start_when_their_slot_is_released(self):
+        """Test that the waiting messages start in order when their slot is released."""
+        from trollflow2.launcher import JobSlots
+
+        slots = JobSlots(3, max_jobs_per_platform=1)
+        noaa1, noaa2, metop = [mock.MagicMock(data={"platform_name": platform_name})
+                               for platform_name in ["NOAA-15", "NOAA-15", "Metop-B"]]
+        assert [msg for msg, _ in slots.submit(noaa1)] == [noaa1]
+        assert slots.submit(noaa2) == []
+        assert [msg for msg, _ in slots.submit(metop)] == [metop]
+        assert slots.release(metop) == []
+        assert [msg for msg, _ in slots.release(noaa1)] == [noaa2]
+        assert slots.release(noaa2) == []
+        slots.wait_until_idle()
+
+    @pytest.mark.parametrize("limits", [dict(max_jobs=0), dict(max_jobs_per_topic=0),
+                                        dict(max_jobs_per_platform=-1)])
+    def test_limits_are_validated(self, limits):
+        """Test that the limits must allow at least one job."""
+        from trollflow2.launcher import JobSlots
+
+        with pytest.raises(ValueError, match="must be at least 1"):
+            JobSlots(**limits)
+
+
+def test_runner_logs_the_errors_when_following_the_jobs(caplog):
+    """Test that an error when following a job is logged, and the job slot released."""
+    from trollflow2.launcher import Runner
+
+    messages = [mock.MagicMock(subject="/topic", data={}) for _ in range(3)]
+    process_creator = mock.MagicMock()
+    process_creator.return_value.join.side_effect = [RuntimeError("Oh no!"), None, None]
+    runner = Runner("prod_list", {}, max_concurrent_jobs=2)
+    with mock.patch("trollflow2.launcher.check_results") as check_results:
+        runner._run_product_list_on_messages(messages, mock.MagicMock(), process_creator)
+    assert "Following the job of" in caplog.text
+    assert "Oh no!" in caplog.text
+    assert check_results.call_count == 2
+    assert runner.job_slots._running == 0
+
+
+def test_argparse_max_concurrent_jobs():
+    """Test the command line arguments for concurrent processing."""
+    from trollflow2.launcher import parse_args
+
+    res = parse_args(["-j", "4", "--max-jobs-per-platform", "2", "product_list.yaml"])
+    assert res["max_concurrent_jobs"] == 4
+    assert res["max_jobs_per_platform"] == 2
+    assert res["max_jobs_per_topic"] is None
+
+
+def _get_pid_in_worker(msg, prod_list, produced_files):
+    produced_files.put(os.getpid())
+    if msg == "crash":
+        raise ValueError("Oh no!")
+
+
+def _send_to_launcher_publisher(msg, prod_list, produced_files):
+    from trollflow2 import plugins
+
+    plugins._LAUNCHER_PUBLISHER_QUEUE.put(f"message for {msg}")
+
+
+def _run_warm_job(pool, msg):
+    from trollflow2.logging import logging_on
+
+    produced_files = queue.Queue()
+    job = pool.create_process(target=_get_pid_in_worker, args=(msg,),
+                              kwargs=dict(produced_files=produced_files, prod_list="prod_list"))
+    with logging_on():
+        job.start()
+        job.join()
+    return produced_files.get(), job.exitcode
+
+
+class TestWarmWorkerPool:
+    """Test the pool of warm workers."""
+
+    def test_worker_is_reused_and_retired(self):
+        """Test that the worker process is reused and retired after the max number of jobs."""
+        from trollflow2.launcher import WarmWorkerPool
+
+        pool = WarmWorkerPool(max_jobs_per_worker=2)
+        try:
+            pid1, exitcode1 = _run_warm_job(pool, "msg1")
+            pid2, exitcode2 = _run_warm_job(pool, "msg2")
+            pid3, exitcode3 = _run_warm_job(pool, "msg3")
+        finally:
+            pool.shutdown()
+        assert pid1 == pid2
+        assert pid3 != pid1
+        assert exitcode1 == exitcode2 == exitcode3 == 0
+
+    def test_worker_is_retired_after_crash(self):
+        """Test that the worker is replaced when a job crashes."""
+        from trollflow2.launcher import WarmWorkerPool
+
+        pool = WarmWorkerPool()
+        try:
+            pid1, exitcode1 = _run_warm_job(pool, "crash")
+            pid2, exitcode2 = _run_warm_job(pool, "msg2")
+        finally:
+            pool.shutdown()
+        assert exitcode1 == 1
+        assert exitcode2 == 0
+        assert pid1 != pid2
+
+    def test_workers_get_the_publisher_queue_when_started(self):
+        """Test that the warm workers send the messages to the publisher queue given to the pool."""
+        from trollflow2 import create_queue
+        from trollflow2.launcher import WarmWorkerPool
+
+        publisher_queue = create_queue()
+        pool = WarmWorkerPool(publisher_queue=publisher_queue)
+        try:
+            job = pool.create_process(target=_send_to_launcher_publisher, args=("msg1",),
+                                      kwargs=dict(produced_files=queue.Queue(), prod_list="prod_list",
+                                                  publisher_queue=publisher_queue))
+            assert "publisher_queue" not in job.kwargs
+            job.start()
+            job.join()
+        finally:
+            pool.shutdown()
+        assert job.exitcode == 0
+        assert publisher_queue.get(timeout=10) == "message for msg1"
+
+    def test_worker_timings_are_forwarded_separately(self):
+        """Test that the worker timings of a warm job are forwarded on their own queue."""
+        from trollflow2.launcher import WarmWorkerPool
+
+        produced_files = queue.Queue()
+        worker_timings = queue.Queue()
+        pool = WarmWorkerPool()
+        try:
+            job = pool.create_process(target=_send_worker_timings, args=("msg",),
+                                      kwargs=dict(produced_files=produced_files, worker_timings=worker_timings,
+                                                  prod_list="prod_list"))
+            job.start()
+            job.join()
+        finally:
+            pool.shutdown()
+        assert job.exitcode == 0
+        assert list(produced_files.queue) == ["msg.tif"]
+        timings = worker_timings.get_nowait()
+        assert timings["save_datasets"]["dask_tasks"] == 2
+        assert timings.peak_rss_scope == "process"
+
+    def test_workers_are_started_with_the_pool(self):
+        """Test that the workers are started before the first job, and the retired ones replaced."""
+        from trollflow2.launcher import WarmWorkerPool
+
+        pool = WarmWorkerPool(max_jobs_per_worker=1)
+        try:
+            pool.start(2)
+            workers = list(pool._idle_workers)
+            assert len(workers) == 2
+            assert all(worker.is_alive() for worker in workers)
+            pid, _ = _run_warm_job(pool, "msg1")
+            assert pid in [worker.proc.pid for worker in workers]
+            assert len(pool._idle_workers) == 2
+            assert pid not in [worker.proc.pid for worker in pool._idle_workers]
+        finally:
+            pool.shutdown()
+
+    def test_worker_is_retired_when_using_too_much_memory(self):
+        """Test that the worker is replaced when it uses too much memory."""
+        from trollflow2.launcher import WarmWorkerPool
+
+        pool = WarmWorkerPool(max_rss=1)
+        try:
+            pid1, _ = _run_warm_job(pool, "msg1")
+            pid2, _ = _run_warm_job(pool, "msg2")
+        finally:
+            pool.shutdown()
+        assert pid1 != pid2
+
+
+@queued_logging
+def _produce_files_in_subprocess(msg, prod_list, produced_files):
+    # More than what fits in the pipe buffer
+    for i in range(2000):
+        produced_files.put(f"/some/long/directory/name/for/the/produced/files/file{i:d}.tif")
+
+
+def test_subprocess_job_forwards_the_produced_files():
+    """Test that the files produced in a subprocess job are forwarded to the produced files queue."""
+    from trollflow2.launcher import SubprocessJob
+    from trollflow2.logging import logging_on
+
+    produced_files = queue.Queue()
+    job = SubprocessJob(target=_produce_files_in_subprocess, args=("msg",),
+                        kwargs=dict(produced_files=produced_files, prod_list="prod_list"))
+    with logging_on():
+        job.start()
+        job.join()
+    assert job.exitcode == 0
+    assert produced_files.qsize() == 2000
+    assert produced_files.get() == "/some/long/directory/name/for/the/produced/files/file0.tif"
+
+
+def _send_worker_timings(msg, prod_list, produced_files, worker_timings):
+    from trollflow2.launcher import WorkerTimings
+
+    produced_files.put(f"{msg}.tif")
+    worker_timings.put(WorkerTimings.from_timings([dict(worker="save_datasets", wall_time=1.0, cpu_time=1.0,
+                                                        peak_rss_delta=0.0, dask_tasks=2)]))
+
+
+@queued_logging
+def _queue_logged_send_worker_timings(msg, prod_list, produced_files, worker_timings):
+    _send_worker_timings(msg, prod_list, produced_files, worker_timings)
+
+
+def test_subprocess_job_forwards_the_worker_timings_separately():
+    """Test that the worker timings of a subprocess job are forwarded on their own queue."""
+    from trollflow2.launcher import SubprocessJob
+    from trollflow2.logging import logging_on
+
+    produced_files = queue.Queue()
+    worker_timings = queue.Queue()
+    job = SubprocessJob(target=_queue_logged_send_worker_timings, args=("msg",),
+                        kwargs=dict(produced_files=produced_files, worker_timings=worker_timings,
+                                    prod_list="prod_list"))
+    with logging_on():
+        job.start()
+        job.join()
+    assert job.exitcode == 0
+    assert list(produced_files.queue) == ["msg.tif"]
+    timings = worker_timings.get_nowait()
+    assert timings["save_datasets"]["dask_tasks"] == 2
+    assert timings.peak_rss_scope == "message"
+
+
+def test_runner_uses_warm_workers():
+    """Test that the runner uses the warm workers when asked to."""
+    from trollflow2.launcher import Runner
+
+    with mock.patch("trollflow2.launcher.WarmWorkerPool") as pool, \
+            mock.patch("trollflow2.launcher.check_results"):
+        runner = Runner("prod_list", {}, warm_workers=True, max_jobs_per_worker=10)
+        runner._run_subprocess(["msg"])
+    pool.assert_called_once_with(10, None, None)
+    pool.return_value.start.assert_called_once_with(1)
+    pool.return_value.create_process.assert_called_once()
+    pool.return_value.shutdown.assert_called_once()
+
+
+class TestLauncherPublisher:
+    """Test the publisher owned by the launcher."""
+
+    def test_queued_messages_are_published(self):
+        """Test that the messages put in the queue are published, and the publisher is stopped."""
+        from trollflow2.launcher import LauncherPublisher
+
+        with mock.patch("posttroll.publisher.create_publisher_from_dict_config") as create_publisher:
+            publisher = LauncherPublisher(port=40000, nameservers=False)
+            publisher.start()
+            publisher.queue.put("message 1")
+            publisher.queue.put("message 2")
+            publisher.stop()
+        create_publisher.assert_called_once_with({"port": 40000, "nameservers": False, "name": "l2processor"})
+        pub = create_publisher.return_value
+        pub.start.assert_called_once()
+        assert pub.send.mock_calls == [mock.call("message 1"), mock.call("message 2")]
+        pub.stop.assert_called_once()
+
+    def test_runner_gives_the_queue_to_the_jobs(self):
+        """Test that the runner starts the publisher and passes its queue to the jobs."""
+        from trollflow2.launcher import Runner
+
+        with mock.patch("trollflow2.launcher.LauncherPublisher") as publisher, \
+                mock.patch("trollflow2.launcher.create_logged_process") as create_process, \
+                mock.patch("trollflow2.launcher.check_results"):
+            runner = Runner("prod_list", {}, publisher_settings=dict(port=0, nameservers=None))
+            runner._get_message_iterator = mock.MagicMock(return_value=["msg"])
+            runner.run()
+        publisher.assert_called_once_with(port=0, nameservers=None)
+        publisher.return_value.start.assert_called_once()
+        publisher.return_value.stop.assert_called_once()
+        kwargs = create_process.call_args.kwargs["kwargs"]
+        assert kwargs["publisher_queue"] is publisher.return_value.queue
+
+    def test_threaded_runner_file_publishers_use_the_queue(self, tmp_path):
+        """Test that the file publishers of the product list cached in threaded mode send to the launcher publisher."""
+        import queue
+
+        import trollflow2.plugins
+        from trollflow2.launcher import Runner
+
+        fname = tmp_path / "pl.yaml"
+        fname.write_text(yaml_test_file_publisher)
+        published_messages = []
+
+        def _publish_from_the_cached_product_list(*args):
+            file_publisher = runner._product_list_cache.get(str(fname))["workers"][0]["fun"]
+            file_publisher.pub.send("message")
+            published_messages.append(publisher.return_value.queue.get(timeout=1))
+
+        # The plugins are imported again by trollflow2.tests.utils, use the
+        # module the product list is read with
+        with mock.patch("trollflow2.launcher.LauncherPublisher") as publisher, \
+                mock.patch("trollflow2.launcher.use_launcher_publisher", trollflow2.plugins.use_launcher_publisher), \
+                mock.patch("trollflow2.plugins.create_publisher_from_dict_config") as create_publisher:
+            publisher.return_value.queue = queue.Queue()
+            runner = Runner(str(fname), {}, threaded=True, publisher_settings=dict(port=0, nameservers=None))
+            with mock.patch.object(runner, "_run_product_list_on_messages",
+                                   side_effect=_publish_from_the_cached_product_list):
+                runner.run()
+        create_publisher.assert_not_called()
+        assert published_messages == ["message"]
+
+    def test_process_uses_the_queue(self):
+        """Test that processing a message with a publisher queue makes the file publishers use it."""
+        from trollflow2.launcher import process
+
+        msg = mock.MagicMock(data={"uri": "foo"})
+        with mock.patch("trollflow2.launcher.use_launcher_publisher") as use_launcher_publisher, \
+                mock.patch("trollflow2.launcher.process_files") as process_files:
+            process(msg, "prod_list", "produced_files", publisher_queue="publisher_queue")
+        use_launcher_publisher.assert_called_once_with("publisher_queue")
+        process_files.assert_called_once()
+
+    def test_launch_with_launcher_publisher(self):
+        """Test the command line arguments of the launcher publisher."""
+        with mock.patch("trollflow2.launcher.Runner") as Runner:
+            from trollflow2.launcher import launch
+
+            launch(["-p", "--publisher-port", "40000", "--publisher-nameserver", "false", "product_list.yaml"])
+        assert Runner.call_args.kwargs["publisher_settings"] == dict(port=40000, nameservers=False)
+        assert "publisher_port" not in Runner.call_args.args[1]
+
+    def test_launch_without_launcher_publisher(self):
+        """Test that the launcher publisher is not used by default."""
+        with mock.patch("trollflow2.launcher.Runner") as Runner:
+            from trollflow2.launcher import launch
+
+            launch(["product_list.yaml"])
+        assert Runner.call_args.kwargs["publisher_settings"] is None
+
+
+yaml_test_file_publisher = """
+product_list:
+  subscribe_topics:
+    - /foo
+  areas:
+    euron1:
+      products:
+        ct:
+          productname: ct
+workers:
+  - fun: !!python/object:trollflow2.plugins.FilePublisher {port: 0, nameservers: false}
+"""
+
+
+yaml_test_stoppable_worker = """
+product_list:
+  areas:
+    euron1:
+      products:
+        ct:
+          productname: ct
+workers:
+  - fun: !!python/object/apply:unittest.mock.MagicMock []
+"""
+
+
+class TestProductListCache:
+    """Test the product list cache."""
+
+    def test_product_list_is_read_once(self, tmp_path):
+        """Test that the product list is read only once when unchanged."""
+        from trollflow2.launcher import ProductListCache
+
+        fname = tmp_path / "pl.yaml"
+        fname.write_text(yaml_test_minimal)
+        cache = ProductListCache()
+        with mock.patch("trollflow2.launcher.read_config", wraps=read_config) as reader:
+            config1 = cache.get(str(fname))
+            config2 = cache.get(str(fname))
+        reader.assert_called_once()
+        assert config1["product_list"] == config2["product_list"]
+        assert config1["workers"] is config2["workers"]
+
+    def test_jobs_do_not_alter_the_cached_product_list(self, tmp_path):
+        """Test that modifying the product list of a job doesn't alter the cache."""
+        from trollflow2.launcher import ProductListCache, file_list_to_jobs
+
+        fname = tmp_path / "pl.yaml"
+        fname.write_text(yaml_test_minimal)
+        cache = ProductListCache()
+        jobs = file_list_to_jobs(["foo"], cache.get(str(fname)), {})
+        del jobs[999]["product_list"]["product_list"]["areas"]["euro4"]
+        config = cache.get(str(fname))
+        assert "euro4" in config["product_list"]["areas"]
+        assert "formats" not in config["product_list"]["areas"]["euro4"]["products"]["airmass"]
+
+    def test_product_list_is_reloaded_when_changed(self, tmp_path):
+        """Test that a modified product list is reloaded and the old workers stopped."""
+        from trollflow2.launcher import ProductListCache
+
+        fname = tmp_path / "pl.yaml"
+        fname.write_text(yaml_test_stoppable_worker)
+        cache = ProductListCache()
+        old_worker = cache.get(str(fname))["workers"][0]["fun"]
+        fname.write_text(yaml_test_stoppable_worker.replace("ct:", "cma:", 1))
+        config = cache.get(str(fname))
+        old_worker.stop.assert_called_once()
+        assert "cma" in config["product_list"]["areas"]["euron1"]["products"]
+        new_worker = config["workers"][0]["fun"]
+        cache.clear()
+        new_worker.stop.assert_called_once()
+
+    def test_preloaded_areas_are_dropped_when_the_product_list_is_reloaded(self, tmp_path):
+        """Test that the preloaded areas are read again when the product list changes."""
+        from trollflow2.launcher import ProductListCache
+
+        fname = tmp_path / "pl.yaml"
+        fname.write_text(yaml_test_minimal)
+        cache = ProductListCache()
+        cache.get(str(fname))
+        with mock.patch("trollflow2.launcher.AREA_REGISTRY") as area_registry:
+            cache.get(str(fname))
+            area_registry.clear.assert_not_called()
+            fname.write_text(yaml_test_minimal.replace("airmass:", "cma:", 1))
+            cache.get(str(fname))
+        area_registry.clear.assert_called_once()
+
+    def test_workers_of_reloaded_product_list_are_stopped_after_the_jobs(self, tmp_path):
+        """Test that the workers of a reloaded product list are only stopped when the jobs using them are done."""
+        from trollflow2.launcher import ProductListCache
+
+        fname = tmp_path / "pl.yaml"
+        fname.write_text(yaml_test_stoppable_worker)
+        cache = ProductListCache()
+        with cache.use(str(fname)) as old_config:
+            old_worker = old_config["workers"][0]["fun"]
+            fname.write_text(yaml_test_stoppable_worker.replace("ct:", "cma:", 1))
+            config = cache.get(str(fname))
+            assert config is not old_config
+            old_worker.stop.assert_not_called()
+        old_worker.stop.assert_called_once()
+        config["workers"][0]["fun"].stop.assert_not_called()
+        cache.clear()
+        config["workers"][0]["fun"].stop.assert_called_once()
+
+    def test_threaded_runner_reads_the_topics_from_the_cache(self, tmp_path):
+        """Test that the threaded runner gets the topics from the cached product list."""
+        from trollflow2.launcher import Runner
+
+        fname = tmp_path / "pl.yaml"
+        fname.write_text(yaml_test_stoppable_worker.replace("  areas:", "  subscribe_topics:\n    - /topic1\n  areas:"))
+        runner = Runner(str(fname), threaded=True)
+        with mock.patch("trollflow2.launcher.yaml.load", wraps=yaml.load) as yaml_load:
+            runner._fill_in_connection_parameters()
+            runner._product_list_cache.get(str(fname))
+        yaml_load.assert_called_once()
+        assert runner.connection_parameters["topic"] == ["/topic1"]
+
+    def test_process_files_keeps_cached_workers_running(self, tmp_path):
+        """Test that processing files with the cache doesn't stop the workers."""
+        from trollflow2.launcher import ProductListCache, process_files
+
+        fname = tmp_path / "pl.yaml"
+        fname.write_text(yaml_test_stoppable_worker)
+        cache = ProductListCache()
+        with mock.patch("trollflow2.launcher.PRODUCT_LIST_CACHE", cache), \
+                mock.patch("trollflow2.launcher.process_jobs") as process_jobs:
+            process_files([], {}, str(fname), queue.Queue())
+        workers = process_jobs.call_args[0][0]
+        workers[0]["fun"].stop.assert_not_called()
+
+
+def _create_prioritized_jobs(priority_concurrency):
+    """Create jobs with two priorities."""
+    return {prio: {"product_list": {"product_list": {"priority_concurrency": priority_concurrency}}}
+            for prio in (2, 1)}
+
+
+class TestProcessJobsConcurrently:
+    """Test processing the priority groups concurrently."""
+
+    def setup_method(self):
+        """Set up the workers."""
+        from trollflow2.launcher import FilePublisher
+
+        self.barrier = threading.Barrier(2, timeout=5)
+        self.published = []
+        publisher = mock.MagicMock(spec=FilePublisher)
+        publisher.side_effect = lambda job: self.published.append(job["processing_priority"])
+        self.workers = [{"fun": self._wait_for_other_priority},
+                        {"fun": publisher}]
+
+    def _wait_for_other_priority(self, job):
+        self.barrier.wait()
+        if job["processing_priority"] == 1:
+            time.sleep(0.1)
+
+    def test_priorities_are_processed_concurrently(self):
+        """Test that the priorities are processed at the same time, but published in order."""
+        from trollflow2.launcher import process_jobs
+
+        process_jobs(self.workers, _create_prioritized_jobs(2), queue.Queue())
+        assert self.published == [1, 2]
+
+    def test_aborted_priority_is_not_published(self):
+        """Test that an aborted priority doesn't stop the other priorities."""
+        from trollflow2.launcher import AbortProcessing, process_jobs
+
+        def _abort_first_priority(job):
+            if job["processing_priority"] == 1:
+                raise AbortProcessing("No coverage")
+
+        self.workers.insert(1, {"fun": _abort_first_priority})
+        process_jobs(self.workers, _create_prioritized_jobs(2), queue.Queue())
+        assert self.published == [2]
+
+    def test_errors_are_propagated(self):
+        """Test that errors in the concurrently run workers are raised."""
+        from trollflow2.launcher import process_jobs
+
+        def _crash(job):
+            raise ValueError("Boom")
+
+        self.workers.insert(1, {"fun": _crash})
+        with pytest.raises(ValueError, match="Boom"):
+            process_jobs(self.workers, _create_prioritized_jobs(2), queue.Queue())
+        assert self.published == []
+
+    @pytest.mark.parametrize("priority_concurrency", [1, 2])
+    def test_on_done_publisher_is_given_to_the_jobs(self, priority_concurrency):
+        """Test that the publisher publishing the files when written is given to the jobs, unless concurrent."""
+        from trollflow2.launcher import process_jobs
+
+        publisher = self.workers[1]["fun"]
+        publisher.publish_on_done = True
+        self.workers[0]["fun"] = mock.MagicMock()
+        jobs = _create_prioritized_jobs(priority_concurrency)
+        process_jobs(self.workers, jobs, queue.Queue())
+        expected = publisher if priority_concurrency == 1 else None
+        assert all(job["on_done_publisher"] is expected for job in jobs.values())
+        assert self.published == [1, 2]
+
+    def test_on_done_publisher_is_not_given_without_publish_on_done(self):
+        """Test that the jobs don't get a publisher when none publishes the files when written."""
+        from trollflow2.launcher import process_jobs
+
+        self.workers[0]["fun"] = mock.MagicMock()
+        jobs = _create_prioritized_jobs(1)
+        process_jobs(self.workers, jobs, queue.Queue())
+        assert all("on_done_publisher" not in job for job in jobs.values())
+
+
+def _compute_dask_array(job):
+    import dask.array as da
+
+    da.ones((10, 10), chunks=5).sum().compute(scheduler="threads")
+
+
+def test_process_jobs_sends_the_worker_timings(caplog):
+    """Test that the timings of the workers are logged and sent on their own queue."""
+    from trollflow2.launcher import WorkerTimings, process_jobs
+
+    produced_files = queue.Queue()
+    worker_timings = queue.Queue()
+    workers = [{"fun": _compute_dask_array}, {"fun": mock.MagicMock()}]
+    with caplog.at_level(logging.DEBUG):
+        process_jobs(workers, _create_prioritized_jobs(1), produced_files, worker_timings=worker_timings)
+
+    assert produced_files.empty()
+    timings = worker_timings.get_nowait()
+    assert isinstance(timings, WorkerTimings)
+    assert timings.peak_rss_scope == "message"
+    assert list(timings.keys()) == ["_compute_dask_array", "MagicMock"]
+    assert timings["_compute_dask_array"]["runs"] == 2
+    assert timings["_compute_dask_array"]["dask_tasks"] > 0
+    assert timings["MagicMock"]["dask_tasks"] == 0
+    assert timings["_compute_dask_array"]["wall_time"] > 0
+    assert timings["_compute_dask_array"]["peak_rss_delta"] >= 0
+    records = [rec for rec in caplog.records if getattr(rec, "worker", None) == "_compute_dask_array"]
+    assert [rec.priority for rec in records] == [1, 2]
+    assert all(rec.cpu_time >= 0 for rec in records)
+
+
+def test_process_jobs_sends_the_worker_timings_on_failure():
+    """Test that the timings of the workers are sent also when the processing crashes."""
+    from trollflow2.launcher import process_jobs
+
+    worker_timings = queue.Queue()
+    workers = [{"fun": mock.MagicMock(side_effect=ValueError("Boom"))}]
+    with pytest.raises(ValueError, match="Boom"):
+        process_jobs(workers, _create_prioritized_jobs(1), queue.Queue(), worker_timings=worker_timings)
+    assert worker_timings.get_nowait()["MagicMock"]["runs"] == 1
+
+
+def test_process_jobs_labels_the_peak_rss_of_reused_processes():
+    """Test that the peak RSS of a process reused for several messages is labelled as such."""
+    from trollflow2.launcher import ProductListCache, process_jobs
+
+    worker_timings = queue.Queue()
+    with mock.patch("trollflow2.launcher.PRODUCT_LIST_CACHE", ProductListCache()):
+        process_jobs([{"fun": mock.MagicMock()}], _create_prioritized_jobs(1), queue.Queue(),
+                     worker_timings=worker_timings)
+    assert worker_timings.get_nowait().peak_rss_scope == "process"
+
+
+@pytest.mark.parametrize(("platform", "ru_maxrss"), [("linux", 2048), ("darwin", 2 * 1024 ** 2)])
+def test_peak_rss_is_in_megabytes(platform, ru_maxrss):
+    """Test that the peak RSS is in MB, from the kilobytes of Linux and the bytes of macOS."""
+    from trollflow2.launcher import _get_peak_rss
+
+    with mock.patch("trollflow2.launcher.sys.platform", platform), \
+            mock.patch("trollflow2.launcher.resource.getrusage") as getrusage:
+        getrusage.return_value.ru_maxrss = ru_maxrss
+        assert _get_peak_rss() == 2
+
+
+def test_process_jobs_logs_the_worker_timings_without_a_queue(caplog):
+    """Test that the worker timings are logged when there is no queue to send them to."""
+    from trollflow2.launcher import process_jobs
+
+    with caplog.at_level(logging.INFO):
+        process_jobs([{"fun": mock.MagicMock()}], _create_prioritized_jobs(1), queue.Queue())
+    assert "Worker timings: MagicMock" in caplog.text
+
+
+def test_check_results_logs_the_worker_timings(tmp_path, caplog):
+    """Test that the worker timings are logged, and not checked as produced files."""
+    from trollflow2.launcher import WorkerTimings, check_results
+
+    saved_file = tmp_path / "file.png"
+    saved_file.write_bytes(b"zucchini")
+    timings = WorkerTimings.from_timings([dict(worker="save_datasets", priority=1, wall_time=1.5, cpu_time=1.0,
+                                               peak_rss_delta=10.0, dask_tasks=12)])
+    with caplog.at_level(logging.INFO):
+        report = check_results(_queue_with([os.fspath(saved_file)]), datetime.datetime(1900, 1, 1), 0,
+                               worker_timings=_queue_with([timings]))
+    assert report == {os.fspath(saved_file): None}
+    assert "Worker timings: save_datasets 1.50 s" in caplog.text
+    assert caplog.records[0].worker_timings["save_datasets"]["dask_tasks"] == 12
+    assert "All 1 files produced nominally" in caplog.text
+
+
+def produce_proof_file(job, **kwargs):
+    """A worker that creates a file and reports it as produced."""
+    proof_file = job["product_list"]["proof_file"]
+    with open(proof_file, "w") as fd:
+        fd.write("I ran successfully!")
+    job["produced_files"].put(proof_file)
+
+
+def test_runner_records_the_metrics(tmp_path):
+    """Test that the runner records the metrics of the processed messages."""
+    from posttroll.message import Message
+
+    from trollflow2.launcher import Runner
+
+    config_file = tmp_path / "trollflow2.yaml"
+    config_file.write_text(f"""
+    proof_file: {tmp_path / "proof.txt"}
+    product_list:
+      areas:
+        test_area:
+          products:
+            test_product:
+                hello: world
+
+    workers:
+      - fun: !!python/name:trollflow2.tests.test_launcher.produce_proof_file
+    """)
+    message_file = tmp_path / "message.txt"
+    message_file.write_text(str(Message("/my/topic", atype="file", data={"filename": "foo"})))
+
+    runner = Runner(config_file, {}, test_message=str(message_file))
+    runner.run()
+
+    assert runner.metrics.get("trollflow2_messages_received") == 1
+    assert runner.metrics.get("trollflow2_messages_processed") == 1
+    assert runner.metrics.get("trollflow2_messages_failed") is None
+    assert runner.metrics.get("trollflow2_job_exit_codes", exitcode=0) == 1
+    assert runner.metrics.get("trollflow2_produced_files") == 1
+    assert runner.metrics.get("trollflow2_produced_bytes") == len("I ran successfully!")
+    assert runner.metrics.get("trollflow2_job_peak_rss_megabytes", scope="process") > 0
+    rendered = runner.metrics.render()
+    assert 'trollflow2_worker_duration_seconds_count{worker="produce_proof_file"} 1' in rendered
+    assert "trollflow2_message_queue_wait_seconds_count 1" in rendered
+
+
+def test_runner_serves_the_metrics_while_running():
+    """Test that the metrics server is started and stopped with the runner."""
+    from trollflow2.launcher import Runner
+
+    runner = Runner("prod_list", {}, metrics_port=0)
+    with mock.patch.object(runner, "_get_message_iterator", return_value=[]), \
+            mock.patch.object(runner.metrics_server, "start") as start, \
+            mock.patch.object(runner.metrics_server, "stop") as stop:
+        runner.run()
+    start.assert_called_once()
+    stop.assert_called_once()
+
+
+def test_launch_with_metrics_port():
+    """Test the command line argument of the metrics port."""
+    with mock.patch("trollflow2.launcher.Runner") as Runner:
+        from trollflow2.launcher import launch
+
+        launch(["--metrics-port", "9200", "product_list.yaml"])
+    assert Runner.call_args.kwargs["metrics_port"] == 9200
+    assert "metrics_port" not in Runner.call_args.args[1]
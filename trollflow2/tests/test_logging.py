@@ -22,18 +22,20 @@
 """Tests for the logging utilities."""
 
 import logging
+import queue
 import time
 from unittest import mock
 
 import pytest
 
-from trollflow2.logging import (DEFAULT_LOG_CONFIG, create_logged_process,
+from trollflow2.logging import (DEFAULT_LOG_CONFIG, BatchingQueueHandler,
+                                BatchQueueListener, create_logged_process,
                                 logging_on, queued_logging)
 
 
 def test_queued_logging_has_a_listener():
     """Test that the queued logging has a listener."""
-    with mock.patch("trollflow2.logging.QueueListener", autospec=True) as q_listener:
+    with mock.patch("trollflow2.logging.BatchQueueListener", autospec=True) as q_listener:
         with logging_on():
             assert q_listener.called
             assert q_listener.return_value.start.called
@@ -42,7 +44,7 @@ def test_queued_logging_has_a_listener():
 
 def test_queued_logging_stops_listener_on_exception():
     """Test that queued logging stops the listener even if an exception occurs."""
-    with mock.patch("trollflow2.logging.QueueListener", autospec=True) as q_listener:
+    with mock.patch("trollflow2.logging.BatchQueueListener", autospec=True) as q_listener:
         with pytest.raises(Exception, match="Oh no!"):
             with logging_on():
                 raise Exception("Oh no!")
@@ -222,3 +224,79 @@ def test_default_logging_config_works_with_subprocesses(capsys):
     assert "root warning" in err
     assert "foo1 debug" in err
     assert "foo2 debug" in err
+
+
+def _make_record(level, msg):
+    return logging.makeLogRecord(dict(name="test", levelno=level, levelname=logging.getLevelName(level), msg=msg))
+
+
+def test_batching_queue_handler_puts_records_in_batches():
+    """Test that the records are put in the queue in batches."""
+    log_queue = queue.Queue()
+    handler = BatchingQueueHandler(log_queue, batch_size=3, flush_interval=10)
+    for i in range(7):
+        handler.handle(_make_record(logging.INFO, f"record {i}"))
+    assert [len(batch) for batch in log_queue.queue] == [3, 3]
+    handler.close()
+    assert [len(batch) for batch in log_queue.queue] == [3, 3, 1]
+    assert handler.queued == 7
+    assert handler.dropped == 0
+
+
+def test_batching_queue_handler_flushes_on_a_timer():
+    """Test that the buffered records are put in the queue after the flush interval."""
+    log_queue = queue.Queue()
+    handler = BatchingQueueHandler(log_queue, batch_size=100, flush_interval=0.01)
+    handler.handle(_make_record(logging.INFO, "lonely record"))
+    batch = log_queue.get(timeout=1)
+    handler.close()
+    assert batch[0].getMessage() == "lonely record"
+
+
+@pytest.mark.parametrize(("policy", "num_debug_kept"), [("drop_debug", 0), ("sample", 2)])
+def test_batching_queue_handler_drops_debug_records_when_the_queue_is_full(policy, num_debug_kept):
+    """Test that the DEBUG records are dropped when the queue is full."""
+    log_queue = mock.Mock()
+    log_queue.put_nowait.side_effect = queue.Full
+    handler = BatchingQueueHandler(log_queue, batch_size=11, flush_interval=10, policy=policy, sample_rate=5)
+    for i in range(10):
+        handler.handle(_make_record(logging.DEBUG, f"debug {i}"))
+    handler.handle(_make_record(logging.WARNING, "warning"))
+    batch = log_queue.put.call_args.args[0]
+    assert len(batch) == num_debug_kept + 1
+    assert batch[-1].getMessage() == "warning"
+    assert handler.dropped == 10 - num_debug_kept
+    assert handler.queued == num_debug_kept + 1
+
+    handler.close()
+    warning = log_queue.put.call_args.args[0][0].getMessage()
+    assert warning == f"{10 - num_debug_kept} log records were dropped as the logging queue was full"
+
+
+def test_batching_queue_handler_rejects_unknown_policy():
+    """Test that an unknown policy is rejected."""
+    with pytest.raises(ValueError):
+        BatchingQueueHandler(queue.Queue(), policy="panic")
+
+
+def test_batch_queue_listener_handles_batches_and_single_records():
+    """Test that the listener handles both the batches and the single records."""
+    handler = mock.Mock(level=logging.DEBUG)
+    listener = BatchQueueListener(queue.Queue(), handler)
+    listener.handle([_make_record(logging.INFO, "one"), _make_record(logging.INFO, "two")])
+    listener.handle(_make_record(logging.INFO, "three"))
+    assert [call.args[0].getMessage() for call in handler.handle.call_args_list] == ["one", "two", "three"]
+
+
+def test_queued_logging_settings_are_taken_from_the_config(caplog):
+    """Test that the batching settings are read from the log config."""
+    config = {"version": 1,
+              "handlers": {"console": {"class": "logging.StreamHandler"}},
+              "root": {"level": "DEBUG", "handlers": ["console"]},
+              "queued_logging": {"batch_size": 2, "policy": "drop_debug"}}
+    with logging_on(config):
+        proc = create_logged_process(target=fun, args=(["foo1"],), kwargs={})
+        proc.start()
+        proc.join()
+    assert proc.exitcode == 0
+    assert "foo1 debug" in caplog.text
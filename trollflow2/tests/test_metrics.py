@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026 Pytroll developers
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>
+"""Tests for the metrics."""
+
+import urllib.error
+import urllib.request
+
+import pytest
+
+from trollflow2.metrics import CONTENT_TYPE, Metrics, MetricsServer
+
+
+def test_counters_and_gauges_are_rendered():
+    """Test that the counters and gauges are rendered in the OpenMetrics format."""
+    metrics = Metrics()
+    metrics.inc("trollflow2_messages_received")
+    metrics.inc("trollflow2_messages_received")
+    metrics.inc("trollflow2_job_exit_codes", exitcode=-9)
+    metrics.set("trollflow2_job_peak_rss_megabytes", 512.5)
+
+    lines = metrics.render().splitlines()
+    assert "# TYPE trollflow2_messages_received counter" in lines
+    assert "trollflow2_messages_received_total 2" in lines
+    assert 'trollflow2_job_exit_codes_total{exitcode="-9"} 1' in lines
+    assert "trollflow2_job_peak_rss_megabytes 512.5" in lines
+    assert lines[-1] == "# EOF"
+
+
+def test_histograms_are_cumulative():
+    """Test that the histogram buckets are cumulative."""
+    metrics = Metrics(buckets=(1, 10))
+    for value in (0.5, 5, 50):
+        metrics.observe("trollflow2_worker_duration_seconds", value, worker="save_datasets")
+
+    lines = metrics.render().splitlines()
+    assert 'trollflow2_worker_duration_seconds_bucket{worker="save_datasets",le="1.0"} 1' in lines
+    assert 'trollflow2_worker_duration_seconds_bucket{worker="save_datasets",le="10.0"} 2' in lines
+    assert 'trollflow2_worker_duration_seconds_bucket{worker="save_datasets",le="+Inf"} 3' in lines
+    assert 'trollflow2_worker_duration_seconds_count{worker="save_datasets"} 3' in lines
+    assert 'trollflow2_worker_duration_seconds_sum{worker="save_datasets"} 55.5' in lines
+
+
+def test_label_values_are_escaped():
+    """Test that the quotes in the label values are escaped."""
+    metrics = Metrics()
+    metrics.observe("trollflow2_worker_duration_seconds", 1, worker='my "worker"')
+    assert 'worker="my \\"worker\\""' in metrics.render()
+
+
+def test_wrong_metric_type_is_rejected():
+    """Test that a metric can't be used as another type."""
+    metrics = Metrics()
+    with pytest.raises(TypeError):
+        metrics.set("trollflow2_messages_received", 1)
+
+
+def test_metrics_are_served_over_http():
+    """Test scraping the metrics from localhost."""
+    metrics = Metrics()
+    metrics.inc("trollflow2_produced_bytes", 1024)
+    server = MetricsServer(metrics, port=0, host="localhost")
+    server.start()
+    try:
+        with urllib.request.urlopen(f"http://localhost:{server.port}/metrics", timeout=5) as response:
+            content_type = response.headers["Content-Type"]
+            body = response.read().decode()
+        with pytest.raises(urllib.error.HTTPError, match="404"):
+            urllib.request.urlopen(f"http://localhost:{server.port}/nothing", timeout=5)
+    finally:
+        server.stop()
+    assert content_type == CONTENT_TYPE
+    assert "trollflow2_produced_bytes_total 1024" in body.splitlines()
@@ -23,9 +23,10 @@
 """Test S3 related plugins."""
 
 import datetime as dt
+import os
 from unittest import mock
 
-import pytest  # noqa
+import pytest
 
 from trollflow2.launcher import read_config
 from trollflow2.tests.utils import create_filenames_and_topics
@@ -69,37 +70,103 @@ input_mda = {"orig_platform_name": "noaa15", "orbit_number": 7993,
              "sensor": ["avhrr"]}
 
 
-def test_s3_uploader_update_filenames():
-    """Ensure that filenames are updated when transfer is made to S3."""
+def _create_s3_job(staging_zone, **options):
+    """Create a job with the files saved in *staging_zone*."""
     from yaml import UnsafeLoader
 
     from trollflow2.dict_tools import plist_iter
-    from trollflow2.plugins.s3 import uploader
 
     product_list = read_config(raw_string=yaml_test_s3_uploader_plain, Loader=UnsafeLoader)
+    product_list["product_list"]["staging_zone"] = str(staging_zone) + "/"
+    product_list["product_list"].update(options)
     job = {"product_list": product_list, "input_mda": input_mda.copy()}
     _ = create_filenames_and_topics(job)
+    local_files = []
+    for fmt, fmt_config in plist_iter(job["product_list"]["product_list"]):
+        local_fname = fmt_config["filename"].replace(fmt["output_dir"], str(staging_zone) + "/")
+        with open(local_fname, "w") as fd:
+            fd.write("data")
+        local_files.append(local_fname)
+    return job, local_files
+
+
+def test_s3_uploader_update_filenames(tmp_path):
+    """Ensure that filenames are updated when transfer is made to S3."""
+    from trollflow2.dict_tools import plist_iter
+    from trollflow2.plugins.s3 import uploader
+
+    job, _ = _create_s3_job(tmp_path)
 
-    movers_mock = mock.MagicMock()
-    trollmoves_mock = mock.MagicMock()
-    with mock.patch.dict("sys.modules", {"trollmoves": trollmoves_mock, "trollmoves.movers": movers_mock}):
+    s3fs_mock = mock.MagicMock()
+    with mock.patch.dict("sys.modules", {"s3fs": s3fs_mock}):
         uploader(job)
         for fmt, _ in plist_iter(job["product_list"]["product_list"]):
             assert fmt["filename"].startswith("s3://bucket-name/")
 
 
-def test_s3_uploader_move():
-    """Test that S3 mover is moving the file."""
-    from yaml import UnsafeLoader
-    product_list = read_config(raw_string=yaml_test_s3_uploader_plain, Loader=UnsafeLoader)
-    job = {"product_list": product_list, "input_mda": input_mda.copy()}
-    _ = create_filenames_and_topics(job)
+def test_s3_uploader_move(tmp_path):
+    """Test that the files are uploaded with a single filesystem and deleted from the staging zone."""
+    from trollflow2.plugins.s3 import uploader
+
+    job, local_files = _create_s3_job(tmp_path, s3_multipart_chunksize=5)
+
+    s3fs_mock = mock.MagicMock()
+    with mock.patch.dict("sys.modules", {"s3fs": s3fs_mock}):
+        uploader(job)
+
+    s3fs_mock.S3FileSystem.assert_called_once_with()
+    put_file = s3fs_mock.S3FileSystem.return_value.put_file
+    assert put_file.call_count == 2
+    for local_fname in local_files:
+        remote_fname = local_fname.replace(str(tmp_path) + "/", "s3://bucket-name/")
+        assert mock.call(local_fname, remote_fname, chunksize=5 * 1024 * 1024) in put_file.mock_calls
+        assert not os.path.exists(local_fname)
+
+
+def test_s3_uploader_retries(tmp_path):
+    """Test that the failed uploads are retried."""
+    from trollflow2.plugins.s3 import uploader
 
-    movers_mock = mock.MagicMock()
-    trollmoves_mock = mock.MagicMock()
-    with mock.patch.dict("sys.modules", {"trollmoves": trollmoves_mock, "trollmoves.movers": movers_mock}):
-        from trollflow2.plugins.s3 import uploader
+    job, local_files = _create_s3_job(tmp_path, s3_upload_workers=1, s3_upload_backoff=0)
 
+    s3fs_mock = mock.MagicMock()
+    s3fs_mock.S3FileSystem.return_value.put_file.side_effect = [OSError("Slow down"), None, None]
+    with mock.patch.dict("sys.modules", {"s3fs": s3fs_mock}):
         uploader(job)
 
-        assert movers_mock.S3Mover.return_value.move.call_count == 2
+    assert s3fs_mock.S3FileSystem.return_value.put_file.call_count == 3
+    assert not any(os.path.exists(local_fname) for local_fname in local_files)
+
+
+def test_s3_uploader_gives_up(tmp_path, caplog):
+    """Test that the upload fails when the retries are exhausted, and the local file is kept."""
+    from trollflow2.plugins.s3 import uploader
+
+    job, local_files = _create_s3_job(tmp_path, s3_upload_retries=1, s3_upload_backoff=0)
+
+    s3fs_mock = mock.MagicMock()
+    s3fs_mock.S3FileSystem.return_value.put_file.side_effect = OSError("Slow down")
+    with mock.patch.dict("sys.modules", {"s3fs": s3fs_mock}):
+        with pytest.raises(OSError, match="Slow down"):
+            uploader(job)
+
+    assert s3fs_mock.S3FileSystem.return_value.put_file.call_count == 4
+    assert all(os.path.exists(local_fname) for local_fname in local_files)
+    assert "2 of 2 files could not be uploaded to S3" in caplog.text
+
+
+def test_get_s3_file_sizes_lists_each_prefix_once():
+    """Test that the sizes of the S3 files are got with one listing per prefix."""
+    from trollflow2.plugins.s3 import get_s3_file_sizes
+
+    listings = {"bucket/a": [{"name": "bucket/a/file1", "size": 1}, {"name": "bucket/a/file2", "size": 0}],
+                "bucket/b": [{"name": "bucket/b/file3", "size": 3}]}
+    s3fs_mock = mock.MagicMock()
+    s3fs_mock.S3FileSystem.return_value.ls.side_effect = lambda prefix, **kwargs: listings[prefix]
+    with mock.patch.dict("sys.modules", {"s3fs": s3fs_mock}):
+        assert get_s3_file_sizes(["s3://bucket/a/file1", "s3://bucket/b/file3"]) == {"s3://bucket/a/file1": 1,
+                                                                                     "s3://bucket/b/file3": 3}
+        assert get_s3_file_sizes(["s3://bucket/a/file2", "s3://bucket/a/missing"]) == {"s3://bucket/a/file2": 0,
+                                                                                       "s3://bucket/a/missing": None}
+
+    assert s3fs_mock.S3FileSystem.return_value.ls.call_count == 3
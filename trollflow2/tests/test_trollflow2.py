@@ -33,6 +33,7 @@ from contextlib import suppress
 from functools import partial
 from unittest import mock
 
+import dask
 import dask.array as da
 import numpy as np
 import pytest
@@ -678,6 +679,125 @@ def test_use_staging_zone_tmpfile(tmp_path):
     assert next(iter(renames.keys())).startswith(os.fspath(tmp_path))
 
 
+def test_direct_write_to_remote_filesystem():
+    """Test that the files are written directly to the remote filesystem, and moved once complete."""
+    import fsspec
+
+    from trollflow2.plugins import prepared_filename, renamed_files
+
+    fs = fsspec.filesystem("memory")
+    fmat = {"direct_write": True, "use_tmp_file": True, "output_dir": "memory://bucket/direct",
+            "fname_pattern": "product.png"}
+    with renamed_files() as renames:
+        with prepared_filename(fmat, renames) as file_object:
+            file_object.write(b"zucchini")
+        assert not fs.exists("/bucket/direct/product.png")
+    assert renames[file_object] == "memory://bucket/direct/product.png"
+    assert fs.cat("/bucket/direct/product.png") == b"zucchini"
+    assert fs.ls("/bucket/direct", detail=False) == ["/bucket/direct/product.png"]
+    fs.rm("/bucket", recursive=True)
+
+
+def test_direct_write_is_discarded_on_failure():
+    """Test that the directly written files are discarded when the saving fails."""
+    from trollflow2.plugins import prepared_filename, renamed_files
+
+    fmat = {"direct_write": True, "output_dir": "memory://bucket/failed", "fname_pattern": "product.png"}
+    with mock.patch("trollflow2.plugins._open_remote_file") as open_remote_file:
+        with pytest.raises(ValueError):
+            with renamed_files() as renames:
+                with prepared_filename(fmat, renames):
+                    pass
+                raise ValueError("Oh no!")
+    open_remote_file.assert_called_once_with("memory://bucket/failed/product.png", False, None)
+    file_object = open_remote_file.return_value
+    file_object.discard.assert_called_once()
+    file_object.commit.assert_not_called()
+
+
+@pytest.mark.parametrize("fmat", [{"fname_pattern": "product.tif"},
+                                  {"fname_pattern": "product.png", "writer": "mitiff"}])
+def test_direct_write_is_not_used_for_other_writers(fmat, caplog):
+    """Test that the files of the writers not known to write to file objects are saved with their filename."""
+    from trollflow2.plugins import prepared_filename
+
+    fmat = dict(fmat, direct_write=True, output_dir="memory://bucket/other")
+    renames = {}
+    with mock.patch("trollflow2.plugins._open_remote_file") as open_remote_file, caplog.at_level(logging.WARNING):
+        with prepared_filename(fmat, renames) as filename:
+            pass
+    open_remote_file.assert_not_called()
+    assert filename == "memory://bucket/other/" + fmat["fname_pattern"]
+    assert renames == {}
+    assert "writer can't write to file objects, saving memory://bucket/other/" in caplog.text
+
+
+def test_save_to_file_object_refuses_other_writers(fake_scene):
+    """Test that saving to a file object with a writer not known to support it fails clearly."""
+    from trollflow2.plugins import _save_to_file_object
+
+    file_object = mock.MagicMock(path="/bucket/other/product.nc")
+    with pytest.raises(ValueError, match="The cf writer can't write to file objects."):
+        _save_to_file_object(fake_scene, "dragon_top_height", file_object, False, {"format": "nc"})
+    file_object.write.assert_not_called()
+
+
+def test_direct_write_of_skipped_product_is_discarded(fake_scene):
+    """Test that the directly written file of a product missing from the scene is discarded."""
+    from trollflow2.plugins import renamed_files, save_dataset
+
+    fmat = {"direct_write": True, "output_dir": "memory://bucket/skipped", "fname_pattern": "product.png",
+            "area": "sargasso", "product": "missing_product", "format": "png", "writer": "simple_image"}
+    fmat_config = {}
+    with mock.patch("trollflow2.plugins._open_remote_file") as open_remote_file:
+        with renamed_files() as renames:
+            assert save_dataset({"sargasso": fake_scene}, fmat, fmat_config, renames) is None
+    file_object = open_remote_file.return_value
+    file_object.discard.assert_called_once()
+    file_object.commit.assert_not_called()
+    assert renames == {}
+    assert "filename" not in fmat_config
+
+
+@pytest.mark.parametrize("early_moving", [False, True])
+def test_save_datasets_direct_write(fake_scene, early_moving):
+    """Test saving the datasets directly to a remote filesystem."""
+    import fsspec
+    from PIL import Image
+
+    from trollflow2.plugins import save_datasets
+
+    product_list = {
+        "fname_pattern": "{productname}.{format}",
+        "output_dir": "memory://bucket/save",
+        "direct_write": True,
+        "use_tmp_file": True,
+        "early_moving": early_moving,
+        "areas": {
+            "sargasso": {
+                "products": {
+                    "dragon_top_height": {
+                        "productname": "dragon_top_height",
+                        "formats": [{"writer": "simple_image", "format": "png"}]},
+                }
+            }
+        }
+    }
+    job = {"input_mda": input_mda,
+           "product_list": {"product_list": product_list},
+           "resampled_scenes": {"sargasso": fake_scene},
+           "produced_files": mock.MagicMock()}
+
+    save_datasets(job)
+
+    fs = fsspec.filesystem("memory")
+    assert fs.ls("/bucket/save", detail=False) == ["/bucket/save/dragon_top_height.png"]
+    with fs.open("/bucket/save/dragon_top_height.png") as fd:
+        assert Image.open(fd).size == (10, 10)
+    job["produced_files"].put.assert_called_once_with("memory://bucket/save/dragon_top_height.png")
+    fs.rm("/bucket", recursive=True)
+
+
 @pytest.fixture
 def fake_scene():
     """Get a fake scene."""
@@ -901,6 +1021,82 @@ class TestLoadComposites(TestCase):
             resolution=DEFAULT, generate=False, upper_right_corner="NE")
 
 
+class TestSharedScene(TestCase):
+    """Test case for sharing the scene between the jobs."""
+
+    def setup_method(self):
+        """Set up the test case."""
+        super().setup_method()
+        from yaml import UnsafeLoader
+
+        from trollflow2.plugins import SharedScene
+        product_list = read_config(raw_string=yaml_test1, Loader=UnsafeLoader)
+        self.shared = SharedScene()
+        self.jobs = []
+        for areas in (["euron1"], ["germ", "omerc_bb"]):
+            job_product_list = copy.deepcopy(product_list)
+            for area in set(job_product_list["product_list"]["areas"]) - set(areas):
+                del job_product_list["product_list"]["areas"][area]
+            self.jobs.append({"input_filenames": ["foo"], "product_list": job_product_list,
+                              "shared_scene": self.shared})
+
+    def test_create_scene_once(self):
+        """Test that the scene is created only once."""
+        from trollflow2.plugins import create_scene
+        with mock.patch("trollflow2.plugins.Scene") as scene:
+            for job in self.jobs:
+                create_scene(job)
+        scene.assert_called_once()
+        assert self.jobs[0]["scene"] is self.jobs[1]["scene"] is self.shared.scene
+
+    def test_create_scene_fails_for_all_jobs(self):
+        """Test that failing to create the scene aborts all the jobs."""
+        from trollflow2.plugins import AbortProcessing, create_scene
+        with mock.patch("trollflow2.plugins.Scene") as scene:
+            scene.side_effect = ValueError("No supported files found")
+            for job in self.jobs:
+                with pytest.raises(AbortProcessing):
+                    create_scene(job)
+        scene.assert_called_once()
+
+    def _create_shared_scene(self):
+        from satpy import Scene
+        scn = Scene()
+        for name in ("ct", "cloudtype", "cloud_top_height", "IR_108"):
+            scn[name] = xr.DataArray(da.zeros((3, 3), chunks=2), dims=("y", "x"))
+        self.shared.scene = scn
+        for job in self.jobs:
+            job["scene"] = scn
+        return scn
+
+    def test_load_composites_to_shared_scene(self):
+        """Test loading the composites to the shared scene."""
+        from trollflow2.plugins import DEFAULT, load_composites
+        scn = self._create_shared_scene()
+        with mock.patch.object(scn, "load") as load:
+            load_composites(self.jobs[0])
+        load.assert_called_once_with({"cloud_top_height"}, resolution=DEFAULT, generate=False, unload=False)
+        job_scene = self.jobs[0]["scene"]
+        assert job_scene is not scn
+        assert set(job_scene.keys()) == set(scn.keys())
+        assert {query["name"] for query in job_scene.wishlist} == {"cloud_top_height"}
+        assert len(scn.wishlist) == 4
+
+    def test_load_composites_persists_shared_scene(self):
+        """Test persisting the datasets of the shared scene."""
+        from trollflow2.plugins import load_composites
+        scn = self._create_shared_scene()
+        for job in self.jobs:
+            job["product_list"]["product_list"]["persist_shared_scene"] = True
+        with mock.patch.object(scn, "load"):
+            with mock.patch("trollflow2.plugins.dask.persist", wraps=dask.persist) as persist:
+                load_composites(self.jobs[0])
+                load_composites(self.jobs[1])
+        persist.assert_called_once()
+        assert len(self.shared.persisted) == 4
+        np.testing.assert_array_equal(self.jobs[1]["scene"]["ct"].values, 0)
+
+
 class TestAggregate(TestCase):
     """Test case for aggregating."""
 
@@ -1068,6 +1264,37 @@ class TestResample:
         job = {"scene": scn, "product_list": prod_list}
         resample(job)
 
+    def test_resampler_cache(self):
+        """Test keeping the latest resamplers alive between the jobs."""
+        from trollflow2.plugins import _RESAMPLER_CACHE, resample
+        self.product_list["product_list"]["resampler_cache_size"] = 2
+        try:
+            for i in range(3):
+                scn = _get_mocked_scene_with_properties()
+                resampler = mock.MagicMock()
+                scn._resamplers = {("nearest", "source", "euron1", i): resampler}
+                resample({"scene": scn, "product_list": self.product_list})
+            assert len(_RESAMPLER_CACHE) == 2
+            assert ("nearest", "source", "euron1", 0) not in _RESAMPLER_CACHE._resamplers
+            assert _RESAMPLER_CACHE._resamplers[("nearest", "source", "euron1", 2)] is resampler
+        finally:
+            _RESAMPLER_CACHE.clear()
+
+    def test_cache_dir_max_size(self, tmp_path):
+        """Test removing the least recently used lookup tables from the cache dir."""
+        from trollflow2.plugins import resample
+        for i, name in enumerate(["nn_lut-old.zarr", "nn_lut-new.zarr"]):
+            lut_dir = tmp_path / name
+            lut_dir.mkdir()
+            lut_file = lut_dir / "valid_input_index"
+            lut_file.write_bytes(b"0" * 768 * 1024)
+            os.utime(lut_file, (1000 + i, 1000 + i))
+        self.product_list["product_list"]["cache_dir"] = os.fspath(tmp_path)
+        self.product_list["product_list"]["cache_dir_max_size"] = 1
+        scn = _get_mocked_scene_with_properties()
+        resample({"scene": scn, "product_list": self.product_list})
+        assert os.listdir(tmp_path) == ["nn_lut-new.zarr"]
+
 
 def _mock_ewa_with_assert_42(data, cache_dir=None, mask_area=None,
                              rows_per_scan=None, persist=False, chunks=None, fill_value=None,
@@ -1166,6 +1393,84 @@ class TestSunlightCovers(TestCase):
             res = _get_sunlight_coverage(adef, start_time)
             boundary.assert_called()
 
+    def test_area_boundary_is_cached(self):
+        """Test that the boundary polygon of an area is calculated only once."""
+        from trollflow2.plugins import _get_sunlight_coverage
+        adef = mock.MagicMock(is_geostationary=False)
+        adef.boundary.return_value.contour_poly.area.return_value = 0.2
+        adef.boundary.return_value.contour_poly.intersection.return_value.area.return_value = 0.02
+        start_time = dt.datetime(2019, 4, 7, 20, 8)
+        with mock.patch("trollflow2.plugins.get_twilight_poly") as get_twilight_poly:
+            twilight_poly = mock.MagicMock()
+            _get_sunlight_coverage(adef, start_time)
+            _get_sunlight_coverage(adef, start_time, twilight_poly=twilight_poly)
+        adef.boundary.assert_called_once_with(vertices_per_side=100)
+        get_twilight_poly.assert_called_once_with(start_time)
+        adef.boundary.return_value.contour_poly.intersection.assert_called_with(twilight_poly)
+
+    def test_twilight_poly_is_cached_by_rounded_time(self):
+        """Test that the twilight polygons are cached by the time rounded to the resolution."""
+        from trollflow2.plugins import _get_cached_twilight_poly, _get_twilight_poly
+        _get_cached_twilight_poly.cache_clear()
+        with mock.patch("trollflow2.plugins.get_twilight_poly") as get_twilight_poly:
+            get_twilight_poly.side_effect = lambda time: time
+            assert _get_twilight_poly(dt.datetime(2019, 4, 7, 20, 8, 29), 60) == dt.datetime(2019, 4, 7, 20, 8)
+            assert _get_twilight_poly(dt.datetime(2019, 4, 7, 20, 7, 31), 60) == dt.datetime(2019, 4, 7, 20, 8)
+            assert _get_twilight_poly(dt.datetime(2019, 4, 7, 20, 7, 31)) == dt.datetime(2019, 4, 7, 20, 7, 31)
+        assert get_twilight_poly.call_count == 2
+        _get_cached_twilight_poly.cache_clear()
+
+
+
+class TestAreaRegistry:
+    """Test case for the area registry."""
+
+    def setup_method(self):
+        """Set up the test case."""
+        from yaml import UnsafeLoader
+        self.product_list = read_config(raw_string=yaml_test1, Loader=UnsafeLoader)
+        self.product_list["product_list"]["preload_areas"] = True
+        self.area_def = create_area_def("euron1", 4087, area_extent=[-1e6, -1e6, 1e6, 1e6], shape=(10, 10))
+
+    def teardown_method(self):
+        """Clean up the registry."""
+        from trollflow2.plugins import AREA_REGISTRY
+        AREA_REGISTRY.clear()
+
+    def test_preload_areas(self):
+        """Test that the areas are read only once and shared by the plugins."""
+        from trollflow2.plugins import AREA_REGISTRY, _get_area_def, preload_areas, resample
+        with mock.patch("trollflow2.plugins.get_area_def") as get_area_def:
+            get_area_def.return_value = self.area_def
+            preload_areas(self.product_list)
+            preload_areas(self.product_list)
+            assert get_area_def.call_count == 3
+            for area in ("euron1", "germ", "omerc_bb"):
+                assert area in AREA_REGISTRY
+                assert _get_area_def(area) is self.area_def
+            assert get_area_def.call_count == 3
+            scn = _get_mocked_scene_with_properties()
+            resample({"scene": scn, "product_list": self.product_list})
+        assert scn.resample.call_args[0][0] is self.area_def
+
+    def test_preload_areas_is_optional(self):
+        """Test that the areas are not registered without `preload_areas`."""
+        from trollflow2.plugins import AREA_REGISTRY, preload_areas
+        del self.product_list["product_list"]["preload_areas"]
+        with mock.patch("trollflow2.plugins.get_area_def") as get_area_def:
+            preload_areas(self.product_list)
+        get_area_def.assert_not_called()
+        assert "euron1" not in AREA_REGISTRY
+
+    def test_preload_missing_area(self):
+        """Test that a missing area fails before any data is read."""
+        from pyresample.area_config import AreaNotFound
+
+        from trollflow2.plugins import preload_areas
+        self.product_list["product_list"]["areas"]["nonexistent_area"] = {"products": {}}
+        with pytest.raises(AreaNotFound):
+            preload_areas(self.product_list)
+
 
 class TestGetProductAreaDef(TestCase):
     """Test case for finding area definition for a product."""
@@ -1355,6 +1660,10 @@ def _get_mocked_scene_with_properties():
     return scene
 
 
+def _fake_scene_coverages(platform_name, start_time, end_time, sensor, area_ids):
+    return dict.fromkeys(area_ids, 10.0)
+
+
 class TestCovers(TestCase):
     """Test case for coverage checks."""
 
@@ -1382,9 +1691,9 @@ class TestCovers(TestCase):
         """Test that the plugin complains when multiple sensors are provided."""
         from trollflow2.plugins import covers
 
-        with mock.patch("trollflow2.plugins._get_scene_coverage") as _get_scene_coverage, \
+        with mock.patch("trollflow2.plugins._get_scene_coverages") as _get_scene_coverages, \
                 mock.patch("trollflow2.plugins.Pass"):
-            _get_scene_coverage.return_value = 10.0
+            _get_scene_coverages.side_effect = _fake_scene_coverages
             scn = _get_mocked_scene_with_properties()
             job = {"product_list": self.product_list,
                    "input_mda": {"platform_name": "platform",
@@ -1400,9 +1709,9 @@ class TestCovers(TestCase):
         """Test that the plugin complains when multiple sensors are provided."""
         from trollflow2.plugins import covers
 
-        with mock.patch("trollflow2.plugins._get_scene_coverage") as _get_scene_coverage, \
+        with mock.patch("trollflow2.plugins._get_scene_coverages") as _get_scene_coverages, \
                 mock.patch("trollflow2.plugins.Pass"):
-            _get_scene_coverage.return_value = 10.0
+            _get_scene_coverages.side_effect = _fake_scene_coverages
             scn = _get_mocked_scene_with_properties()
             job = {"product_list": self.product_list,
                    "input_mda": {"platform_name": "platform",
@@ -1418,19 +1727,19 @@ class TestCovers(TestCase):
         """Test that the scene and message metadata are merged correctly."""
         from trollflow2.plugins import covers
 
-        with mock.patch("trollflow2.plugins._get_scene_coverage") as _get_scene_coverage, \
+        with mock.patch("trollflow2.plugins._get_scene_coverages") as _get_scene_coverages, \
                 mock.patch("trollflow2.plugins.Pass"):
-            _get_scene_coverage.return_value = 10.0
+            _get_scene_coverages.side_effect = _fake_scene_coverages
             scn = _get_mocked_scene_with_properties()
             job = {"product_list": self.product_list,
                    "input_mda": {"platform_name": "platform"},
                    "scene": scn}
             covers(job)
-            _get_scene_coverage.assert_called_with(job["input_mda"]["platform_name"],
-                                                   scn.start_time,
-                                                   scn.end_time,
-                                                   list(scn.sensor_names)[0],
-                                                   "omerc_bb")
+            _get_scene_coverages.assert_called_once_with(job["input_mda"]["platform_name"],
+                                                         scn.start_time,
+                                                         scn.end_time,
+                                                         list(scn.sensor_names)[0],
+                                                         ["euron1", "germ", "omerc_bb"])
 
     def test_covers(self, caplog):
         """Test coverage."""
@@ -1463,14 +1772,14 @@ class TestCovers(TestCase):
                "scene": scn}
         job2 = copy.deepcopy(job)
 
-        with mock.patch("trollflow2.plugins._get_scene_coverage") as _get_scene_coverage, \
+        with mock.patch("trollflow2.plugins._get_scene_coverages") as _get_scene_coverages, \
                 mock.patch("trollflow2.plugins.Pass"):
-            _get_scene_coverage.return_value = 10.0
+            _get_scene_coverages.side_effect = _fake_scene_coverages
             covers(job)
-            _get_scene_coverage.assert_called_with(input_mda["platform_name"],
-                                                   input_mda["start_time"],
-                                                   input_mda["end_time"],
-                                                   "avhrr-4", "omerc_bb")
+            _get_scene_coverages.assert_called_once_with(input_mda["platform_name"],
+                                                         input_mda["start_time"],
+                                                         input_mda["end_time"],
+                                                         "avhrr-4", ["euron1", "germ", "omerc_bb"])
 
             del job2["product_list"]["product_list"]["areas"]["euron1"]["min_coverage"]
             del job2["product_list"]["product_list"]["min_coverage"]
@@ -1495,6 +1804,54 @@ class TestCovers(TestCase):
             get_area_def.assert_called_with(5)
             area_coverage.assert_called_with(6)
 
+    def test_scene_coverages_use_one_pass(self):
+        """Test that the scene coverages of several areas are calculated with one pass."""
+        from trollflow2.plugins import _get_scene_coverages
+        with mock.patch("trollflow2.plugins.get_area_def") as get_area_def, \
+                mock.patch("trollflow2.plugins.Pass") as ts_pass:
+            ts_pass.return_value.area_coverage.side_effect = [0.2, 0.5]
+            res = _get_scene_coverages(1, 2, 3, 4, ["area1", "area2"])
+        assert res == {"area1": 20.0, "area2": 50.0}
+        ts_pass.assert_called_once_with(1, 2, 3, instrument=4)
+        assert get_area_def.call_count == 2
+
+    def test_coverage_cache_is_shared_within_job(self):
+        """Test that the coverages calculated in `covers` are reused in the job."""
+        from trollflow2.plugins import _get_coverage_cache, covers
+        scn = _get_mocked_scene_with_properties()
+        job = {"product_list": self.product_list,
+               "input_mda": self.input_mda,
+               "scene": scn}
+        with mock.patch("trollflow2.plugins._get_scene_coverages") as _get_scene_coverages, \
+                mock.patch("trollflow2.plugins.Pass"):
+            _get_scene_coverages.side_effect = _fake_scene_coverages
+            covers(job)
+            coverage = _get_coverage_cache(job).get_coverage(
+                "NOAA-15", self.input_mda["start_time"], self.input_mda["end_time"], "avhrr-3", "germ")
+        assert coverage == 10.0
+        _get_scene_coverages.assert_called_once()
+
+    def test_coverage_cache_is_kept_between_jobs(self):
+        """Test that the coverages are kept between the jobs with `coverage_cache_size`."""
+        import trollflow2.plugins
+        from trollflow2.plugins import covers
+        self.product_list["product_list"]["coverage_cache_size"] = 2
+        try:
+            with mock.patch("trollflow2.plugins._get_scene_coverages") as _get_scene_coverages, \
+                    mock.patch("trollflow2.plugins.Pass"):
+                _get_scene_coverages.side_effect = _fake_scene_coverages
+                for _ in range(2):
+                    job = {"product_list": copy.deepcopy(self.product_list),
+                           "input_mda": self.input_mda,
+                           "scene": _get_mocked_scene_with_properties()}
+                    covers(job)
+            assert "coverage_cache" not in job
+            # Only two of the three areas fit in the cache
+            assert _get_scene_coverages.call_count == 2
+            assert _get_scene_coverages.call_args[0][4] == ["euron1"]
+        finally:
+            trollflow2.plugins._COVERAGE_CACHE = None
+
     def test_covers_collection_area_id(self):
         """Test the coverage of a collection area id."""
         from trollflow2.plugins import AbortProcessing, covers
@@ -1689,24 +2046,24 @@ class TestSZACheck(TestCase):
         from trollflow2.plugins import sza_check
 
         with mock.patch("trollflow2.plugins.sun_zenith_angle") as sun_zenith_angle:
-            sun_zenith_angle.return_value = 90.
+            sun_zenith_angle.side_effect = partial(_fake_sun_zenith_angle, 90.)
             scn = _get_mocked_scene_with_properties()
             job = self.job_with_sza.copy()
             del job["input_mda"]["start_time"]
             job["scene"] = scn
             sza_check(job)
-            sun_zenith_angle.assert_called_with(scn.start_time, 25., 60.)
+            _assert_sun_zenith_angle_called_once(sun_zenith_angle, scn.start_time, [25.], [60.])
 
     def test_sza_check_with_ok_sza(self):
         """Test the SZA check with SZA that is ok for all the products."""
         from trollflow2.plugins import sza_check
         with mock.patch("trollflow2.plugins.sun_zenith_angle") as sun_zenith_angle:
             # Zenith angle that is ok for all the products
-            sun_zenith_angle.return_value = 90.
+            sun_zenith_angle.side_effect = partial(_fake_sun_zenith_angle, 90.)
 
             sza_check(self.job_with_sza)
 
-            sun_zenith_angle.assert_called_with(JOB_INPUT_MDA_START_TIME, 25., 60.)
+            _assert_sun_zenith_angle_called_once(sun_zenith_angle, JOB_INPUT_MDA_START_TIME, [25.], [60.])
             assert self.job_with_sza["product_list"] == self.product_list_with_sza
 
     def test_sza_check_removes_day_products(self):
@@ -1714,7 +2071,7 @@ class TestSZACheck(TestCase):
         from trollflow2.plugins import sza_check
         with mock.patch("trollflow2.plugins.sun_zenith_angle") as sun_zenith_angle:
             # Zenith angle that removes day products
-            sun_zenith_angle.return_value = 100.
+            sun_zenith_angle.side_effect = partial(_fake_sun_zenith_angle, 100.)
 
             sza_check(self.job_with_sza)
 
@@ -1728,13 +2085,54 @@ class TestSZACheck(TestCase):
         from trollflow2.plugins import sza_check
         with mock.patch("trollflow2.plugins.sun_zenith_angle") as sun_zenith_angle:
             # Zenith angle that removes night products
-            sun_zenith_angle.return_value = 45.
+            sun_zenith_angle.side_effect = partial(_fake_sun_zenith_angle, 45.)
 
             sza_check(self.job_with_sza)
 
             # There was only one product, so the whole area is deleted
             assert "germ" not in self.job_with_sza["product_list"]["product_list"]["areas"]
 
+    def test_sza_check_uses_the_common_settings(self):
+        """Test the SZA check with the settings given only in the common section."""
+        from trollflow2.plugins import sza_check
+        self.job_no_sza["product_list"]["common"] = {"sunzen_check_lon": 25.,
+                                                     "sunzen_check_lat": 60.,
+                                                     "sunzen_minimum_angle": 85.}
+        with mock.patch("trollflow2.plugins.sun_zenith_angle") as sun_zenith_angle:
+            # Daytime, so all the products are removed as night products
+            sun_zenith_angle.side_effect = partial(_fake_sun_zenith_angle, 45.)
+            sza_check(self.job_no_sza)
+        _assert_sun_zenith_angle_called_once(sun_zenith_angle, JOB_INPUT_MDA_START_TIME, [25.], [60.])
+        assert self.job_no_sza["product_list"]["product_list"]["areas"] == {}
+
+    def test_sza_check_calculates_distinct_points_at_once(self):
+        """Test that the Sun zenith angles of all the check points are calculated in one call."""
+        from trollflow2.plugins import sza_check
+        areas = self.job_with_sza["product_list"]["product_list"]["areas"]
+        areas["euron1"]["sunzen_check_lon"] = 10.
+        areas["euron1"]["sunzen_check_lat"] = 50.
+        areas["euron1"]["products"]["cloud_top_height"]["sunzen_maximum_angle"] = 95.
+        with mock.patch("trollflow2.plugins.sun_zenith_angle") as sun_zenith_angle:
+            sun_zenith_angle.side_effect = lambda utc_time, lons, lats: np.where(lons == 10., 100., 90.)
+            sza_check(self.job_with_sza)
+        sun_zenith_angle.assert_called_once()
+        lons, lats = sun_zenith_angle.call_args[0][1:]
+        assert sorted(zip(lons, lats)) == [(10., 50.), (25., 60.)]
+        assert "euron1" not in areas
+        assert "cloud_top_height" in areas["omerc_bb"]["products"]
+
+
+def _fake_sun_zenith_angle(angle, utc_time, lons, lats):
+    return np.full(np.shape(lons), angle)
+
+
+def _assert_sun_zenith_angle_called_once(sun_zenith_angle, utc_time, lons, lats):
+    sun_zenith_angle.assert_called_once()
+    args = sun_zenith_angle.call_args[0]
+    assert args[0] == utc_time
+    np.testing.assert_array_equal(args[1], lons)
+    np.testing.assert_array_equal(args[2], lats)
+
 
 def _get_product_list_and_job(add_sza_limits=False):
     from yaml import UnsafeLoader
@@ -1784,6 +2182,7 @@ class TestOverviews(TestCase):
                 mock.patch("trollflow2.plugins.rasterio") as rasterio:
             # Mock the rasterio.open context manager
             dst = mock.MagicMock()
+            dst.overviews.return_value = []
             rasterio.open.return_value.__enter__.return_value = dst
 
             product_list = self.product_list["product_list"]["areas"]
@@ -1796,6 +2195,51 @@ class TestOverviews(TestCase):
             dst.update_tags.assert_called_once_with(ns="rio_overview",
                                                     resampling="average")
 
+    def test_add_overviews_skips_files_with_overviews(self):
+        """Test that files which already have the same overviews are not modified."""
+        from trollflow2.plugins import add_overviews
+        with mock.patch("trollflow2.plugins.rasterio") as rasterio:
+            dst = mock.MagicMock()
+            dst.overviews.return_value = [4]
+            dst.tags.return_value = {"resampling": "average"}
+            rasterio.open.return_value.__enter__.return_value = dst
+
+            product_list = self.product_list["product_list"]["areas"]
+            product_list["germ"]["products"]["cloudtype"]["formats"][0]["overviews"] = [4]
+            product_list["germ"]["products"]["cloudtype"]["formats"][0]["filename"] = "foo"
+            add_overviews({"product_list": self.product_list})
+            dst.overviews.assert_called_once_with(1)
+            dst.build_overviews.assert_not_called()
+
+    def test_add_overviews_rebuilds_other_overviews(self):
+        """Test that the overviews built by the writer are built again with average resampling."""
+        from trollflow2.plugins import add_overviews
+        with mock.patch("trollflow2.plugins.Resampling") as resampling, \
+                mock.patch("trollflow2.plugins.rasterio") as rasterio:
+            dst = mock.MagicMock()
+            dst.overviews.return_value = [4]
+            dst.tags.return_value = {}
+            rasterio.open.return_value.__enter__.return_value = dst
+
+            product_list = self.product_list["product_list"]["areas"]
+            product_list["germ"]["products"]["cloudtype"]["formats"][0]["overviews"] = [4]
+            product_list["germ"]["products"]["cloudtype"]["formats"][0]["filename"] = "foo"
+            add_overviews({"product_list": self.product_list})
+            dst.build_overviews.assert_called_once_with([4], resampling.average)
+            dst.update_tags.assert_called_once_with(ns="rio_overview", resampling="average")
+
+    def test_callback_add_overviews(self, tmp_path):
+        """Test adding the overviews in a callback."""
+        from trollflow2.plugins import callback_add_overviews
+        fname = os.fspath(tmp_path / "foo.tif")
+        with rasterio.open(fname, "w", driver="GTiff", width=64, height=64, count=1, dtype="uint8") as dst:
+            dst.write(np.zeros((1, 64, 64), dtype=np.uint8))
+        obj = object()
+        assert callback_add_overviews(obj, None, {}, {"filename": fname, "overviews": [2, 4]}) is obj
+        with rasterio.open(fname) as src:
+            assert src.overviews(1) == [2, 4]
+            assert src.tags(ns="rio_overview") == {"resampling": "average"}
+
 
 class TestFilePublisher(TestCase):
     """Test case for File publisher."""
@@ -1880,6 +2324,89 @@ class TestFilePublisher(TestCase):
         assert formats == ["png", "jpg"]
         del pub
 
+    def test_filepublisher_publish_on_done(self):
+        """Test publishing the files as soon as they are written."""
+        from satpy import Scene
+        from satpy.tests.utils import make_dataid
+
+        from trollflow2.plugins import FilePublisher, callback_publish
+
+        scn_euron1 = Scene()
+        dataid = make_dataid(name="cloud_top_height", resolution=1000)
+        scn_euron1[dataid] = mock.MagicMock()
+        job = {"product_list": self.product_list,
+               "input_mda": self.input_mda,
+               "resampled_scenes": dict(euron1=scn_euron1)}
+        _ = create_filenames_and_topics(job)
+        formats = self.product_list["product_list"]["areas"]["euron1"]["products"]["cloud_top_height"]["formats"]
+
+        with patched_publisher() as published_messages:
+            pub = FilePublisher(nameservers=False, port=2010, publish_on_done=True)
+            job["on_done_publisher"] = pub
+            try:
+                obj = object()
+                assert callback_publish(obj, None, job, formats[0]) is obj
+                pub._sender.flush()
+                # The file message and its dispatch message
+                assert len(published_messages) == 2
+                assert Message(rawstr=published_messages[0]).data["format"] == "png"
+                pub(job)
+            finally:
+                pub.stop()
+
+        file_formats = [Message(rawstr=rawmsg).data["format"] for rawmsg in published_messages
+                        if Message(rawstr=rawmsg).type == "file"]
+        assert file_formats == ["png", "jpg"]
+        assert len(published_messages) == 3
+
+    def test_filepublisher_sends_to_the_launcher_publisher(self):
+        """Test that the messages are queued for the launcher publisher when it is used."""
+        import queue
+
+        from satpy import Scene
+        from satpy.tests.utils import make_dataid
+
+        from trollflow2.plugins import FilePublisher, use_launcher_publisher
+
+        scn_euron1 = Scene()
+        dataid = make_dataid(name="cloud_top_height", resolution=1000)
+        scn_euron1[dataid] = mock.MagicMock()
+        job = {"product_list": self.product_list,
+               "input_mda": self.input_mda,
+               "resampled_scenes": dict(euron1=scn_euron1)}
+        _ = create_filenames_and_topics(job)
+
+        message_queue = queue.Queue()
+        use_launcher_publisher(message_queue)
+        try:
+            with patched_publisher() as published_messages:
+                pub = FilePublisher(nameservers=False, port=2010)
+                pub(job)
+                pub.stop()
+        finally:
+            use_launcher_publisher(None)
+
+        assert published_messages == []
+        queued_messages = []
+        while not message_queue.empty():
+            queued_messages.append(Message(rawstr=message_queue.get()))
+        assert [msg.data["format"] for msg in queued_messages if msg.type == "file"] == ["png", "jpg"]
+
+    def test_callback_publish_without_publisher(self, caplog):
+        """Test that the publish callback complains without a publisher."""
+        from trollflow2.plugins import callback_publish
+        with caplog.at_level(logging.WARNING):
+            callback_publish(None, None, {}, {"filename": "foo.tif"})
+        assert "No FilePublisher with publish_on_done, not publishing foo.tif yet." in caplog.text
+
+    def test_callback_publish_leaves_concurrent_priorities_to_the_worker(self, caplog):
+        """Test that the publish callback doesn't publish when the priorities are processed concurrently."""
+        from trollflow2.plugins import callback_publish
+        with caplog.at_level(logging.DEBUG):
+            callback_publish(None, None, {"on_done_publisher": None}, {"filename": "foo.tif"})
+        assert "Leaving the publishing of foo.tif to the FilePublisher worker." in caplog.text
+        assert "No FilePublisher" not in caplog.text
+
     def test_filepublisher_without_compose(self):
         """Test filepublisher without compose."""
         from satpy import Scene
@@ -2312,6 +2839,36 @@ def test_persisted(sc_3a_3b):
     assert not sc_3a_3b["another"].attrs.get("persisted")
 
 
+def test_persisted_valid_counts(sc_3a_3b):
+    """Test that the valid data counts are calculated with the persisted products."""
+    from trollflow2.launcher import yaml
+    from trollflow2.plugins import _persist_what_we_must
+    job = {}
+    product_list = yaml.safe_load(yaml_test3)
+    job["product_list"] = product_list.copy()
+    job["resampled_scenes"] = {"euron1": sc_3a_3b}
+    prods = job["product_list"]["product_list"]["areas"]["euron1"]["products"]
+    for p in ("NIR016", "IR037", "absent"):
+        prods[p] = {"min_valid_data_fraction": 40}
+
+    with mock.patch("dask.persist", wraps=dask.persist) as persist:
+        valid_counts = _persist_what_we_must(job)
+
+    persist.assert_called_once()
+    assert valid_counts == {("euron1", "NIR016"): 3, ("euron1", "IR037"): 6}
+
+
+def test_report_graph_sharing(caplog):
+    """Test reporting the tasks shared between the writer results."""
+    from trollflow2.plugins import _report_graph_sharing
+    channel = da.ones((4, 4), chunks=2) * 2
+    objs = [[channel + 1],
+            ([channel - 1], [mock.MagicMock()])]
+    with caplog.at_level(logging.INFO):
+        _report_graph_sharing(objs)
+    assert "Computing 16 tasks for 2 writer results, of which 8 tasks (33.3%) are shared" in caplog.text
+
+
 def test_callback_log(caplog, tmp_path):
     """Test callback log functionality."""
     from trollflow2.plugins import callback_log